@@ -2,8 +2,15 @@ from flask import Flask
 from flask_cors import CORS
 import os
 
-def create_app(test_config=None):
-    """Create and configure the Flask application"""
+def create_app(test_config=None, start_services=True):
+    """
+    Create and configure the Flask application
+
+    Args:
+        test_config: Config mapping used instead of the instance config
+        start_services: Start the background transcription threads now. Pre-fork
+                        servers pass False and start them in each worker instead.
+    """
     app = Flask(__name__, instance_relative_config=True)
     
     # Enable CORS for the Chrome extension
@@ -32,4 +39,11 @@ def create_app(test_config=None):
     from .routes import bp
     app.register_blueprint(bp)
 
-    return app 
\ No newline at end of file
+    if start_services:
+        from .cpu_profile import apply_cpu_profile
+        from .audio_processing import start_background_services
+        apply_cpu_profile()
+        start_background_services()
+
+    return app
+ 
\ No newline at end of file
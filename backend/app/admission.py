@@ -0,0 +1,176 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import List
+
+from .metrics import ADMISSION_REJECTIONS, INFERENCE_WAITING, STAGE_LATENCY
+
+# Priority classes; lower values are admitted first
+LIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {LIVE: 'live', BATCH: 'batch'}
+
+# Inference windows allowed to run at once in this process
+MAX_CONCURRENT_INFERENCE = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "1"))
+
+# Upload jobs admitted at once; further uploads are rejected immediately
+MAX_BATCH_JOBS = int(os.getenv("ADMISSION_MAX_BATCH_JOBS", "2"))
+
+# Seconds a batch window may wait for a slot before its job is abandoned
+BATCH_WAIT_TIMEOUT = float(os.getenv("ADMISSION_BATCH_TIMEOUT", "60"))
+
+# Length of the windows batch audio is transcribed in; live windows can run
+# between them
+BATCH_WINDOW_SECONDS = float(os.getenv("ADMISSION_BATCH_WINDOW_SECONDS", "30"))
+
+# Per-session streaming limit: seconds of audio per second of wall time, and
+# the burst a session may send at once
+LIVE_AUDIO_RATE = float(os.getenv("ADMISSION_LIVE_AUDIO_RATE", "1.5"))
+LIVE_AUDIO_BURST = float(os.getenv("ADMISSION_LIVE_AUDIO_BURST", "10"))
+
+
+class OverloadedError(Exception):
+    """Raised when work is rejected; retry_after is a hint in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float = LIVE_AUDIO_RATE, burst: float = LIVE_AUDIO_BURST):
+        """
+        Initialize a token bucket rate limiter.
+
+        Args:
+            rate: Tokens added per second
+            burst: Maximum tokens held at once
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: float) -> float:
+        """
+        Take tokens from the bucket if enough are available.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise seconds until they
+            would be available
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if amount <= self._tokens:
+                self._tokens -= amount
+                return 0.0
+            return (min(amount, self.burst) - self._tokens) / self.rate
+
+
+class AdmissionController:
+    def __init__(self, max_concurrency: int = MAX_CONCURRENT_INFERENCE, max_batch_jobs: int = MAX_BATCH_JOBS,
+                 batch_wait_timeout: float = BATCH_WAIT_TIMEOUT):
+        """
+        Initialize the admission controller in front of the transcription layer.
+
+        Inference runs in windows, each holding one of max_concurrency slots.
+        A free slot always goes to the highest priority waiter, so a live
+        window waits at most for the batch windows already running, never for
+        a whole upload.
+
+        Args:
+            max_concurrency: Inference windows allowed to run at once
+            max_batch_jobs: Batch jobs admitted at once
+            batch_wait_timeout: Seconds a batch window may wait for a slot
+        """
+        self.max_concurrency = max_concurrency
+        self.max_batch_jobs = max_batch_jobs
+        self.batch_wait_timeout = batch_wait_timeout
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting: List[int] = [0] * len(PRIORITY_NAMES)
+        self._batch_jobs = 0
+        # Moving average of how long a window holds its slot
+        self._mean_hold = 1.0
+
+    @contextmanager
+    def batch_job(self):
+        """
+        Admit a batch job, such as an upload, for the duration of the block.
+
+        Raises:
+            OverloadedError: If max_batch_jobs jobs are already admitted
+        """
+        with self._cond:
+            if self._batch_jobs >= self.max_batch_jobs:
+                ADMISSION_REJECTIONS.inc(reason='batch_jobs')
+                raise OverloadedError('Too many uploads in progress', self._retry_after(self._batch_jobs))
+            self._batch_jobs += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._batch_jobs -= 1
+
+    @contextmanager
+    def slot(self, priority: int):
+        """
+        Hold an inference slot for the duration of the block.
+
+        Live windows wait as long as needed; batch windows give up after
+        batch_wait_timeout.
+
+        Raises:
+            OverloadedError: If a batch window timed out waiting
+        """
+        timeout = None if priority == LIVE else self.batch_wait_timeout
+        start = time.monotonic()
+        self._acquire(priority, timeout)
+        acquired = time.monotonic()
+        STAGE_LATENCY.observe(acquired - start, stage='admission_wait')
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - acquired)
+
+    def _can_run(self, priority: int) -> bool:
+        """Whether a waiter of this priority may take a slot now."""
+        return self._active < self.max_concurrency and not any(self._waiting[:priority])
+
+    def _acquire(self, priority: int, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        name = PRIORITY_NAMES[priority]
+        with self._cond:
+            self._waiting[priority] += 1
+            INFERENCE_WAITING.inc(priority=name)
+            try:
+                while not self._can_run(priority):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        ADMISSION_REJECTIONS.inc(reason='batch_timeout')
+                        raise OverloadedError('Transcription is busy', self._retry_after(sum(self._waiting)))
+                    self._cond.wait(remaining)
+                self._active += 1
+            finally:
+                self._waiting[priority] -= 1
+                INFERENCE_WAITING.dec(priority=name)
+
+    def _release(self, held: float):
+        with self._cond:
+            self._active -= 1
+            self._mean_hold = 0.8 * self._mean_hold + 0.2 * held
+            # Wake everyone; only the highest priority waiter can proceed
+            self._cond.notify_all()
+
+    def _retry_after(self, queued: int) -> float:
+        """Estimate when a rejected request would be admitted."""
+        return max(1.0, math.ceil(queued * self._mean_hold / self.max_concurrency))
+
+
+# Admission controller shared by every transcription in the process
+admission = AdmissionController()
@@ -1,16 +1,38 @@
 import speech_recognition as sr
 import tempfile
 import os
+import logging
 import numpy as np
 from scipy.io import wavfile
+from scipy.signal import resample_poly
 from pydub import AudioSegment
 from .nlp_analysis import analyze_transcript
-from .transcription_service import TranscriptionService
-from typing import Union, BinaryIO
+from .transcription_service import TranscriptionService, SAMPLE_RATE, split_windows
+from .admission import BATCH_WINDOW_SECONDS
+from .prompt_budget import build_conversation_context, build_timeline_context
+from .timeline import ConversationTimeline
+from .prosody import ProsodyTracker, RECORDING_BLOCK_SECONDS
+from .question_classifier import QuestionTracker
+from .history import get_history
+from .tracing import span
+from .warmup import readiness
+from typing import Union, BinaryIO, List, Optional, Tuple
 
-# Global transcription service instance
+logger = logging.getLogger(__name__)
+
+# Analyzed in place of an empty interviewee transcript
+EMPTY_TRANSCRIPT_PLACEHOLDER = ("This is a placeholder text for analysis since the transcription was empty. "
+                                "Please speak more clearly or check your microphone.")
+
+# Global transcription service instance. Its threads are started by
+# start_background_services, so a pre-fork server can load the model in the
+# master process and start the threads in each worker after fork.
 transcription_service = TranscriptionService()
-transcription_service.start()
+
+def start_background_services():
+    """Start the background transcription threads and warm-up for this process."""
+    transcription_service.start()
+    readiness.start()
 
 def process_streaming_audio(audio_data: np.ndarray, channel: str = 'mic'):
     """
@@ -26,17 +48,15 @@ def process_streaming_audio(audio_data: np.ndarray, channel: str = 'mic'):
     transcription_service.add_audio_data(audio_data.astype(np.float32), channel)
     return transcription_service.get_transcription(channel)
 
-def process_audio(audio_file: Union[str, BinaryIO], interview_type='behavioral'):
+def decode_audio(audio_file: Union[str, BinaryIO]) -> Tuple[int, np.ndarray]:
     """
-    Process the audio file to extract speech from both interviewer and interviewee
-    and generate feedback.
+    Decode an uploaded file or a path into raw samples.
     
     Args:
         audio_file: Path to audio file or file-like object
-        interview_type: Type of interview for analysis
     
     Returns:
-        dict: Feedback based on the interview analysis
+        tuple: (sample rate, samples with shape (n,) or (n, channels))
     """
     # Create a temporary file to store the audio
     temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
@@ -44,79 +64,390 @@ def process_audio(audio_file: Union[str, BinaryIO], interview_type='behavioral')
     temp_file.close()
     
     try:
-        print(f"\nProcessing audio file: {audio_file.filename}")
-        print(f"Temporary file: {temp_filename}")
-        
         # Save the uploaded file to the temporary location
         if isinstance(audio_file, str):
-            if os.path.exists(audio_file):
-                if audio_file.endswith('.wav'):
-                    temp_filename = audio_file
-                else:
-                    audio = AudioSegment.from_file(audio_file)
-                    audio.export(temp_filename, format="wav")
-        else:
-            audio_file.save(temp_filename)
-            if not temp_filename.endswith('.wav'):
-                webm_audio = AudioSegment.from_file(temp_filename)
-                temp_filename_wav = temp_filename.replace('.webm', '.wav')
-                webm_audio.export(temp_filename_wav, format="wav")
+            if audio_file.endswith('.wav'):
+                # Read the file in place; the temporary file isn't needed
                 os.remove(temp_filename)
-                temp_filename = temp_filename_wav
-        
-        # Split stereo channels (left: interviewee mic, right: interviewer from tab)
-        sample_rate, audio_data = wavfile.read(temp_filename)
-        print(f"Audio sample rate: {sample_rate} Hz")
-        print(f"Audio data shape: {audio_data.shape}")
-        
-        # Check if audio is stereo (2 channels)
-        if len(audio_data.shape) == 2 and audio_data.shape[1] == 2:
-            print("Processing stereo audio (2 channels)")
-            interviewee_audio = audio_data[:, 0]  # Left channel (microphone)
-            interviewer_audio = audio_data[:, 1]  # Right channel (tab audio)
-            
-            # Add audio data to transcription service
-            transcription_service.add_audio_data(interviewee_audio.astype(np.float32), 'mic')
-            transcription_service.add_audio_data(interviewer_audio.astype(np.float32), 'tab')
-            
-            # Get transcripts from both channels
-            interviewee_transcript = transcription_service.get_transcription('mic')
-            interviewer_transcript = transcription_service.get_transcription('tab')
-            
-            # Analyze the combined conversation context
-            print(f"Analyzing with transcript lengths - Interviewer: {len(interviewer_transcript)} chars, Interviewee: {len(interviewee_transcript)} chars")
-            if not interviewee_transcript.strip():
-                print("WARNING: Interviewee transcript is empty!")
-                interviewee_transcript = "This is a placeholder text for analysis since the transcription was empty. Please speak more clearly or check your microphone."
-            
-            feedback = analyze_interview_conversation(
-                interviewer_transcript, 
-                interviewee_transcript, 
-                interview_type
-            )
-            
-            return feedback
+                temp_filename = audio_file
+            else:
+                audio = AudioSegment.from_file(audio_file)
+                audio.export(temp_filename, format="wav")
         else:
-            print("Processing mono audio (single channel)")
-            transcription_service.add_audio_data(audio_data.astype(np.float32), 'mic')
-            transcript = transcription_service.get_transcription('mic')
-            print(f"Transcript length: {len(transcript)} chars")
-            print(f"Transcript content: '{transcript[:100]}...'")
-            
-            if not transcript.strip():
-                print("WARNING: Transcript is empty!")
-                transcript = "This is a placeholder text for analysis since the transcription was empty. Please speak more clearly or check your microphone."
-            
-            print("Calling analyze_transcript function...")
-            feedback = analyze_transcript(transcript, interview_type)
-            print(f"Feedback received from analyze_transcript. Type: {type(feedback)}")
-            return feedback
-            
+            filename = getattr(audio_file, 'filename', '') or ''
+            if filename.lower().endswith('.wav'):
+                audio_file.save(temp_filename)
+            else:
+                # Let ffmpeg detect the container (webm, mp3) before converting
+                upload_filename = temp_filename + os.path.splitext(filename)[1]
+                audio_file.save(upload_filename)
+                try:
+                    AudioSegment.from_file(upload_filename).export(temp_filename, format="wav")
+                finally:
+                    os.remove(upload_filename)
+        
+        return wavfile.read(temp_filename)
     finally:
         # Clean up the temporary file if it was created
         if temp_filename != audio_file and os.path.exists(temp_filename):
             os.remove(temp_filename)
 
+def to_model_audio(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """
+    Convert one channel of decoded samples to float32 at the model sample rate.
+    """
+    if np.issubdtype(samples.dtype, np.unsignedinteger):
+        # Unsigned PCM (8-bit WAV) is centred on the middle of its range
+        middle = (np.iinfo(samples.dtype).max + 1) / 2
+        samples = (samples.astype(np.float32) - middle) / middle
+    elif np.issubdtype(samples.dtype, np.integer):
+        samples = samples.astype(np.float32) / np.iinfo(samples.dtype).max
+    else:
+        samples = samples.astype(np.float32)
+    if sample_rate != SAMPLE_RATE:
+        divisor = np.gcd(sample_rate, SAMPLE_RATE)
+        samples = resample_poly(samples, SAMPLE_RATE // divisor, sample_rate // divisor).astype(np.float32)
+    return samples
+
+def split_channels(audio_data: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Split decoded audio into interviewee and interviewer channels.
+    
+    Stereo recordings carry the interviewee microphone on the left channel and
+    the interviewer tab audio on the right. Mono recordings are treated as the
+    interviewee only.
+    
+    Returns:
+        tuple: (interviewee audio, interviewer audio or None), as model input
+    """
+    if len(audio_data.shape) == 2 and audio_data.shape[1] == 2:
+        return to_model_audio(audio_data[:, 0], sample_rate), to_model_audio(audio_data[:, 1], sample_rate)
+    if len(audio_data.shape) == 2:
+        audio_data = audio_data.mean(axis=1).astype(audio_data.dtype)
+    return to_model_audio(audio_data, sample_rate), None
+
+def process_audio(audio_file: Union[str, BinaryIO], interview_type='behavioral', history_key: Optional[str] = None,
+                  user_id: Optional[str] = None):
+    """
+    Process the audio file to extract speech from both interviewer and interviewee
+    and generate feedback.
+    
+    Args:
+        audio_file: Path to audio file or file-like object
+        interview_type: Type of interview for analysis
+        history_key: When given, the session is recorded in the history under this key
+        user_id: User the recorded session belongs to
+    
+    Returns:
+        dict: Feedback based on the interview analysis
+    """
+    logger.debug("Processing audio file: %s", getattr(audio_file, 'filename', audio_file))
+    
+    with span('decode'):
+        sample_rate, audio_data = decode_audio(audio_file)
+    return process_decoded_audio(sample_rate, audio_data, interview_type, history_key, user_id)
+
+def process_decoded_audio(sample_rate: int, audio_data: np.ndarray, interview_type='behavioral',
+                          history_key: Optional[str] = None, user_id: Optional[str] = None):
+    """
+    Run the transcription and analysis stages of process_audio on decoded audio.
+    
+    Args:
+        sample_rate: Sample rate of the decoded audio
+        audio_data: Samples from decode_audio, mono or stereo
+        interview_type: Type of interview for analysis
+        history_key: When given, the session is recorded in the history under this key
+        user_id: User the recorded session belongs to
+    
+    Returns:
+        dict: Feedback based on the interview analysis
+    """
+    return _finish_analysis(*_transcribe_decoded_audio(sample_rate, audio_data), interview_type, history_key, user_id)
+
+def prepare_batch_item(item_id: str, sample_rate: int, audio_data: np.ndarray, interview_type='behavioral'):
+    """
+    Run the transcription stages of process_decoded_audio, leaving the grading to analyze_transcripts_batch.
+    
+    Args:
+        item_id: Id of the item in the batch
+        sample_rate: Sample rate of the decoded audio
+        audio_data: Samples from decode_audio, mono or stereo
+        interview_type: Type of interview for analysis
+    
+    Returns:
+        dict: Batch item with the interviewee transcript, its conversation
+        context and question type, the duration and the delivery metrics
+    """
+    interviewee_transcript, interviewer_transcript, timeline, prosody, question_tracker, duration = \
+        _transcribe_decoded_audio(sample_rate, audio_data)
+    if not interviewee_transcript.strip():
+        logger.warning("Interviewee transcript is empty")
+        interviewee_transcript = EMPTY_TRANSCRIPT_PLACEHOLDER
+    context, question_type = _conversation_inputs(interviewer_transcript, interviewee_transcript,
+                                                  timeline if interviewer_transcript else None, question_tracker)
+    return {
+        'id': item_id,
+        'transcript': interviewee_transcript,
+        'interview_type': interview_type,
+        'question_type': question_type,
+        'context': context,
+        'duration': duration,
+        'prosody': prosody.summary()
+    }
+
+def _transcribe_decoded_audio(sample_rate: int, audio_data: np.ndarray):
+    """
+    Split, measure and transcribe decoded audio.
+    
+    Returns:
+        tuple: (interviewee transcript, interviewer transcript, timeline,
+        prosody tracker, question tracker, duration), as _finish_analysis takes them
+    """
+    logger.debug("Audio sample rate: %s Hz, shape: %s", sample_rate, audio_data.shape)
+    
+    # Split stereo channels (left: interviewee mic, right: interviewer from tab)
+    with span('channel_split', shape=audio_data.shape):
+        interviewee_audio, interviewer_audio = split_channels(audio_data, sample_rate)
+    duration = len(interviewee_audio) / SAMPLE_RATE
+    
+    # Delivery metrics over both channels, one vectorized pass each
+    prosody = ProsodyTracker()
+    with span('prosody'):
+        channels = {'mic': interviewee_audio}
+        if interviewer_audio is not None:
+            channels['tab'] = interviewer_audio
+        prosody.add_recording(channels)
+    
+    timeline = ConversationTimeline()
+    question_tracker = QuestionTracker()
+    with span('transcription', audio_seconds=duration):
+        interviewee_transcript, interviewee_segments = transcription_service.transcribe_segments(interviewee_audio)
+        timeline.add('mic', interviewee_segments)
+        prosody.add_segments('mic', interviewee_segments)
+        interviewer_transcript = ""
+        if interviewer_audio is not None:
+            interviewer_transcript, interviewer_segments = transcription_service.transcribe_segments(interviewer_audio)
+            timeline.add('tab', interviewer_segments)
+            prosody.add_segments('tab', interviewer_segments)
+            for _, _, text in interviewer_segments:
+                question_tracker.feed(text)
+    timeline.flush()
+    logger.debug("Transcript lengths - Interviewer: %d chars, Interviewee: %d chars",
+                 len(interviewer_transcript), len(interviewee_transcript))
+    return interviewee_transcript, interviewer_transcript, timeline, prosody, question_tracker, duration
+
+def _finish_analysis(interviewee_transcript: str, interviewer_transcript: str, timeline: ConversationTimeline,
+                     prosody: ProsodyTracker, question_tracker: QuestionTracker, duration: float,
+                     interview_type='behavioral',
+                     history_key: Optional[str] = None, user_id: Optional[str] = None):
+    """
+    Analyze transcribed channels and record the session in the history.
+    
+    The last stages of process_decoded_audio and StreamingAnalysis.finish.
+    
+    Returns:
+        dict: Feedback based on the interview analysis
+    """
+    if not interviewee_transcript.strip():
+        logger.warning("Interviewee transcript is empty")
+        interviewee_transcript = EMPTY_TRANSCRIPT_PLACEHOLDER
+    
+    # Analyze the combined conversation context (falls back to the interviewee
+    # response alone for mono audio)
+    feedback = analyze_interview_conversation(
+        interviewer_transcript,
+        interviewee_transcript,
+        interview_type,
+        duration=duration,
+        timeline=timeline if interviewer_transcript else None,
+        prosody=prosody.summary(),
+        question_tracker=question_tracker
+    )
+    
+    if history_key is not None:
+        # Only queued here; the history writer thread does the disk work
+        try:
+            get_history().record_session(
+                history_key, 'upload', timeline.format() if interviewer_transcript else interviewee_transcript,
+                feedback, interview_type=interview_type, duration=duration, turns=timeline.turns(), user_id=user_id
+            )
+        except Exception as e:
+            logger.error(f"Error recording session {history_key} in the history: {str(e)}")
+    return feedback
+
+class StreamingAnalysis:
+    def __init__(self, window_seconds: float = BATCH_WINDOW_SECONDS, transcribed: Optional[List[dict]] = None):
+        """
+        Initialize the transcription of a recording decoded while it is still arriving.
+        
+        Decoded samples are split into channels like split_channels and
+        buffered per channel. As soon as a channel holds more than a window,
+        the window is cut at its quietest point and transcribed, windowing
+        the audio the way transcribe_segments windows a whole file, so only
+        the last window is left for finish. Transcribed audio is measured for
+        prosody in the blocks ProsodyTracker.add_recording uses, both
+        channels in step, so the metrics match process_decoded_audio.
+        
+        Every transcribed window is recorded in windows. Passing those
+        records back as transcribed, to decode the same recording again,
+        reuses their text instead of transcribing the windows a second time.
+        
+        Args:
+            window_seconds: Length of the transcribed windows
+            transcribed: Windows recorded by an earlier analysis of the recording
+        """
+        self.window_seconds = window_seconds
+        self.sample_rate: Optional[int] = None
+        self.stereo = False
+        self.prosody = ProsodyTracker()
+        self.transcripts = {'mic': [], 'tab': []}
+        self.segments = {'mic': [], 'tab': []}
+        # Follows the interviewer's questions as their windows are transcribed
+        self.question_tracker = QuestionTracker()
+        self._pending = {'mic': [], 'tab': []}
+        self._pending_samples = {'mic': 0, 'tab': 0}
+        # Decoded samples of each channel already transcribed
+        self._consumed = {'mic': 0, 'tab': 0}
+        # Transcribed model audio of each channel not yet measured for prosody,
+        # and the model samples of every channel measured so far
+        self._unmeasured = {'mic': [], 'tab': []}
+        self._measured = 0
+        # Transcribed windows, and the earlier ones still to be reused
+        self.windows: List[dict] = []
+        self._replay = {'mic': [], 'tab': []}
+        for record in transcribed or []:
+            self._replay[record['channel']].append(record)
+    
+    @property
+    def seconds_transcribed(self) -> float:
+        """Seconds of the interviewee channel transcribed so far."""
+        return self._consumed['mic'] / self.sample_rate if self.sample_rate else 0.0
+    
+    def add(self, samples: np.ndarray, sample_rate: int):
+        """
+        Add the next decoded samples, transcribing every window they complete.
+        
+        Args:
+            samples: Decoded samples, shape (n,) or (n, channels)
+            sample_rate: Sample rate of the decoded audio
+        
+        Raises:
+            OverloadedError: If a window could not be admitted in time; the
+            samples are kept and transcribed on the next call
+        """
+        if self.sample_rate is None:
+            self.sample_rate = sample_rate
+        if samples.ndim == 2 and samples.shape[1] == 2:
+            self.stereo = True
+            channels = {'mic': samples[:, 0], 'tab': samples[:, 1]}
+        else:
+            if samples.ndim == 2:
+                samples = samples.mean(axis=1).astype(samples.dtype)
+            channels = {'mic': samples}
+        for channel, channel_samples in channels.items():
+            self._pending[channel].append(np.ascontiguousarray(channel_samples))
+            self._pending_samples[channel] += len(channel_samples)
+        
+        window = int(self.window_seconds * sample_rate)
+        for channel in channels:
+            while self._pending_samples[channel] > window:
+                self._transcribe_pending(channel, window)
+    
+    def _transcribe_pending(self, channel: str, window: Optional[int] = None):
+        """Transcribe the next window of a channel's buffered samples, or all of them."""
+        audio = np.concatenate(self._pending[channel]) if self._pending[channel] else np.array([], dtype=np.float32)
+        start = self._consumed[channel]
+        replay = self._replay[channel]
+        record = None
+        if replay and (replay[0]['start'] != start or not 0 < replay[0]['end'] - start <= len(audio)):
+            logger.warning(f"Recorded {channel} windows don't match the decoded audio, transcribing them again")
+            replay.clear()
+        
+        if replay:
+            record = replay.pop(0)
+            end = record['end'] - start
+        else:
+            end = len(audio)
+            if window is not None:
+                # Cut where transcribe_segments would, scaled to the decoded sample rate
+                _, end = split_windows(audio, window, search=self.sample_rate, frame=self.sample_rate // 50)[0]
+        
+        piece = to_model_audio(audio[:end], self.sample_rate)
+        if record is None:
+            with span('transcription', audio_seconds=len(piece) / SAMPLE_RATE):
+                text, segments = transcription_service.transcribe_segments(piece)
+            record = {'channel': channel, 'start': start, 'end': start + end, 'text': text,
+                      'segments': [list(segment) for segment in segments]}
+        text, segments = record['text'], record['segments']
+        self.windows.append(record)
+        offset = start / self.sample_rate
+        self._unmeasured[channel].append(piece)
+        segments = [(offset + segment_start, offset + segment_end, segment_text)
+                    for segment_start, segment_end, segment_text in segments]
+        self.prosody.add_segments(channel, segments)
+        if text:
+            self.transcripts[channel].append(text)
+        self.segments[channel].extend(segments)
+        if channel == 'tab':
+            for _, _, segment_text in segments:
+                self.question_tracker.feed(segment_text)
+        
+        self._pending[channel] = [audio[end:]]
+        self._pending_samples[channel] = len(audio) - end
+        self._consumed[channel] += end
+        self._measure_prosody()
+    
+    def _measure_prosody(self, final: bool = False):
+        """Measure the whole blocks every channel has transcribed, or all the rest when final."""
+        channels = ['mic', 'tab'] if self.stereo else ['mic']
+        audio = {
+            channel: np.concatenate(self._unmeasured[channel]) if self._unmeasured[channel] else np.array([], dtype=np.float32)
+            for channel in channels
+        }
+        if final:
+            length = max(len(samples) for samples in audio.values())
+        else:
+            block = max(1, int(RECORDING_BLOCK_SECONDS * SAMPLE_RATE))
+            length = min(len(samples) for samples in audio.values()) // block * block
+        if not length:
+            return
+        with span('prosody'):
+            self.prosody.add_recording({channel: samples[:length] for channel, samples in audio.items()},
+                                       self._measured / SAMPLE_RATE)
+        for channel, samples in audio.items():
+            self._unmeasured[channel] = [samples[length:]]
+        self._measured += length
+    
+    def finish(self, interview_type='behavioral', history_key: Optional[str] = None, user_id: Optional[str] = None):
+        """
+        Transcribe the rest of the audio and analyze the whole recording, as process_decoded_audio.
+        
+        Returns:
+            dict: Feedback based on the interview analysis
+        
+        Raises:
+            ValueError: If no audio was added
+        """
+        if self.sample_rate is None:
+            raise ValueError('No audio was decoded from the upload')
+        channels = ['mic', 'tab'] if self.stereo else ['mic']
+        for channel in channels:
+            while self._pending_samples[channel]:
+                self._transcribe_pending(channel)
+        self._measure_prosody(final=True)
+        
+        timeline = ConversationTimeline()
+        for channel in channels:
+            timeline.add(channel, self.segments[channel])
+        timeline.flush()
+        interviewee_transcript = " ".join(self.transcripts['mic'])
+        interviewer_transcript = " ".join(self.transcripts['tab'])
+        duration = self._consumed['mic'] / self.sample_rate
+        logger.debug("Transcript lengths - Interviewer: %d chars, Interviewee: %d chars",
+                     len(interviewer_transcript), len(interviewee_transcript))
+        return _finish_analysis(interviewee_transcript, interviewer_transcript, timeline, self.prosody,
+                                self.question_tracker, duration, interview_type, history_key, user_id)
+
 def get_current_transcription(channel: str = None) -> str:
     """
     Get the current transcription from the transcription service.
@@ -129,66 +460,75 @@ def get_current_transcription(channel: str = None) -> str:
     """
     return transcription_service.get_transcription(channel)
 
-def analyze_interview_conversation(interviewer_text, interviewee_text, interview_type='behavioral'):
+def analyze_interview_conversation(interviewer_text, interviewee_text, interview_type='behavioral', duration=None,
+                                   timeline=None, prosody=None, question_tracker=None):
     """
     Analyze both sides of the conversation to provide context-aware feedback
-    """
-    from .nlp_analysis import analyze_transcript
-    
-    print("\nIn analyze_interview_conversation function")
-    print(f"Interviewer text length: {len(interviewer_text)} chars")
-    print(f"Interviewee text length: {len(interviewee_text)} chars")
-    
-    # If we couldn't capture interviewer audio clearly
-    if not interviewer_text:
-        print("No interviewer text, analyzing just interviewee response")
-        return analyze_transcript(interviewee_text, interview_type)
     
-    # Process the full conversation context
-    full_context = f"Interviewer: {interviewer_text}\n\nInterviewee: {interviewee_text}"
-    print(f"Created full context with length: {len(full_context)} chars")
+    When a ConversationTimeline is given, the context and question type come
+    from its speaker turns rather than the whole-channel transcripts. Delivery
+    metrics (ProsodyTracker.summary) are returned with the feedback. A
+    QuestionTracker that followed the interviewer channel as it was
+    transcribed gives the fallback question type without reclassifying the
+    whole transcript.
+    """
+    logger.debug("Interviewer text length: %d chars, interviewee text length: %d chars",
+                 len(interviewer_text), len(interviewee_text))
     
-    # Extract the interview question type from interviewer text
-    question_type = detect_question_type(interviewer_text)
-    print(f"Detected question type: {question_type}")
+    full_context, question_type = _conversation_inputs(interviewer_text, interviewee_text, timeline, question_tracker)
     
     # Analyze interviewee response with full context
-    print("Calling analyze_transcript with full context...")
-    result = analyze_transcript(
+    return analyze_transcript(
         interviewee_text, 
         interview_type, 
         context=full_context,
-        question_type=question_type
+        question_type=question_type,
+        duration=duration,
+        prosody=prosody
     )
-    print(f"Result received from analyze_transcript. Type: {type(result)}")
-    return result
 
-def detect_question_type(interviewer_text):
+def _conversation_inputs(interviewer_text, interviewee_text, timeline=None, question_tracker=None):
     """
-    Detect the type of behavioral question being asked
-    """
-    interviewer_text = interviewer_text.lower()
+    Build the conversation context and detect the question type for analyze_interview_conversation.
     
-    # Define question type patterns
-    question_types = {
-        'challenge': ['challenge', 'difficult', 'overcome', 'problem', 'obstacle'],
-        'leadership': ['lead', 'leadership', 'team', 'influence', 'guide', 'mentor'],
-        'failure': ['fail', 'mistake', 'wrong', 'unsuccessful', 'learned'],
-        'success': ['success', 'achievement', 'proud', 'accomplish'],
-        'conflict': ['conflict', 'disagree', 'tension', 'resolution', 'solve'],
-        'teamwork': ['team', 'collaborate', 'group', 'cooperation'],
-        'initiative': ['initiative', 'beyond', 'proactive', 'volunteer']
-    }
+    Returns:
+        tuple: (context, question type), both None when there is no interviewer text
+    """
+    # If we couldn't capture interviewer audio clearly
+    if not interviewer_text:
+        logger.debug("No interviewer text, analyzing just interviewee response")
+        return None, None
     
-    # Find matches
-    matches = {}
-    for qtype, keywords in question_types.items():
-        count = sum(1 for keyword in keywords if keyword in interviewer_text)
-        if count > 0:
-            matches[qtype] = count
+    # Build the conversation context within the prompt token budget
+    with span('prompt_build'):
+        if timeline is not None:
+            full_context = build_timeline_context(timeline.turns())
+        else:
+            full_context = build_conversation_context(interviewer_text, interviewee_text)
     
-    if not matches:
-        return 'general'
+    # Extract the interview question type from the last question asked,
+    # falling back to the whole interviewer transcript
+    with span('question_detection'):
+        question_type = 'general'
+        if timeline is not None:
+            question, _ = timeline.last_exchange()
+            if question is not None:
+                question_type = detect_question_type(question.text)
+        if question_type == 'general':
+            if question_tracker is not None:
+                question_type = question_tracker.current_type()
+            else:
+                question_type = detect_question_type(interviewer_text)
+    logger.debug("Detected question type: %s", question_type)
+    return full_context, question_type
+
+def detect_question_type(interviewer_text):
+    """
+    Detect the type of the most recent behavioral question being asked
     
-    # Return the type with the most keyword matches
-    return max(matches.keys(), key=matches.get)
\ No newline at end of file
+    For one-off text such as a single question; streams keep their own
+    QuestionTracker and feed it as segments arrive.
+    """
+    tracker = QuestionTracker()
+    tracker.feed(interviewer_text)
+    return tracker.current_type()
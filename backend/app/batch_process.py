@@ -0,0 +1,310 @@
+"""
+Transcribe and analyze a directory or manifest of recordings in bulk.
+
+Each recording goes through the same decode and transcription stages as
+the /analyze endpoint, spread over a pool of worker processes that each load
+their own Whisper model. The transcribed files are graded together with
+analyze_transcripts_batch, up to --batch-size at a time, so a run makes one
+Gemini call per batch instead of one per file. Results are appended to a
+JSONL file as their batch is graded, and files already recorded there are
+skipped, so an interrupted run picks up where it stopped:
+
+    python -m app.batch_process recordings/ --output results.jsonl --workers 4
+    python -m app.batch_process manifest.txt --interview-type technical
+    python -m app.batch_process recordings/ --retry-errors
+
+A manifest is a text file with one path per line, or a JSONL file with a
+'path' and optionally an 'interview_type' per line; relative paths are
+resolved against the manifest's directory.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+# Add the backend directory to Python path for imports
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+# Recording formats decode_audio handles, as accepted by /analyze
+AUDIO_EXTENSIONS = {'.wav', '.webm', '.mp3'}
+
+# Seconds between progress lines while work is running
+PROGRESS_INTERVAL = 10.0
+
+# Index of this worker process, set by _init_worker
+_worker_index = 0
+
+
+def find_recordings(source: str, interview_type: str) -> List[Tuple[str, str]]:
+    """
+    List the recordings in a directory (recursively) or a manifest.
+
+    Returns:
+        list: (absolute path, interview type) of each recording, sorted by
+        path for directories and in manifest order otherwise
+    """
+    if os.path.isdir(source):
+        recordings = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                    recordings.append((os.path.abspath(os.path.join(root, name)), interview_type))
+        return sorted(recordings)
+
+    base = os.path.dirname(os.path.abspath(source))
+    recordings = []
+    with open(source) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                entry = json.loads(line)
+                path, entry_type = entry['path'], entry.get('interview_type', interview_type)
+            else:
+                path, entry_type = line, interview_type
+            recordings.append((os.path.abspath(os.path.join(base, path)), entry_type))
+    return recordings
+
+
+def file_key(path: str) -> Dict[str, object]:
+    """Get the fields identifying one version of a file in the results manifest."""
+    stat = os.stat(path)
+    return {'path': path, 'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+
+
+def load_finished(output: str, retry_errors: bool = False) -> set:
+    """
+    Read the results written by earlier runs.
+
+    Returns:
+        set: (path, size, mtime) of every file with a recorded result; files
+        that failed are left out when retry_errors is set. A file changed
+        since its result was written no longer matches and is processed again.
+    """
+    finished = set()
+    if not os.path.exists(output):
+        return finished
+    with open(output) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a partial last line
+                continue
+            if retry_errors and result.get('status') != 'ok':
+                continue
+            finished.add((result['path'], result['size'], result['mtime']))
+    return finished
+
+
+def _init_worker(counter, workers: int):
+    """Pin the worker's share of the CPU and load the pipeline once per process."""
+    global _worker_index
+    with counter.get_lock():
+        _worker_index = counter.value
+        counter.value += 1
+
+    from app.cpu_profile import apply_cpu_profile
+    apply_cpu_profile(worker_index=_worker_index, workers=workers,
+                      intra_op_threads=max(1, (os.cpu_count() or 1) // workers))
+    # Importing the pipeline loads the Whisper model
+    import app.audio_processing  # noqa: F401
+
+
+def process_file(path: str, interview_type: str, item_id: str) -> dict:
+    """
+    Decode and transcribe one recording in a worker process.
+
+    Returns:
+        dict: The result line: the file key, status, audio length and
+        processing time, with the batch item to grade (grade_results), or the
+        error message if the file failed
+    """
+    from app.audio_processing import decode_audio, prepare_batch_item
+
+    result = file_key(path)
+    result['interview_type'] = interview_type
+    result['worker'] = _worker_index
+    started = time.perf_counter()
+    try:
+        sample_rate, audio_data = decode_audio(path)
+        result['audio_seconds'] = round(len(audio_data) / sample_rate, 2)
+        result['item'] = prepare_batch_item(item_id, sample_rate, audio_data, interview_type)
+        result['status'] = 'ok'
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {str(e)}"
+    result['processing_seconds'] = round(time.perf_counter() - started, 2)
+    return result
+
+
+def grade_results(results: List[dict]):
+    """Grade the transcribed results together, replacing each one's batch item with its feedback."""
+    from app.nlp_analysis import analyze_transcripts_batch
+
+    items = [result.pop('item') for result in results]
+    started = time.perf_counter()
+    try:
+        feedback = analyze_transcripts_batch(items)
+    except Exception as e:
+        for result in results:
+            result['status'] = 'error'
+            result['error'] = f"{type(e).__name__}: {str(e)}"
+        return
+    # Each file's share of the grading time
+    share = (time.perf_counter() - started) / len(results)
+    for result, item in zip(results, items):
+        result['feedback'] = feedback[str(item['id'])]
+        result['processing_seconds'] = round(result['processing_seconds'] + share, 2)
+
+
+def format_duration(seconds: float) -> str:
+    """Format seconds as H:MM:SS."""
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class Progress:
+    def __init__(self, total: int):
+        """
+        Initialize progress reporting for a run.
+
+        Args:
+            total: Number of files to process in this run
+        """
+        self.total = total
+        self.done = 0
+        self.errors = 0
+        self.audio_seconds = 0.0
+        self.started = time.monotonic()
+        self._last_report = 0.0
+        self._last_done = 0
+
+    def add(self, result: dict):
+        """Count a finished file."""
+        self.done += 1
+        if result['status'] != 'ok':
+            self.errors += 1
+        self.audio_seconds += result.get('audio_seconds', 0.0)
+
+    def line(self) -> str:
+        """Format files done, throughput, audio speed-up and the estimated time left."""
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else None
+        speedup = self.audio_seconds / elapsed if elapsed > 0 else 0.0
+        return (
+            f"{self.done}/{self.total} files ({self.errors} failed) | "
+            f"{rate * 60:.1f} files/min | {speedup:.1f}x real time | "
+            f"elapsed {format_duration(elapsed)} | "
+            f"ETA {format_duration(eta) if eta is not None else '?'}"
+        )
+
+    def report(self, force: bool = False):
+        """Print a progress line at most every PROGRESS_INTERVAL seconds, if anything finished since the last one."""
+        now = time.monotonic()
+        if self.done == self._last_done:
+            return
+        if force or now - self._last_report >= PROGRESS_INTERVAL:
+            self._last_report = now
+            self._last_done = self.done
+            print(self.line(), flush=True)
+
+
+def run(recordings: List[Tuple[str, str]], output: str, workers: int,
+        retry_errors: bool = False, batch_size: Optional[int] = None) -> Progress:
+    """
+    Process every recording without a result in output, appending results as their batch is graded.
+
+    Args:
+        batch_size: Transcribed files graded together, BATCH_MAX_ITEMS by default
+
+    Returns:
+        Progress: Counts and throughput of the run
+    """
+    finished = load_finished(output, retry_errors)
+    pending = []
+    for path, interview_type in recordings:
+        try:
+            key = file_key(path)
+        except OSError as e:
+            print(f"Skipping {path}: {str(e)}", file=sys.stderr)
+            continue
+        if (key['path'], key['size'], key['mtime']) not in finished:
+            pending.append((path, interview_type))
+
+    skipped = len(recordings) - len(pending)
+    print(f"{len(pending)} recording(s) to process, {skipped} already done or unreadable, {workers} worker(s)")
+    progress = Progress(len(pending))
+    if not pending:
+        return progress
+
+    if batch_size is None:
+        from app.nlp_analysis import BATCH_MAX_ITEMS
+        batch_size = BATCH_MAX_ITEMS
+
+    def write(finished: List[dict]):
+        for result in finished:
+            result['finished_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+            results.write(json.dumps(result) + '\n')
+            progress.add(result)
+            if result['status'] != 'ok':
+                print(f"Failed {result['path']}: {result['error']}", file=sys.stderr)
+        results.flush()
+        progress.report()
+
+    counter = multiprocessing.Value('i', 0)
+    transcribed = []
+    with open(output, 'a') as results, ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(counter, workers)
+    ) as pool:
+        futures = {pool.submit(process_file, path, interview_type, str(index)): path
+                   for index, (path, interview_type) in enumerate(pending)}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker itself died; record the file as failed
+                result = dict(file_key(futures[future]), status='error', error=f"{type(e).__name__}: {str(e)}")
+            if result['status'] != 'ok':
+                write([result])
+                continue
+            transcribed.append(result)
+            if len(transcribed) >= batch_size:
+                grade_results(transcribed)
+                write(transcribed)
+                transcribed = []
+        if transcribed:
+            grade_results(transcribed)
+            write(transcribed)
+    progress.report(force=True)
+    return progress
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help='Directory of recordings, or a manifest file')
+    parser.add_argument('--output', default='batch_results.jsonl', help='JSONL results file, also used to skip finished files')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // 4),
+                        help='Worker processes, each with its own model')
+    parser.add_argument('--interview-type', default='behavioral', help='Interview type for files without one')
+    parser.add_argument('--retry-errors', action='store_true', help='Process files that failed in an earlier run again')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='Transcribed files graded in one batch (default: BATCH_MAX_ITEMS)')
+    args = parser.parse_args(argv)
+
+    recordings = find_recordings(args.source, args.interview_type)
+    progress = run(recordings, args.output, max(1, args.workers), args.retry_errors,
+                   max(1, args.batch_size) if args.batch_size else None)
+    return 1 if progress.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
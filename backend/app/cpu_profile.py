@@ -0,0 +1,130 @@
+import logging
+import os
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Torch intra-op threads per process (0 keeps torch's default of one per core)
+TORCH_INTRAOP_THREADS = int(os.getenv("TORCH_INTRAOP_THREADS", "0"))
+
+# Torch inter-op threads per process (0 keeps torch's default)
+TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", "0"))
+
+# CPU pinning: 'none', 'auto' (an even slice of the cores per worker) or an
+# explicit core list such as '0-3,8'
+CPU_AFFINITY = os.getenv("CPU_AFFINITY", "none").lower()
+
+# Dynamic quantization applied to the Whisper linear layers: 'none' or 'int8'
+WHISPER_QUANTIZE = os.getenv("WHISPER_QUANTIZE", "none").lower()
+
+
+def parse_cpu_list(spec: str) -> List[int]:
+    """Parse a core list such as '0-3,8' into [0, 1, 2, 3, 8]."""
+    cores = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-', 1)
+            cores.extend(range(int(first), int(last) + 1))
+        else:
+            cores.append(int(part))
+    return cores
+
+
+def worker_cores(worker_index: int, workers: int, available: List[int]) -> List[int]:
+    """
+    Get the slice of cores a worker is pinned to under CPU_AFFINITY=auto.
+
+    Cores are split into contiguous, equal slices; with more workers than
+    cores, workers share cores round-robin.
+    """
+    if workers <= 0 or not available:
+        return list(available)
+    per_worker = max(1, len(available) // workers)
+    start = (worker_index * per_worker) % len(available)
+    return available[start:start + per_worker]
+
+
+def apply_cpu_profile(worker_index: int = 0, workers: int = 1, intra_op_threads: Optional[int] = None,
+                      inter_op_threads: Optional[int] = None, affinity: Optional[str] = None):
+    """
+    Apply the CPU execution profile to this process.
+
+    Must run before the first inference: torch only accepts inter-op thread
+    settings before any parallel work has started.
+
+    Args:
+        worker_index: Index of this worker among the server's workers
+        workers: Number of workers sharing the machine
+        intra_op_threads: Overrides TORCH_INTRAOP_THREADS
+        inter_op_threads: Overrides TORCH_INTEROP_THREADS
+        affinity: Overrides CPU_AFFINITY
+    """
+    import torch
+
+    affinity = (affinity or CPU_AFFINITY).lower()
+    if affinity != 'none' and hasattr(os, 'sched_setaffinity'):
+        available = sorted(os.sched_getaffinity(0))
+        cores = worker_cores(worker_index, workers, available) if affinity == 'auto' else parse_cpu_list(affinity)
+        try:
+            os.sched_setaffinity(0, cores)
+            logger.info(f"Pinned worker {worker_index} to cores {cores}")
+        except OSError as e:
+            logger.warning(f"Could not pin worker {worker_index} to cores {cores}: {str(e)}")
+    elif affinity != 'none':
+        logger.warning("CPU pinning is not supported on this platform")
+
+    intra_op_threads = intra_op_threads or TORCH_INTRAOP_THREADS
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+
+    inter_op_threads = inter_op_threads or TORCH_INTEROP_THREADS
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            logger.warning(f"Could not set inter-op threads: {str(e)}")
+
+    logger.info(f"Torch threads: {torch.get_num_threads()} intra-op, {torch.get_num_interop_threads()} inter-op")
+
+
+def quantize_model(model):
+    """
+    Apply dynamic int8 quantization to a Whisper model's linear layers.
+
+    Whisper's own Linear subclass casts its weights on every call, which
+    quantize_dynamic doesn't recognize, so those layers are first swapped for
+    plain nn.Linear modules holding the same weights. Only CPU inference is
+    supported.
+
+    Returns:
+        The quantized model (the input model is modified in place)
+    """
+    import torch
+    from torch import nn
+
+    def to_plain_linear(module):
+        for name, child in module.named_children():
+            if isinstance(child, nn.Linear) and type(child) is not nn.Linear:
+                linear = nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                linear.load_state_dict(child.state_dict())
+                setattr(module, name, linear)
+            else:
+                to_plain_linear(child)
+
+    model = model.cpu().float().eval()
+    to_plain_linear(model)
+    return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def prepare_model(model, quantize: Optional[str] = None):
+    """Apply the configured quantization, if any, to a freshly loaded model."""
+    quantize = (quantize or WHISPER_QUANTIZE).lower()
+    if quantize == 'int8':
+        logger.info("Applying dynamic int8 quantization to the Whisper model")
+        return quantize_model(model)
+    if quantize != 'none':
+        logger.warning(f"Unknown WHISPER_QUANTIZE value {quantize!r}; using the fp32 model")
+    return model
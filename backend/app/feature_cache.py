@@ -0,0 +1,209 @@
+import os
+import threading
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+# Whisper's front end: 25 ms Hann windows every 10 ms at 16 kHz
+N_FFT = 400
+HOP_LENGTH = 160
+N_FRAMES = 3000  # frames in one 30 s decoder window
+
+# Seconds of log-mel frames kept per channel (0 disables the cache)
+FEATURE_CACHE_SECONDS = float(os.getenv("FEATURE_CACHE_SECONDS", "60"))
+
+# log10 of the power floor whisper clamps to; also used for padding frames
+LOG_FLOOR = -10.0
+
+# Seconds per timestamp token; the encoder halves the frame rate
+SECONDS_PER_TIMESTAMP = 2 * HOP_LENGTH / 16000
+
+# model.transcribe's decoding fallback: a window is decoded again at the next
+# temperature while its output is too repetitive or too unlikely
+TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+_filters = {}
+_filters_lock = threading.Lock()
+
+
+def mel_filters(n_mels: int) -> np.ndarray:
+    """Get Whisper's mel filterbank as a (n_mels, N_FFT // 2 + 1) array."""
+    with _filters_lock:
+        if n_mels not in _filters:
+            import whisper.audio
+            _filters[n_mels] = whisper.audio.mel_filters('cpu', n_mels).numpy()
+        return _filters[n_mels]
+
+
+def normalize(log_spec: np.ndarray) -> np.ndarray:
+    """
+    Apply Whisper's per-input dynamic range clamp and scaling to raw log10 mel frames.
+
+    The clamp depends on the loudest frame of the input, so it is applied
+    per decoded window rather than stored in the cache.
+    """
+    log_spec = np.maximum(log_spec, log_spec.max() - 8.0)
+    return (log_spec + 4.0) / 4.0
+
+
+class StreamingLogMel:
+    def __init__(self, n_mels: int = 80, max_seconds: float = FEATURE_CACHE_SECONDS, start_sample: int = 0,
+                 sample_rate: int = 16000):
+        """
+        Initialize a streaming log-mel extractor for one channel.
+
+        Frames are computed once as audio arrives, matching Whisper's
+        centered STFT (reflect padding at the start of the stream), and the
+        raw log10 mel frames are kept in a bounded ring buffer.
+
+        Args:
+            n_mels: Mel bands of the model the features feed
+            max_seconds: Seconds of frames kept
+            start_sample: Channel sample index of the first appended sample
+            sample_rate: Sample rate of the appended audio
+        """
+        self.n_mels = n_mels
+        self.start_sample = start_sample
+        self.capacity = max(1, int(max_seconds * sample_rate / HOP_LENGTH))
+        self._frames = np.full((n_mels, self.capacity), LOG_FLOOR, dtype=np.float32)
+        # Index of the next frame to compute, counted from start_sample
+        self.next_frame = 0
+        self._tail = np.array([], dtype=np.float32)
+        self._started = False
+        # Periodic Hann window, as torch.hann_window
+        self._window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(N_FFT) / N_FFT)).astype(np.float32)
+        self._lock = threading.Lock()
+
+    def append(self, samples: np.ndarray):
+        """Compute and cache the frames completed by new samples."""
+        with self._lock:
+            self._tail = np.concatenate([self._tail, np.asarray(samples, dtype=np.float32)])
+            if not self._started:
+                if len(self._tail) <= N_FFT // 2:
+                    return
+                # Reflect-pad the start of the stream, as a centered STFT does
+                self._tail = np.concatenate([self._tail[1:N_FFT // 2 + 1][::-1], self._tail])
+                self._started = True
+            if len(self._tail) < N_FFT:
+                return
+            count = (len(self._tail) - N_FFT) // HOP_LENGTH + 1
+            frames = self._log_mel(self._tail, count)
+            positions = (self.next_frame + np.arange(count)) % self.capacity
+            self._frames[:, positions] = frames
+            self.next_frame += count
+            self._tail = self._tail[count * HOP_LENGTH:]
+
+    def _log_mel(self, audio: np.ndarray, count: int) -> np.ndarray:
+        """Raw log10 mel frames of count windows starting at audio[0]."""
+        strided = np.lib.stride_tricks.as_strided(
+            audio, shape=(count, N_FFT), strides=(audio.strides[0] * HOP_LENGTH, audio.strides[0])
+        )
+        power = np.abs(np.fft.rfft(strided * self._window, axis=1)) ** 2
+        mel = mel_filters(self.n_mels) @ power.T
+        return np.log10(np.maximum(mel, 1e-10)).astype(np.float32)
+
+    def window(self, start_sample: int, end_sample: int) -> Optional[np.ndarray]:
+        """
+        Get the raw log10 mel frames covering channel samples [start, end).
+
+        Frames still waiting for their right-hand context are computed on
+        the fly with zero padding, like Whisper does at the end of an input,
+        and are not cached.
+
+        Returns:
+            np.ndarray: (n_mels, frames) array, or None if the start of the
+            range has left the cache or was never appended
+        """
+        first = int(round((start_sample - self.start_sample) / HOP_LENGTH))
+        last = (end_sample - self.start_sample) // HOP_LENGTH
+        with self._lock:
+            if first < max(0, self.next_frame - self.capacity) or last <= first or not self._started:
+                return None
+            cached_last = min(last, self.next_frame)
+            positions = np.arange(first, cached_last) % self.capacity
+            frames = self._frames[:, positions]
+            if last > self.next_frame:
+                missing = last - self.next_frame
+                padded = np.concatenate([self._tail, np.zeros(N_FFT, dtype=np.float32)])
+                available = (len(padded) - N_FFT) // HOP_LENGTH + 1
+                frames = np.concatenate([frames, self._log_mel(padded, min(missing, available))], axis=1)
+            return frames
+
+
+def timed_segments(tokens: Sequence[int], timestamp_begin: int, decode: Callable[[List[int]], str],
+                   duration: float) -> List[dict]:
+    """
+    Split tokens decoded with timestamps into timed segments.
+
+    Text between two timestamp tokens is one segment, as in model.transcribe;
+    text left without a closing timestamp runs to the end of the window.
+
+    Args:
+        tokens: Decoded tokens, timestamps included
+        timestamp_begin: Id of the <|0.00|> timestamp token
+        decode: Callable turning text tokens into a string
+        duration: Seconds of audio in the window; timestamps are clipped to it
+
+    Returns:
+        list: {'start', 'end', 'text'} segments in seconds
+    """
+    segments = []
+    start = 0.0
+    text_tokens: List[int] = []
+    for token in list(tokens) + [None]:
+        if token is not None and token < timestamp_begin:
+            text_tokens.append(token)
+            continue
+        at = duration if token is None else min((token - timestamp_begin) * SECONDS_PER_TIMESTAMP, duration)
+        if text_tokens:
+            text = decode(text_tokens).strip()
+            if text:
+                segments.append({'start': min(start, at), 'end': at, 'text': text})
+            text_tokens = []
+        start = at
+    return segments
+
+
+def decode_features(model, log_spec: np.ndarray, language: Optional[str] = None) -> dict:
+    """
+    Decode cached log-mel frames of at most one 30 s window with a Whisper model.
+
+    Runs only the model pass: the frames are padded to the decoder window,
+    normalized and passed to whisper.decode without recomputing the STFT.
+    Like model.transcribe, a window whose output is too repetitive or too
+    unlikely is decoded again at rising temperatures, and timestamps are
+    decoded so the window keeps its segment timing.
+
+    Returns:
+        dict: 'text' and timed 'segments', as model.transcribe would return
+    """
+    import torch
+    import whisper
+    from whisper.tokenizer import get_tokenizer
+
+    frames = log_spec.shape[1]
+    padded = np.full((log_spec.shape[0], N_FRAMES), LOG_FLOOR, dtype=np.float32)
+    padded[:, :min(frames, N_FRAMES)] = log_spec[:, :N_FRAMES]
+    mel = torch.from_numpy(normalize(padded)).to(model.device)
+
+    for temperature in TEMPERATURES:
+        options = whisper.DecodingOptions(language=language, temperature=temperature, fp16=False)
+        result = whisper.decode(model, mel, options)
+        needs_fallback = (result.compression_ratio > COMPRESSION_RATIO_THRESHOLD or
+                          result.avg_logprob < LOGPROB_THRESHOLD)
+        # Likely silence isn't retried; it is dropped below if it also decoded poorly
+        if not needs_fallback or result.no_speech_prob > NO_SPEECH_THRESHOLD:
+            break
+
+    # Same silence test as model.transcribe
+    if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+        return {'text': '', 'segments': []}
+
+    tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages,
+                              language=result.language, task='transcribe')
+    duration = min(frames, N_FRAMES) * HOP_LENGTH / 16000
+    segments = timed_segments(result.tokens, tokenizer.timestamp_begin, tokenizer.decode, duration)
+    return {'text': result.text.strip(), 'segments': segments}
@@ -0,0 +1,628 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from .local_analysis import compute_metrics
+from .question_classifier import QuestionTracker
+from .timeline import Turn
+
+logger = logging.getLogger(__name__)
+
+# SQLite database holding the history of analyzed sessions
+HISTORY_DB = os.getenv("HISTORY_DB", os.path.join(os.getcwd(), "history.db"))
+
+# Most sessions written in one transaction by the history writer
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "64"))
+
+# Default and largest page size of the history list and search queries
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
+# User sessions are recorded under when the client doesn't name one
+DEFAULT_USER = "anonymous"
+
+# Default and longest window of days returned by progress queries
+PROGRESS_DAYS = 30
+PROGRESS_MAX_DAYS = 366
+
+# Feedback types counted separately in the daily rollups
+FEEDBACK_TYPES = ('positive', 'neutral', 'constructive')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    session_key TEXT NOT NULL UNIQUE,
+    source TEXT NOT NULL,
+    interview_type TEXT,
+    question_type TEXT,
+    created_at REAL NOT NULL,
+    duration REAL,
+    transcript TEXT NOT NULL DEFAULT '',
+    feedback_type TEXT,
+    score REAL,
+    message TEXT,
+    feedback TEXT
+);
+CREATE INDEX IF NOT EXISTS sessions_created ON sessions (created_at);
+CREATE INDEX IF NOT EXISTS sessions_question_type ON sessions (question_type, created_at);
+
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    speaker TEXT NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_session ON segments (session_id, start);
+
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    start REAL,
+    question TEXT NOT NULL,
+    question_type TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS questions_session ON questions (session_id, start);
+"""
+
+# Schema changes after _SCHEMA (version 1), in order from version 2; PRAGMA
+# user_version holds the version a database is at
+_MIGRATIONS = [
+    # Per-user sessions, answer metrics, and daily rollups per user and
+    # question type, kept up to date as sessions are written
+    """
+    ALTER TABLE sessions ADD COLUMN user_id TEXT NOT NULL DEFAULT 'anonymous';
+    ALTER TABLE sessions ADD COLUMN word_count INTEGER;
+    ALTER TABLE sessions ADD COLUMN filler_density REAL;
+    CREATE INDEX IF NOT EXISTS sessions_user ON sessions (user_id, created_at);
+    CREATE TABLE IF NOT EXISTS daily_rollups (
+        user_id TEXT NOT NULL,
+        day TEXT NOT NULL,
+        question_type TEXT NOT NULL,
+        sessions INTEGER NOT NULL DEFAULT 0,
+        positive INTEGER NOT NULL DEFAULT 0,
+        neutral INTEGER NOT NULL DEFAULT 0,
+        constructive INTEGER NOT NULL DEFAULT 0,
+        scored INTEGER NOT NULL DEFAULT 0,
+        score_sum REAL NOT NULL DEFAULT 0,
+        word_sum INTEGER NOT NULL DEFAULT 0,
+        filler_sum REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day, question_type)
+    ) WITHOUT ROWID;
+    """
+]
+
+# Full-text index over segment text, kept in step with the segments table
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5 (text, content='segments', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS segments_fts_insert AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_fts_delete AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+# Columns of a session summary, as returned by list_sessions and search
+_SUMMARY_COLUMNS = ('session_key', 'user_id', 'source', 'interview_type', 'question_type', 'created_at',
+                    'duration', 'feedback_type', 'score', 'message')
+
+# Counter columns of daily_rollups
+_ROLLUP_COLUMNS = ('sessions',) + FEEDBACK_TYPES + ('scored', 'score_sum', 'word_sum', 'filler_sum')
+
+
+def questions_from_turns(turns: Iterable[Turn]) -> List[Tuple[float, str, str]]:
+    """
+    Classify the questions asked in the interviewer turns of a timeline.
+
+    Returns:
+        list: (start of the turn completing the question, question, question type), in order
+    """
+    tracker = QuestionTracker()
+    questions = []
+    for turn in turns:
+        if turn.speaker == 'interviewer':
+            questions.extend((turn.start, question, qtype) for question, qtype in tracker.feed(turn.text))
+    return questions
+
+
+def fts_query(text: str) -> str:
+    """
+    Quote each word of a user's search so FTS5 matches all of them without
+    operator syntax; the last word also matches as a prefix, for searching as
+    the user types.
+    """
+    terms = ['"' + word.replace('"', '""') + '"' for word in text.split()]
+    if terms:
+        terms[-1] += '*'
+    return " ".join(terms)
+
+
+def rollup_day(timestamp: float) -> str:
+    """Get the UTC day a session is rolled up in, as YYYY-MM-DD."""
+    return time.strftime('%Y-%m-%d', time.gmtime(timestamp))
+
+
+def answer_metrics(feedback: dict, answer: str, question_type: Optional[str] = None,
+                   duration: Optional[float] = None) -> Tuple[int, float]:
+    """
+    Get the word count and filler density of an answer.
+
+    Local feedback already carries the metrics it was scored on; other
+    feedback is measured with the same compute_metrics.
+
+    Returns:
+        tuple: (word count, filler density)
+    """
+    metrics = (feedback.get('details') or {}).get('metrics')
+    if not metrics:
+        metrics = compute_metrics(answer, question_type, duration)
+    return metrics['word_count'], metrics['filler_density']
+
+
+def encode_cursor(created_at: float, row_id: int) -> str:
+    """Encode the position after a session in the list as an opaque page cursor."""
+    return f"{created_at!r}_{row_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """
+    Decode a cursor from encode_cursor into (created_at, id).
+
+    Raises:
+        ValueError: If cursor was not returned by list_sessions
+    """
+    created_at, row_id = cursor.rsplit('_', 1)
+    return float(created_at), int(row_id)
+
+
+class HistoryStore:
+    def __init__(self, path: str = HISTORY_DB, batch_size: int = HISTORY_BATCH_SIZE):
+        """
+        Initialize the persistent history of analyzed sessions.
+
+        record_session only queues a session; a single writer thread owns
+        the write connection and commits whatever is queued in one
+        transaction, so requests never wait on disk. Queries run on a
+        connection per thread, concurrently with the writer (the database is
+        in WAL mode). Segment text is full-text indexed with FTS5 when
+        SQLite has it, and searched with LIKE otherwise.
+
+        Args:
+            path: SQLite database file
+            batch_size: Most sessions written per transaction
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue()
+        self._local = threading.local()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self.fts = self._create_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA foreign_keys = ON")
+        return connection
+
+    def _create_schema(self) -> bool:
+        """Create the tables and indexes if missing; returns whether full-text search is available."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        try:
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.executescript(_SCHEMA)
+            self._migrate(connection)
+            try:
+                connection.executescript(_FTS_SCHEMA)
+                fts = True
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Full-text search unavailable, history search falls back to LIKE: {str(e)}")
+                fts = False
+            connection.commit()
+        finally:
+            connection.close()
+        return fts
+
+    def _migrate(self, connection: sqlite3.Connection):
+        """Apply the migrations the database hasn't had yet, each in its own transaction."""
+        for target, script in enumerate(_MIGRATIONS, start=2):
+            # Take the write lock before checking, so of several processes
+            # starting on one database only the first applies each migration
+            connection.execute("BEGIN IMMEDIATE")
+            # A new database has just been given _SCHEMA, version 1
+            version = max(1, connection.execute("PRAGMA user_version").fetchone()[0])
+            if version >= target:
+                connection.commit()
+                continue
+            for statement in script.split(';'):
+                if statement.strip():
+                    connection.execute(statement)
+            if target == 2:
+                self._backfill_rollups(connection)
+            connection.execute(f"PRAGMA user_version = {target}")
+            connection.commit()
+            logger.info(f"Migrated history database {self.path} to schema version {target}")
+
+    def _backfill_rollups(self, connection: sqlite3.Connection):
+        """Measure the sessions recorded before rollups existed and roll them up."""
+        rows = connection.execute(
+            "SELECT id, user_id, created_at, question_type, duration, feedback_type, score, transcript, feedback "
+            "FROM sessions").fetchall()
+        for row in rows:
+            answer = " ".join(text for (text,) in connection.execute(
+                "SELECT text FROM segments WHERE session_id = ? AND speaker = 'interviewee' ORDER BY start",
+                (row['id'],))) or row['transcript']
+            feedback = json.loads(row['feedback']) if row['feedback'] else {}
+            word_count, filler_density = answer_metrics(feedback, answer, row['question_type'], row['duration'])
+            connection.execute("UPDATE sessions SET word_count = ?, filler_density = ? WHERE id = ?",
+                               (word_count, filler_density, row['id']))
+            self._roll_up(connection, dict(row, word_count=word_count, filler_density=filler_density), 1)
+
+    def _reader(self) -> sqlite3.Connection:
+        """Get this thread's query connection."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def record_session(self, session_key: str, source: str, transcript: str, feedback: dict,
+                       interview_type: Optional[str] = None, question_type: Optional[str] = None,
+                       duration: Optional[float] = None, turns: Iterable[Turn] = (), user_id: Optional[str] = None):
+        """
+        Queue an analyzed session to be written to the history.
+
+        Args:
+            session_key: Unique key of the session; recording it again replaces it
+            source: Where the session came from: 'tab' or 'upload'
+            transcript: Full transcript the feedback was given on
+            feedback: Feedback returned by analyze_transcript
+            interview_type: Type of interview
+            question_type: Type of the question answered; defaults to the last
+                           specific type asked in turns
+            duration: Length of the recording in seconds
+            turns: Timeline turns whose segments are stored with their timestamps
+            user_id: User the session belongs to, DEFAULT_USER if not given
+        """
+        turns = list(turns)
+        questions = questions_from_turns(turns)
+        if question_type is None:
+            specific = [qtype for _, _, qtype in questions if qtype != 'general']
+            question_type = specific[-1] if specific else 'general'
+        details = feedback.get('details') or {}
+        self._queue.put({
+            'session_key': session_key,
+            'user_id': user_id or DEFAULT_USER,
+            'source': source,
+            'interview_type': interview_type,
+            'question_type': question_type,
+            'created_at': time.time(),
+            'duration': duration,
+            'transcript': transcript or '',
+            'feedback_type': feedback.get('type'),
+            'score': details.get('score'),
+            'message': feedback.get('message'),
+            'feedback': json.dumps(feedback),
+            'segments': [(segment.speaker, segment.start, segment.end, segment.text)
+                         for turn in turns for segment in turn.segments],
+            'questions': questions
+        })
+        self._start_writer()
+
+    def _start_writer(self):
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        connection = self._connect()
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                self._queue.task_done()
+                connection.close()
+                return
+            batch = [entry]
+            while len(batch) < self.batch_size:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    # Write what came before the stop request, then stop
+                    self._queue.put(None)
+                    self._queue.task_done()
+                    break
+                batch.append(entry)
+            try:
+                with connection:
+                    for entry in batch:
+                        self._write(connection, entry)
+                logger.debug("Wrote %d session(s) to the history", len(batch))
+            except sqlite3.Error as e:
+                logger.error(f"Error writing {len(batch)} session(s) to the history: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, connection: sqlite3.Connection, entry: dict):
+        """Insert or replace one session with its segments, questions and rollups; call inside a transaction."""
+        answer = " ".join(text for speaker, _, _, text in entry['segments'] if speaker == 'interviewee')
+        entry['word_count'], entry['filler_density'] = answer_metrics(
+            json.loads(entry['feedback']), answer or entry['transcript'], entry['question_type'], entry['duration'])
+
+        previous = connection.execute("SELECT * FROM sessions WHERE session_key = ?",
+                                      (entry['session_key'],)).fetchone()
+        if previous is not None:
+            self._roll_up(connection, previous, -1)
+            # Deleting cascades to the old segments, and through the trigger to their index entries
+            connection.execute("DELETE FROM sessions WHERE id = ?", (previous['id'],))
+        cursor = connection.execute(
+            "INSERT INTO sessions (session_key, user_id, source, interview_type, question_type, created_at, duration, "
+            "transcript, feedback_type, score, message, feedback, word_count, filler_density) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (entry['session_key'], entry['user_id'], entry['source'], entry['interview_type'], entry['question_type'],
+             entry['created_at'], entry['duration'], entry['transcript'], entry['feedback_type'], entry['score'],
+             entry['message'], entry['feedback'], entry['word_count'], entry['filler_density'])
+        )
+        self._roll_up(connection, entry, 1)
+        session_id = cursor.lastrowid
+        connection.executemany(
+            "INSERT INTO segments (session_id, speaker, start, end, text) VALUES (?, ?, ?, ?, ?)",
+            [(session_id,) + segment for segment in entry['segments']]
+        )
+        connection.executemany(
+            "INSERT INTO questions (session_id, start, question, question_type) VALUES (?, ?, ?, ?)",
+            [(session_id,) + question for question in entry['questions']]
+        )
+
+    @staticmethod
+    def _roll_up(connection: sqlite3.Connection, session, sign: int):
+        """
+        Add (sign 1) or remove (sign -1) a session's counts in its daily
+        rollup; call inside a transaction.
+        """
+        feedback_type = session['feedback_type']
+        score = session['score']
+        counts = {
+            'sessions': 1,
+            'scored': 1 if score is not None else 0,
+            'score_sum': score or 0.0,
+            'word_sum': session['word_count'] or 0,
+            'filler_sum': session['filler_density'] or 0.0
+        }
+        counts.update({name: 1 if feedback_type == name else 0 for name in FEEDBACK_TYPES})
+        values = [sign * counts[column] for column in _ROLLUP_COLUMNS]
+        connection.execute(
+            f"INSERT INTO daily_rollups (user_id, day, question_type, {', '.join(_ROLLUP_COLUMNS)}) "
+            f"VALUES (?, ?, ?, {', '.join('?' for _ in _ROLLUP_COLUMNS)}) "
+            f"ON CONFLICT (user_id, day, question_type) DO UPDATE SET "
+            + ", ".join(f"{column} = {column} + excluded.{column}" for column in _ROLLUP_COLUMNS),
+            [session['user_id'], rollup_day(session['created_at']), session['question_type'] or 'general'] + values
+        )
+
+    def flush(self):
+        """Wait until every queued session has been written."""
+        self._queue.join()
+
+    def close(self):
+        """Write the queued sessions and stop the writer thread."""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None and writer.is_alive():
+            self._queue.put(None)
+            writer.join()
+
+    @staticmethod
+    def _summary(row: sqlite3.Row) -> dict:
+        return {column: row[column] for column in _SUMMARY_COLUMNS}
+
+    def list_sessions(self, limit: int = HISTORY_PAGE_SIZE, cursor: Optional[str] = None,
+                      question_type: Optional[str] = None, user_id: Optional[str] = None) -> dict:
+        """
+        List sessions, newest first, a page at a time.
+
+        Pages are keyed by the (created_at, id) of the last session returned
+        rather than an offset, so each page is one range scan of the
+        created_at index however deep it is.
+
+        Args:
+            limit: Most sessions in the page
+            cursor: next_cursor of the previous page
+            question_type: Only list sessions answering this type of question
+            user_id: Only list this user's sessions
+
+        Returns:
+            dict: 'sessions' summaries and the 'next_cursor', or None on the last page
+
+        Raises:
+            ValueError: If cursor is malformed
+        """
+        limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+        where, params = [], []
+        if user_id:
+            where.append("user_id = ?")
+            params.append(user_id)
+        if question_type:
+            where.append("question_type = ?")
+            params.append(question_type)
+        if cursor:
+            where.append("(created_at, id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        sql = "SELECT * FROM sessions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        rows = self._reader().execute(sql, params + [limit + 1]).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+        return {'sessions': [self._summary(row) for row in rows], 'next_cursor': next_cursor}
+
+    def search(self, text: str, limit: int = HISTORY_PAGE_SIZE, offset: int = 0,
+               user_id: Optional[str] = None) -> dict:
+        """
+        Search session transcripts for segments containing all words of text.
+
+        Matches are ranked by relevance (BM25) and paged by offset, since
+        rank order has no stable key to page on. A user's sessions are found
+        through the sessions_user index.
+
+        Args:
+            text: Words the matching segments contain
+            limit: Most matches in the page
+            offset: next_offset of the previous page
+            user_id: Only search this user's sessions
+
+        Returns:
+            dict: 'results', each the session summary with the matching
+            'segment' and a highlighted 'snippet', and the 'next_offset', or
+            None on the last page
+        """
+        limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+        offset = max(0, offset)
+        if not text.split():
+            return {'results': [], 'next_offset': None}
+
+        user_filter, user_params = "", []
+        if user_id:
+            user_filter = " AND segments.session_id IN (SELECT id FROM sessions WHERE user_id = ?)"
+            user_params = [user_id]
+        if self.fts:
+            rows = self._reader().execute(
+                "SELECT sessions.*, segments.speaker, segments.start AS segment_start, segments.end AS segment_end, "
+                "segments.text AS segment_text, snippet(segments_fts, 0, '[', ']', '...', 12) AS snippet "
+                "FROM segments_fts JOIN segments ON segments.id = segments_fts.rowid "
+                "JOIN sessions ON sessions.id = segments.session_id "
+                f"WHERE segments_fts MATCH ?{user_filter} ORDER BY bm25(segments_fts), segments.id LIMIT ? OFFSET ?",
+                [fts_query(text)] + user_params + [limit + 1, offset]
+            ).fetchall()
+        else:
+            conditions = " AND ".join("segments.text LIKE ? ESCAPE '\\'" for _ in text.split())
+            patterns = ['%' + word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                        for word in text.split()]
+            rows = self._reader().execute(
+                "SELECT sessions.*, segments.speaker, segments.start AS segment_start, segments.end AS segment_end, "
+                "segments.text AS segment_text, segments.text AS snippet "
+                "FROM segments JOIN sessions ON sessions.id = segments.session_id "
+                f"WHERE {conditions}{user_filter} ORDER BY sessions.created_at DESC, segments.id LIMIT ? OFFSET ?",
+                patterns + user_params + [limit + 1, offset]
+            ).fetchall()
+
+        next_offset = offset + limit if len(rows) > limit else None
+        results = []
+        for row in rows[:limit]:
+            result = self._summary(row)
+            result['segment'] = {'speaker': row['speaker'], 'start': row['segment_start'],
+                                 'end': row['segment_end'], 'text': row['segment_text']}
+            result['snippet'] = row['snippet']
+            results.append(result)
+        return {'results': results, 'next_offset': next_offset}
+
+    def get_session(self, session_key: str) -> Optional[dict]:
+        """
+        Get a recorded session in full.
+
+        Returns:
+            dict: The session summary with its transcript, feedback, timed
+            segments and classified questions, or None if it isn't recorded
+        """
+        connection = self._reader()
+        row = connection.execute("SELECT * FROM sessions WHERE session_key = ?", (session_key,)).fetchone()
+        if row is None:
+            return None
+        session = self._summary(row)
+        session['transcript'] = row['transcript']
+        session['feedback'] = json.loads(row['feedback']) if row['feedback'] else None
+        session['segments'] = [dict(segment) for segment in connection.execute(
+            "SELECT speaker, start, end, text FROM segments WHERE session_id = ? ORDER BY start", (row['id'],))]
+        session['questions'] = [dict(question) for question in connection.execute(
+            "SELECT start, question, question_type FROM questions WHERE session_id = ? ORDER BY start, id",
+            (row['id'],))]
+        return session
+
+
+    def progress(self, user_id: str, days: int = PROGRESS_DAYS, question_type: Optional[str] = None,
+                 now: Optional[float] = None) -> dict:
+        """
+        Get a user's trend over the last days from the daily rollups.
+
+        Reads one rollup row per day and question type, whatever the number
+        of sessions behind them, through the rollup primary key.
+
+        Args:
+            user_id: User to report on
+            days: Number of days, ending today (UTC), to cover
+            question_type: Only report on this type of question
+            now: Current time, for tests
+
+        Returns:
+            dict: Per 'day' (oldest first) and in 'totals' over the window, per
+            question type: session count, feedback type counts and the
+            average score, answer length in words and filler density
+        """
+        days = max(1, min(days, PROGRESS_MAX_DAYS))
+        now = time.time() if now is None else now
+        since = rollup_day(now - (days - 1) * 86400)
+        sql = f"SELECT day, question_type, {', '.join(_ROLLUP_COLUMNS)} FROM daily_rollups WHERE user_id = ? AND day >= ?"
+        params = [user_id, since]
+        if question_type:
+            sql += " AND question_type = ?"
+            params.append(question_type)
+        rows = self._reader().execute(sql + " ORDER BY day, question_type", params).fetchall()
+
+        by_day: dict = {}
+        totals: dict = {}
+        for row in rows:
+            if not row['sessions']:
+                continue
+            counts = {column: row[column] for column in _ROLLUP_COLUMNS}
+            by_day.setdefault(row['day'], {})[row['question_type']] = self._trend(counts)
+            total = totals.setdefault(row['question_type'], dict.fromkeys(_ROLLUP_COLUMNS, 0))
+            for column in _ROLLUP_COLUMNS:
+                total[column] += counts[column]
+        return {
+            'user_id': user_id,
+            'since': since,
+            'days': [{'day': day, 'question_types': types} for day, types in by_day.items()],
+            'totals': {qtype: self._trend(counts) for qtype, counts in totals.items()}
+        }
+
+    @staticmethod
+    def _trend(counts: dict) -> dict:
+        """Turn rollup counters into counts and averages."""
+        sessions = counts['sessions']
+        return {
+            'sessions': sessions,
+            'types': {name: counts[name] for name in FEEDBACK_TYPES},
+            'average_score': round(counts['score_sum'] / counts['scored'], 3) if counts['scored'] else None,
+            'average_words': round(counts['word_sum'] / sessions, 1),
+            'average_filler_density': round(counts['filler_sum'] / sessions, 3)
+        }
+
+
+_default_history: Optional[HistoryStore] = None
+_default_history_lock = threading.Lock()
+
+
+def get_history() -> HistoryStore:
+    """Get the process-wide history at HISTORY_DB, creating it on first use."""
+    global _default_history
+    with _default_history_lock:
+        if _default_history is None:
+            _default_history = HistoryStore()
+            # Don't lose sessions still queued when the process exits
+            atexit.register(_default_history.close)
+        return _default_history
@@ -0,0 +1,251 @@
+import re
+from typing import Optional
+
+# Words and phrases that pad an answer without adding content
+FILLER_PHRASES = [
+    'um', 'uh', 'er', 'ah', 'like', 'you know', 'basically', 'actually',
+    'literally', 'sort of', 'kind of', 'i mean', 'right'
+]
+
+# Phrases that soften claims and make the candidate sound unsure
+HEDGE_PHRASES = [
+    'maybe', 'perhaps', 'probably', 'possibly', 'i think', 'i guess',
+    'i feel like', 'i believe', 'somewhat', 'not sure', 'might have',
+    'kind of', 'sort of', 'i suppose'
+]
+
+# Cues for each STAR component (Situation, Task, Action, Result)
+STAR_CUES = {
+    'situation': [
+        'when i was', 'at my', 'in my previous', 'in my last', 'during',
+        'there was', 'we were', 'the situation', 'back when', 'last year',
+        'at the time'
+    ],
+    'task': [
+        'i was responsible', 'my role', 'my task', 'i needed to', 'i had to',
+        'the goal', 'was asked to', 'my job', 'i was tasked', 'our objective',
+        'we needed to'
+    ],
+    'action': [
+        'i decided', 'i implemented', 'i created', 'i built', 'i organized',
+        'i led', 'i worked', 'i reached out', 'i proposed', 'i set up',
+        'i designed', 'i started', 'i talked', 'i met', 'i wrote', 'so i'
+    ],
+    'result': [
+        'as a result', 'in the end', 'ultimately', 'which led to',
+        'resulted in', 'we achieved', 'the outcome', 'i learned', 'increased',
+        'reduced', 'improved', 'saved', 'grew', 'delivered', 'launched'
+    ]
+}
+
+# Target answer length in words for each question type
+TARGET_WORD_RANGES = {
+    'general': (80, 250),
+    'challenge': (150, 300),
+    'leadership': (150, 300),
+    'failure': (120, 280),
+    'success': (120, 280),
+    'conflict': (150, 300),
+    'teamwork': (120, 280),
+    'initiative': (120, 280)
+}
+
+# Comfortable speaking rate in words per minute
+TARGET_SPEAKING_RATE = (110, 170)
+
+# Thresholds on the overall score (0-1) for each feedback type
+POSITIVE_THRESHOLD = 0.75
+NEUTRAL_THRESHOLD = 0.45
+
+# Width of the band around each threshold where the local score is uncertain
+UNCERTAINTY_MARGIN = 0.15
+
+
+def _compile_phrases(phrases):
+    """Compile a list of phrases into one word-boundary-aware regex."""
+    ordered = sorted(set(phrases), key=len, reverse=True)
+    alternation = '|'.join(re.escape(phrase) for phrase in ordered)
+    return re.compile(rf"\b(?:{alternation})\b")
+
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+FILLER_PATTERN = _compile_phrases(FILLER_PHRASES)
+HEDGE_PATTERN = _compile_phrases(HEDGE_PHRASES)
+STAR_PATTERNS = {component: _compile_phrases(cues) for component, cues in STAR_CUES.items()}
+QUANTIFIED_PATTERN = re.compile(
+    r"(?:\$\s?\d[\d,.]*"
+    r"|\b\d[\d,.]*\s*(?:%|percent\b|x\b|times\b|hours?\b|days?\b|weeks?\b|months?\b"
+    r"|years?\b|users?\b|customers?\b|people\b|dollars?\b|k\b|million\b|thousand\b)"
+    r"|\b(?:doubled|tripled|halved)\b)"
+)
+
+
+def compute_metrics(transcript: str, question_type: Optional[str] = None, duration: Optional[float] = None) -> dict:
+    """
+    Compute lexical interview metrics for a transcript.
+
+    Args:
+        transcript: Interviewee response text
+        question_type: Question category from detect_question_type
+        duration: Speaking duration in seconds, if known
+
+    Returns:
+        dict: Word count, speaking rate, filler/hedge density, STAR coverage,
+        quantified results and answer length relative to the question type
+    """
+    text = transcript.lower()
+    word_count = len(WORD_PATTERN.findall(text))
+    filler_count = len(FILLER_PATTERN.findall(text))
+    hedge_count = len(HEDGE_PATTERN.findall(text))
+    star = {component: bool(pattern.search(text)) for component, pattern in STAR_PATTERNS.items()}
+    quantified_count = len(QUANTIFIED_PATTERN.findall(text))
+
+    min_words, max_words = TARGET_WORD_RANGES.get(question_type or 'general', TARGET_WORD_RANGES['general'])
+    if word_count < min_words:
+        length_ratio = word_count / min_words
+    elif word_count > max_words:
+        length_ratio = word_count / max_words
+    else:
+        length_ratio = 1.0
+
+    speaking_rate = None
+    if duration and duration > 0:
+        speaking_rate = round(word_count / (duration / 60.0), 1)
+
+    return {
+        'word_count': word_count,
+        'speaking_rate_wpm': speaking_rate,
+        'filler_count': filler_count,
+        'filler_density': round(filler_count / word_count, 3) if word_count else 0.0,
+        'hedge_count': hedge_count,
+        'hedge_density': round(hedge_count / word_count, 3) if word_count else 0.0,
+        'star_components': star,
+        'quantified_results': quantified_count,
+        'target_word_range': [min_words, max_words],
+        'length_ratio': round(length_ratio, 2)
+    }
+
+
+def _score(metrics: dict) -> dict:
+    """Score each metric between 0 (poor) and 1 (good)."""
+    ratio = metrics['length_ratio']
+    length_score = ratio if ratio <= 1.0 else max(0.0, 1.0 - (ratio - 1.0))
+    star_score = sum(metrics['star_components'].values()) / len(STAR_CUES)
+    quantified_score = 1.0 if metrics['quantified_results'] else 0.0
+    filler_score = max(0.0, 1.0 - metrics['filler_density'] / 0.08)
+    hedge_score = max(0.0, 1.0 - metrics['hedge_density'] / 0.05)
+
+    scores = {
+        'length': length_score,
+        'star': star_score,
+        'quantified': quantified_score,
+        'fillers': filler_score,
+        'hedging': hedge_score
+    }
+
+    rate = metrics['speaking_rate_wpm']
+    if rate is not None:
+        low, high = TARGET_SPEAKING_RATE
+        if rate < low:
+            scores['pace'] = max(0.0, rate / low)
+        elif rate > high:
+            scores['pace'] = max(0.0, 1.0 - (rate - high) / high)
+        else:
+            scores['pace'] = 1.0
+    return scores
+
+
+# Weight of each score in the overall result
+SCORE_WEIGHTS = {
+    'length': 0.25,
+    'star': 0.3,
+    'quantified': 0.15,
+    'fillers': 0.1,
+    'hedging': 0.1,
+    'pace': 0.1
+}
+
+
+def _feedback_for(weakest: str, metrics: dict):
+    """Return the message and suggestion addressing the weakest area."""
+    if weakest == 'length':
+        if metrics['length_ratio'] < 1.0:
+            return ("Your response is too brief. Add more specific details about what you did and the results.",
+                    "Expand your answer with a specific example.")
+        return ("Good detail, but try to be more concise while keeping your key points.",
+                "Focus on your most impactful actions and results.")
+    if weakest == 'star':
+        missing = [name for name, found in metrics['star_components'].items() if not found]
+        missing_text = missing[0] if len(missing) == 1 else f"{', '.join(missing[:-1])} and {missing[-1]}"
+        return (f"Your answer is missing a clear {missing_text}. Structure it as Situation, Task, Action, Result.",
+                f"Add a sentence describing the {missing[0]}.")
+    if weakest == 'quantified':
+        return ("Good structure, but the outcome is not measurable. Show the impact you had with concrete numbers.",
+                "Quantify your results to show your impact.")
+    if weakest == 'fillers':
+        return (f"You used {metrics['filler_count']} filler words, which weakens your delivery.",
+                "Pause briefly instead of saying 'um' or 'like'.")
+    if weakest == 'hedging':
+        return ("You hedge several statements, which makes you sound unsure of your own contribution.",
+                "Replace 'I think' and 'maybe' with direct statements of what you did.")
+    if metrics['speaking_rate_wpm'] and metrics['speaking_rate_wpm'] > TARGET_SPEAKING_RATE[1]:
+        return ("You are speaking quickly, which makes your answer harder to follow.",
+                "Slow down and pause between the parts of your story.")
+    return ("You are speaking slowly, which makes your answer feel drawn out.",
+            "Practice the answer so it flows at a natural pace.")
+
+
+def local_analysis(transcript: str, interview_type: str = 'behavioral', question_type: Optional[str] = None,
+                   duration: Optional[float] = None) -> dict:
+    """
+    Score an interview response locally, without any network calls.
+
+    Args:
+        transcript: Interviewee response text
+        interview_type: Type of interview
+        question_type: Question category from detect_question_type
+        duration: Speaking duration in seconds, if known
+
+    Returns:
+        dict: Feedback in the same schema as analyze_transcript, with the
+        metrics, overall score and confidence of the local result in details
+    """
+    metrics = compute_metrics(transcript, question_type, duration)
+    scores = _score(metrics)
+
+    total_weight = sum(SCORE_WEIGHTS[name] for name in scores)
+    score = sum(SCORE_WEIGHTS[name] * value for name, value in scores.items()) / total_weight
+
+    if score >= POSITIVE_THRESHOLD:
+        feedback_type = 'positive'
+    elif score >= NEUTRAL_THRESHOLD:
+        feedback_type = 'neutral'
+    else:
+        feedback_type = 'constructive'
+
+    # Scores near a threshold could go either way, so confidence is low there
+    distance = min(abs(score - POSITIVE_THRESHOLD), abs(score - NEUTRAL_THRESHOLD))
+    confidence = min(1.0, distance / UNCERTAINTY_MARGIN)
+    weakest = min(scores, key=scores.get)
+    # Very short answers are clearly too brief, whatever the other metrics say
+    if metrics['word_count'] < 20:
+        confidence = 1.0
+        weakest = 'length'
+
+    if scores[weakest] >= 0.9:
+        message = "Strong answer with a clear structure and measurable results."
+        suggestion = "Keep the same structure and tailor the example to the role."
+    else:
+        message, suggestion = _feedback_for(weakest, metrics)
+
+    return {
+        'message': message,
+        'type': feedback_type,
+        'details': {
+            'suggestion': suggestion,
+            'source': 'local',
+            'score': round(score, 3),
+            'confidence': round(confidence, 3),
+            'metrics': metrics
+        }
+    }
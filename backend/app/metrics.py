@@ -0,0 +1,172 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+# Default latency buckets in seconds, from a few milliseconds up to a long upload
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Every metric created in this process, in creation order
+REGISTRY: List['_Metric'] = []
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = '') -> str:
+    """Format label values in the Prometheus text format."""
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        Initialize a metric and add it to the registry.
+
+        Args:
+            name: Metric name
+            documentation: Help text shown on the scrape endpoint
+            labelnames: Names of the labels each sample is keyed by
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        """Increase the counter for the given labels."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {value}' for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        """Set the gauge for the given labels."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        """Increase the gauge for the given labels."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        """Decrease the gauge for the given labels."""
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {value}' for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., +Inf count], sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels):
+        """Record one observation for the given labels."""
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time spent in the with block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            cumulative += counts[-1]
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {self._sums[key]}')
+        return lines
+
+
+def render_metrics() -> str:
+    """Render every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# Metrics shared across the backend
+REQUESTS = Counter('talkfish_requests_total', 'HTTP requests by route and status', ('route', 'method', 'status'))
+REQUEST_LATENCY = Histogram('talkfish_request_latency_seconds', 'HTTP request latency by route', ('route',))
+STAGE_LATENCY = Histogram(
+    'talkfish_stage_latency_seconds',
+    'Latency of pipeline stages (decode, queue_wait, inference, llm)',
+    ('stage',)
+)
+QUEUED_AUDIO_SECONDS = Gauge('talkfish_queued_audio_seconds', 'Audio waiting to be transcribed, by channel', ('channel',))
+REALTIME_FACTOR = Gauge(
+    'talkfish_realtime_factor',
+    'Inference time divided by audio duration for the last window, by channel',
+    ('channel',)
+)
+ACTIVE_SESSIONS = Gauge('talkfish_active_sessions', 'Active tab recording sessions')
+ADMISSION_REJECTIONS = Counter('talkfish_admission_rejections_total', 'Requests rejected by admission control, by reason', ('reason',))
+INFERENCE_WAITING = Gauge('talkfish_inference_waiting', 'Inference windows waiting for a slot, by priority', ('priority',))
+CAPTURE_XRUNS = Counter('talkfish_capture_xruns_total', 'Audio callbacks reporting an input overflow or underflow, by channel', ('channel',))
+CAPTURE_OVERFLOWS = Counter('talkfish_capture_overflows_total', 'Captured chunks dropped because the capture ring was full, by channel', ('channel',))
+SCHEDULER_INTERVAL = Gauge('talkfish_scheduler_interval_seconds', 'Current live transcription interval, by channel', ('channel',))
+FALLING_BEHIND = Gauge('talkfish_falling_behind', 'Live channels with more untranscribed audio than FALLING_BEHIND_SECONDS, by channel', ('channel',))
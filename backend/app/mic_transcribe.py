@@ -1,8 +1,6 @@
 import pyaudio
 import numpy as np
 import time
-import threading
-from typing import Optional
 import os
 import sys
 
@@ -13,6 +11,7 @@ if backend_dir not in sys.path:
 
 from app.transcription_service import TranscriptionService
 from app.nlp_analysis import analyze_transcript
+from app.ring_buffer import AudioRing, RingConsumer, CAPTURE_RING_SECONDS
 
 class MicrophoneTranscriber:
     def __init__(self, chunk_size: int = 1024, sample_rate: int = 16000, interview_type: str = 'behavioral'):
@@ -36,53 +35,59 @@ class MicrophoneTranscriber:
         self.transcription_service = TranscriptionService()
         self.transcription_service.start()
         
+        # The audio callback only copies into this ring; the consumer thread
+        # hands the audio on to transcription
+        self.ring = AudioRing(int(CAPTURE_RING_SECONDS * sample_rate))
+        self.consumer = RingConsumer(
+            self.ring,
+            lambda audio_data: self.transcription_service.add_audio_data(audio_data, 'mic'),
+            'mic'
+        )
+        
         # Recording control
         self.is_recording = False
-        self.recording_thread: Optional[threading.Thread] = None
+        self.stream = None
 
     def start_recording(self):
         """Start recording from the microphone."""
         if not self.is_recording:
             self.is_recording = True
-            self.recording_thread = threading.Thread(target=self._record_audio)
-            self.recording_thread.start()
+            self.consumer.start()
+            self.stream = self.audio.open(
+                format=self.format,
+                channels=self.channels,
+                rate=self.sample_rate,
+                input=True,
+                frames_per_buffer=self.chunk_size,
+                stream_callback=self._audio_callback
+            )
+            self.stream.start_stream()
+            print("Recording started...")
 
     def stop_recording(self):
         """Stop recording from the microphone."""
         self.is_recording = False
-        if self.recording_thread:
-            self.recording_thread.join()
+        if self.stream:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+        # Hand over everything captured before stopping transcription
+        self.consumer.stop()
         self.transcription_service.stop()
         self.audio.terminate()
+        if self.ring.xruns or self.ring.overflows:
+            print(f"Capture: {self.ring.xruns} xruns, {self.ring.overflows} dropped chunks")
 
     def get_transcription(self) -> str:
         """Get the current transcription."""
         return self.transcription_service.get_transcription('mic')
 
-    def _record_audio(self):
-        """Record audio from microphone and send to transcription service."""
-        stream = self.audio.open(
-            format=self.format,
-            channels=self.channels,
-            rate=self.sample_rate,
-            input=True,
-            frames_per_buffer=self.chunk_size
-        )
-
-        print("Recording started...")
-        
-        try:
-            while self.is_recording:
-                # Read audio data
-                data = stream.read(self.chunk_size)
-                audio_data = np.frombuffer(data, dtype=np.float32)
-                
-                # Send to transcription service
-                self.transcription_service.add_audio_data(audio_data, 'mic')
-                
-        finally:
-            stream.stop_stream()
-            stream.close()
+    def _audio_callback(self, in_data, frame_count, time_info, status):
+        """Copy a captured buffer into the ring; runs on PortAudio's thread."""
+        if status:
+            self.ring.xruns += 1
+        self.ring.write(np.frombuffer(in_data, dtype=np.float32))
+        return (None, pyaudio.paContinue)
 
 def main():
     print("Initializing microphone transcriber...")
@@ -120,7 +125,8 @@ def main():
     finally:
         # Clean up
         print("Done! \n Now getting the API evaluation...")
-        analyze_transcript(final_transcript, transcriber.interview_type)
+        analyze_transcript(final_transcript, transcriber.interview_type,
+                           prosody=transcriber.transcription_service.get_prosody())
         print("\nAPI evaluation complete.")
 
 if __name__ == "__main__":
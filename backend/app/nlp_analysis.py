@@ -2,6 +2,13 @@ import os
 import google.generativeai as genai
 from dotenv import load_dotenv
 import json
+import logging
+import time
+from .local_analysis import local_analysis
+from .prompt_budget import fit_to_budget
+from .tracing import span
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
 # Get the current file's directory
@@ -10,31 +17,51 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 env_path = os.path.join(parent_dir, '.env')
 
-print(f"Looking for .env file at: {env_path}")
-print(f"Does .env file exist? {os.path.exists(env_path)}")
+logger.debug("Looking for .env file at: %s (exists: %s)", env_path, os.path.exists(env_path))
 
 # Load .env from the parent directory
 load_dotenv(env_path)
 
 # Configure the Gemini API with your API key
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-print(f"Loaded API key: {'Found (not showing for security)' if GEMINI_API_KEY else 'Not found'}")
+logger.debug("Loaded API key: %s", 'Found (not showing for security)' if GEMINI_API_KEY else 'Not found')
 
 if not GEMINI_API_KEY:
     raise ValueError("No Gemini API key found. Please set GEMINI_API_KEY in your environment variables.")
 
+# Optional endpoint override, e.g. http://localhost:8089 for the load-test stand-in
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+
 try:
-    genai.configure(api_key=GEMINI_API_KEY)
-    print("Successfully configured Gemini API")
+    if GEMINI_API_ENDPOINT:
+        genai.configure(
+            api_key=GEMINI_API_KEY,
+            transport='rest',
+            client_options={'api_endpoint': GEMINI_API_ENDPOINT}
+        )
+        logger.info(f"Using Gemini API endpoint {GEMINI_API_ENDPOINT}")
+    else:
+        genai.configure(api_key=GEMINI_API_KEY)
+    logger.debug("Successfully configured Gemini API")
 except Exception as e:
-    print(f"Error configuring Gemini API: {str(e)}")
+    logger.error(f"Error configuring Gemini API: {str(e)}")
 
 # Initialize the model
 try:
     model = genai.GenerativeModel('gemini-1.5-flash')
-    print("Successfully initialized Gemini model")
+    logger.debug("Successfully initialized Gemini model")
 except Exception as e:
-    print(f"Error initializing Gemini model: {str(e)}")
+    logger.error(f"Error initializing Gemini model: {str(e)}")
+
+# Size limits for each batched request in analyze_transcripts_batch
+BATCH_MAX_PROMPT_CHARS = int(os.getenv("BATCH_MAX_PROMPT_CHARS", "24000"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "20"))
+
+# Seconds before the first retry of a failed batch, doubled for each further retry
+BATCH_RETRY_SECONDS = float(os.getenv("BATCH_RETRY_SECONDS", "2"))
+
+# Local results at or above this confidence are returned without calling Gemini
+LOCAL_CONFIDENCE_THRESHOLD = float(os.getenv("LOCAL_CONFIDENCE_THRESHOLD", "0.8"))
 
 # System prompt for interview feedback
 SYSTEM_PROMPT = """
@@ -57,112 +84,124 @@ Your output should be a JSON object with the following structure:
 }
 """
 
-def analyze_transcript(transcript, interview_type='behavioral', context=None, question_type=None):
+# Instructions appended to SYSTEM_PROMPT when grading several responses at once
+BATCH_PROMPT = """
+You will receive several interview responses as a JSON array. Each item has an "id".
+Analyze each response independently.
+
+Your output should be a JSON array with exactly one feedback object per input item,
+using the structure above plus an "id" field copied unchanged from the input item.
+"""
+
+def _generate(prompt):
     """
-    Analyzes the interview transcript using Gemini API and provides very concise feedback.
+    Send a prompt to Gemini and return the raw response text.
     """
-    print("\nIn analyze_transcript function")
-    print(f"Transcript length: {len(transcript)} chars")
-    if context:
-        print(f"Context length: {len(context)} chars")
-    if question_type:
-        print(f"Question type: {question_type}")
-    
     try:
-        # Extract basic statistics
-        word_count = len(transcript.split())
-        
-        print(f"Analyzing transcript with {word_count} words")
-        
-        # Prepare prompt for Gemini
-        user_prompt = f"""
-        Interview Type: {interview_type}
-        Question Type: {question_type if question_type else "Unknown"}
-        
-        """
-        
-        if context:
-            user_prompt += f"Full Conversation Context:\n{context}\n\n"
-        else:
-            user_prompt += f"Interviewee Response: \"{transcript}\"\n\n"
-        
-        user_prompt += "Provide extremely concise feedback in just a few sentences."
-        
-        # Create combined prompt with instructions and user prompt
-        combined_prompt = f"""
-        {SYSTEM_PROMPT}
-        
-        Now analyze this response:
-        
-        {user_prompt}
-        """
-        
-        print("Attempting to call Gemini API...")
-        
-        # Get response from Gemini
-        try:
+        with span('llm', prompt_chars=len(prompt)):
             response = model.generate_content(
-                combined_prompt,
+                prompt,
                 generation_config={
                     "temperature": 0.2,
                     "top_p": 0.95
                 }
             )
-            print("Successfully received response from Gemini API")
-            
-        except Exception as api_error:
-            print(f"Error calling Gemini API: {str(api_error)}")
-            raise
+        logger.debug("Successfully received response from Gemini API")
+        
+    except Exception as api_error:
+        logger.error(f"Error calling Gemini API: {str(api_error)}")
+        raise
+    
+    # Some versions of the API return the content differently
+    if hasattr(response, 'text'):
+        return response.text
+    return response.parts[0].text
+
+def ping():
+    """
+    Make a minimal Gemini call to open the connection and check the key.
+    
+    Uses count_tokens, which costs no generation quota.
+    """
+    with span('llm_ping'):
+        model.count_tokens("ping")
+
+def _clean_response_text(raw_text):
+    """
+    Strip markdown code fences from a Gemini response.
+    """
+    cleaned_text = raw_text.strip()
+    if cleaned_text.startswith("```json"):
+        cleaned_text = cleaned_text[7:]  # Remove ```json
+    if cleaned_text.startswith("```"):
+        cleaned_text = cleaned_text[3:]  # Remove ```
+    if cleaned_text.endswith("```"):
+        cleaned_text = cleaned_text[:-3]  # Remove trailing ```
+    return cleaned_text.strip()
+
+def _simplify_feedback(feedback_json):
+    """
+    Reduce a parsed Gemini response to the feedback schema.
+    """
+    return {
+        'message': feedback_json.get('message', 'Good effort, but could be improved.'),
+        'type': feedback_json.get('type', 'neutral'),
+        'details': {
+            'suggestion': feedback_json.get('details', {}).get('suggestion', 'Add more specific examples.')
+        }
+    }
+
+def analyze_transcript(transcript, interview_type='behavioral', context=None, question_type=None, duration=None,
+                       prosody=None):
+    """
+    Analyzes the interview transcript using Gemini API and provides very concise feedback.
+
+    The local analyzer scores the response first; Gemini is only called when
+    the local confidence is below LOCAL_CONFIDENCE_THRESHOLD.
+
+    Delivery metrics already computed on the audio (ProsodyTracker.summary)
+    are returned unchanged in the feedback details as 'delivery'.
+    """
+    feedback = _analyze_transcript(transcript, interview_type, context, question_type, duration)
+    if prosody:
+        feedback['details']['delivery'] = prosody
+    return feedback
+
+def _analyze_transcript(transcript, interview_type, context, question_type, duration):
+    """
+    Produce the feedback for analyze_transcript, locally or with Gemini.
+    """
+    logger.debug("Analyzing transcript: %d chars, context: %d chars, question type: %s",
+                 len(transcript), len(context or ""), question_type)
+    
+    with span('local_analysis'):
+        local_feedback = local_analysis(transcript, interview_type, question_type, duration)
+    if local_feedback['details']['confidence'] >= LOCAL_CONFIDENCE_THRESHOLD:
+        logger.debug("Using local feedback (confidence %s)", local_feedback['details']['confidence'])
+        return local_feedback
+    
+    try:
+        with span('prompt_build'):
+            combined_prompt = _build_prompt(transcript, interview_type, context, question_type)
+        
+        raw_text = _generate(combined_prompt)
         
         # Extract and parse the JSON response
         try:
-            # Some versions of the API return the content differently
-            if hasattr(response, 'text'):
-                print("Response has 'text' attribute")
-                raw_text = response.text
-            else:
-                print("Response has 'parts' attribute")
-                raw_text = response.parts[0].text
-            
-            print(f"Raw response text: {raw_text}")
-            
-            # Clean the response text
-            cleaned_text = raw_text.strip()
-            if cleaned_text.startswith("```json"):
-                cleaned_text = cleaned_text[7:]  # Remove ```json
-            if cleaned_text.startswith("```"):
-                cleaned_text = cleaned_text[3:]  # Remove ```
-            if cleaned_text.endswith("```"):
-                cleaned_text = cleaned_text[:-3]  # Remove trailing ```
-            cleaned_text = cleaned_text.strip()
-            
-            print(f"Cleaned text: {cleaned_text}")
+            logger.debug("Raw response text: %s", raw_text)
             
-            try:
-                feedback_json = json.loads(cleaned_text)
-                print("Successfully parsed JSON response")
-                
+            with span('parse'):
+                feedback_json = json.loads(_clean_response_text(raw_text))
                 # Simplify to ensure it's just what we want
-                simplified_feedback = {
-                    'message': feedback_json.get('message', 'Good effort, but could be improved.'),
-                    'type': feedback_json.get('type', 'neutral'),
-                    'details': {
-                        'suggestion': feedback_json.get('details', {}).get('suggestion', 'Add more specific examples.')
-                    }
-                }
-                
-                print("Feedback generated:")
-                print(simplified_feedback)
-                
-                return simplified_feedback
-            except json.JSONDecodeError as json_error:
-                print(f"JSON parse error: {str(json_error)}")
-                raise
+                simplified_feedback = _simplify_feedback(feedback_json)
+            
+            logger.debug("Feedback generated: %s", simplified_feedback)
+            return simplified_feedback
             
         except json.JSONDecodeError as e:
             # If JSON parsing fails, create a fallback response
-            print(f"Failed to parse Gemini response as JSON: {e}")
-            print(f"Raw response: {raw_text}")
+            logger.warning(f"Failed to parse Gemini response as JSON: {e}")
+            logger.debug("Raw response: %s", raw_text)
             
             fallback = {
                 'message': "Good effort, but try to include a clear situation, your specific action, and the outcome.",
@@ -172,48 +211,198 @@ def analyze_transcript(transcript, interview_type='behavioral', context=None, qu
                 }
             }
             
-            print("Using fallback response due to JSON parsing error")
-            print(fallback)
-            
             return fallback
                 
     except Exception as e:
-        print(f"Error during transcript analysis: {str(e)}")
-        print(f"Error type: {type(e).__name__}")
-        import traceback
-        print(f"Full traceback: {traceback.format_exc()}")
+        logger.exception(f"Error during transcript analysis: {type(e).__name__}: {str(e)}")
         
         # Fallback analysis when API fails
-        fallback = fallback_analysis(transcript, interview_type, question_type)
-        print("Using fallback response due to general error")
-        print(fallback)
-        
-        return fallback
+        logger.info("Using fallback response due to general error")
+        return fallback_analysis(transcript, interview_type, question_type, duration)
+
+def _build_prompt(transcript, interview_type, context=None, question_type=None):
+    """
+    Build the Gemini prompt for a single response.
+    """
+    user_prompt = f"""
+    Interview Type: {interview_type}
+    Question Type: {question_type if question_type else "Unknown"}
+    
+    """
+    
+    # Keep the transcript text within PROMPT_TOKEN_BUDGET
+    if context:
+        user_prompt += f"Full Conversation Context:\n{fit_to_budget(context)}\n\n"
+    else:
+        user_prompt += f"Interviewee Response: \"{fit_to_budget(transcript)}\"\n\n"
+    
+    user_prompt += "Provide extremely concise feedback in just a few sentences."
+    
+    # Create combined prompt with instructions and user prompt
+    return f"""
+    {SYSTEM_PROMPT}
+    
+    Now analyze this response:
+    
+    {user_prompt}
+    """
 
-def fallback_analysis(transcript, interview_type, question_type=None):
+def fallback_analysis(transcript, interview_type, question_type=None, duration=None):
     """
     Provides basic feedback when the Gemini API call fails.
     """
-    # Simple word count analysis
-    word_count = len(transcript.split())
-    
-    if word_count < 50:
-        message = "Your response is too brief. Add more specific details about what you did and the results."
-        feedback_type = "constructive"
-        suggestion = "Expand your answer with a specific example."
-    elif word_count > 300:
-        message = "Good detail, but try to be more concise while keeping your key points."
-        feedback_type = "neutral"
-        suggestion = "Focus on your most impactful actions and results."
+    return local_analysis(transcript, interview_type, question_type, duration)
+
+def _batch_item_payload(item):
+    """
+    Build the JSON payload sent to Gemini for one batch item.
+    """
+    payload = {
+        'id': str(item['id']),
+        'interview_type': item.get('interview_type', 'behavioral'),
+        'question_type': item.get('question_type') or 'Unknown'
+    }
+    if item.get('context'):
+        payload['conversation_context'] = fit_to_budget(item['context'])
     else:
-        message = "Good length. Add more specific details about your actions and the measurable results."
-        feedback_type = "positive"
-        suggestion = "Quantify your results to show your impact."
+        payload['interviewee_response'] = fit_to_budget(item['transcript'])
+    return payload
+
+def _pack_batches(payloads, max_chars, max_items):
+    """
+    Greedily pack item payloads into batches bounded by size and item count.
+    """
+    batches = []
+    current = []
+    current_chars = 0
+    for payload in payloads:
+        size = len(json.dumps(payload))
+        if current and (current_chars + size > max_chars or len(current) >= max_items):
+            batches.append(current)
+            current = []
+            current_chars = 0
+        current.append(payload)
+        current_chars += size
+    if current:
+        batches.append(current)
+    return batches
+
+def _analyze_batch(payloads):
+    """
+    Grade one batch of payloads with a single Gemini call.
+
+    Returns:
+        dict: Feedback keyed by item id, for the items that parsed successfully
+    """
+    prompt = f"""
+    {SYSTEM_PROMPT}
+    {BATCH_PROMPT}
     
-    return {
-        'message': message,
-        'type': feedback_type,
-        'details': {
-            'suggestion': suggestion
-        }
-    }
\ No newline at end of file
+    Now analyze these responses:
+    
+    {json.dumps(payloads)}
+    """
+    
+    try:
+        raw_text = _generate(prompt)
+        parsed = json.loads(_clean_response_text(raw_text))
+    except Exception as e:
+        logger.warning(f"Batch of {len(payloads)} items failed: {str(e)}")
+        return {}
+    
+    if not isinstance(parsed, list):
+        logger.warning("Batch response was not a JSON array")
+        return {}
+    
+    expected_ids = {payload['id'] for payload in payloads}
+    results = {}
+    for entry in parsed:
+        if not isinstance(entry, dict):
+            continue
+        item_id = str(entry.get('id'))
+        if item_id in expected_ids and 'message' in entry:
+            results[item_id] = _simplify_feedback(entry)
+    return results
+
+def analyze_transcripts_batch(items, max_prompt_chars=None, max_items=None, max_retries=2, retry_seconds=None):
+    """
+    Analyzes many interview responses with as few Gemini calls as possible.
+    
+    Responses the local analyzer is confident about are graded locally. The rest
+    are packed into size-bounded requests that share a single copy of
+    SYSTEM_PROMPT. Items missing from the responses, because a request failed
+    or its answer left them out, are packed together again and retried after a
+    backoff, so a quota error isn't retried straight away; once retries run
+    out they fall back to local analysis.
+    
+    Args:
+        items: List of dicts with 'id' and 'transcript', and optionally
+               'interview_type', 'question_type', 'context', 'duration' and
+               'prosody' (returned as the feedback's delivery details)
+        max_prompt_chars: Maximum size of the items in one request
+        max_items: Maximum number of items in one request
+        max_retries: Number of times to retry items that failed to parse
+        retry_seconds: Backoff before the first retry, doubled for each further one
+    
+    Returns:
+        dict: Feedback keyed by item id (as a string)
+    
+    Raises:
+        ValueError: If two items have the same id
+    """
+    max_prompt_chars = max_prompt_chars or BATCH_MAX_PROMPT_CHARS
+    max_items = max_items or BATCH_MAX_ITEMS
+    retry_seconds = BATCH_RETRY_SECONDS if retry_seconds is None else retry_seconds
+    
+    by_id = {}
+    for item in items:
+        item_id = str(item['id'])
+        if item_id in by_id:
+            raise ValueError(f"Duplicate batch item id {item_id}")
+        by_id[item_id] = item
+    
+    results = {}
+    pending = {}
+    for item_id, item in by_id.items():
+        local_feedback = local_analysis(
+            item['transcript'],
+            item.get('interview_type', 'behavioral'),
+            item.get('question_type'),
+            item.get('duration')
+        )
+        if local_feedback['details']['confidence'] >= LOCAL_CONFIDENCE_THRESHOLD:
+            results[item_id] = local_feedback
+        else:
+            pending[item_id] = item
+    
+    logger.info(f"Batch analysis: {len(results)} graded locally, {len(pending)} sent to Gemini")
+    
+    attempt = 0
+    while pending and attempt <= max_retries:
+        if attempt:
+            delay = retry_seconds * 2 ** (attempt - 1)
+            logger.info(f"Retrying {len(pending)} items in {delay:.1f}s")
+            time.sleep(delay)
+        payloads = [_batch_item_payload(item) for item in pending.values()]
+        batches = _pack_batches(payloads, max_prompt_chars, max_items)
+        logger.info(f"Attempt {attempt + 1}: {len(payloads)} items in {len(batches)} requests")
+        
+        for batch in batches:
+            for item_id, feedback in _analyze_batch(batch).items():
+                results[item_id] = feedback
+                pending.pop(item_id, None)
+        attempt += 1
+    
+    for item_id, item in pending.items():
+        logger.warning(f"Using fallback response for item {item_id}")
+        results[item_id] = fallback_analysis(
+            item['transcript'],
+            item.get('interview_type', 'behavioral'),
+            item.get('question_type'),
+            item.get('duration')
+        )
+    
+    for item_id, item in by_id.items():
+        if item.get('prosody'):
+            results[item_id]['details']['delivery'] = item['prosody']
+    return results
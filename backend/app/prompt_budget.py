@@ -0,0 +1,326 @@
+import os
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+
+# Maximum number of tokens of transcript text placed in one prompt
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+
+# Share of the budget reserved for the most recent question and answer
+RECENT_SHARE = 0.75
+
+# First estimate of the tokens taken by the labels around a summary; the
+# assembled text is measured and the summary shortened until it fits
+LABEL_TOKENS = 30
+
+SENTENCE_PATTERN = re.compile(r"[^.!?]+(?:[.!?]+|$)")
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'had', 'has',
+    'have', 'he', 'her', 'his', 'i', 'in', 'is', 'it', 'its', 'me', 'my', 'of', 'on',
+    'or', 'our', 'she', 'so', 'that', 'the', 'their', 'them', 'then', 'there', 'they',
+    'this', 'to', 'um', 'uh', 'was', 'we', 'were', 'what', 'when', 'which', 'who',
+    'with', 'you', 'your', 'like', 'just', 'really', 'very'
+}
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in a piece of text.
+
+    Uses the usual English approximations of ~4 characters or ~0.75 words per
+    token, taking whichever is larger, so it runs locally with no API call.
+    """
+    if not text:
+        return 0
+    return max(len(text) // 4, int(len(text.split()) * 1.33))
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences, keeping their terminal punctuation."""
+    return [sentence.strip() for sentence in SENTENCE_PATTERN.findall(text) if sentence.strip()]
+
+
+def extractive_summary(text: str, max_tokens: int) -> str:
+    """
+    Summarize text by keeping its most informative sentences.
+
+    Sentences are scored by the corpus frequency of their content words and
+    the best ones are kept, in their original order, until the budget is spent.
+
+    Args:
+        text: Text to summarize
+        max_tokens: Token budget for the summary
+
+    Returns:
+        str: Summary no longer than max_tokens
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+
+    sentences = split_sentences(text)
+    sentence_words = [
+        [word for word in WORD_PATTERN.findall(sentence.lower()) if word not in STOPWORDS]
+        for sentence in sentences
+    ]
+    frequencies = Counter(word for words in sentence_words for word in words)
+
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: sum(frequencies[word] for word in sentence_words[i]) / (len(sentence_words[i]) + 1),
+        reverse=True
+    )
+
+    selected = []
+    used = 0
+    for index in ranked:
+        cost = count_tokens(sentences[index])
+        if used + cost > max_tokens:
+            continue
+        selected.append(index)
+        used += cost
+
+    # Per-sentence estimates round down, so the joined summary can come out
+    # slightly over; drop the least informative sentences until it fits
+    summary = " ".join(sentences[i] for i in sorted(selected))
+    while selected and count_tokens(summary) > max_tokens:
+        selected.pop()
+        summary = " ".join(sentences[i] for i in sorted(selected))
+    return summary
+
+
+def fit_to_budget(text: str, max_tokens: Optional[int] = None) -> str:
+    """
+    Fit text into a token budget, keeping its most recent part verbatim.
+
+    The tail of the text is kept word for word in RECENT_SHARE of the budget
+    and everything before it is replaced by an extractive summary.
+
+    Args:
+        text: Text to fit
+        max_tokens: Token budget, defaults to PROMPT_TOKEN_BUDGET
+
+    Returns:
+        str: Text no longer than max_tokens
+    """
+    max_tokens = PROMPT_TOKEN_BUDGET if max_tokens is None else max_tokens
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    earlier, recent = _split_tail(split_sentences(text), int(max_tokens * RECENT_SHARE))
+    summary_budget = max_tokens - count_tokens(recent) - LABEL_TOKENS
+    while summary_budget > 0:
+        summary = extractive_summary(earlier, summary_budget)
+        if not summary:
+            break
+        fitted = f"[Earlier, summarized] {summary}\n[Most recent] {recent}"
+        overshoot = count_tokens(fitted) - max_tokens
+        if overshoot <= 0:
+            return fitted
+        summary_budget -= overshoot
+    return recent
+
+
+def build_conversation_context(interviewer_text: str, interviewee_text: str,
+                               max_tokens: Optional[int] = None) -> str:
+    """
+    Build a conversation context for the LLM that fits a token budget.
+
+    The most recent interviewer question and interviewee answer are kept
+    verbatim; older parts of both transcripts are extractively summarized
+    into whatever budget is left.
+
+    Args:
+        interviewer_text: Full interviewer transcript
+        interviewee_text: Full interviewee transcript
+        max_tokens: Token budget, defaults to PROMPT_TOKEN_BUDGET
+
+    Returns:
+        str: Conversation context no longer than max_tokens
+    """
+    max_tokens = PROMPT_TOKEN_BUDGET if max_tokens is None else max_tokens
+    whole = f"Interviewer: {interviewer_text}\n\nInterviewee: {interviewee_text}"
+    if count_tokens(whole) <= max_tokens:
+        return whole
+
+    recent_budget = int(max_tokens * RECENT_SHARE)
+    earlier_questions, question = split_last_question(interviewer_text, recent_budget // 4)
+    earlier_answers, answer = _split_tail(split_sentences(interviewee_text), recent_budget - count_tokens(question))
+
+    return format_budgeted_context(earlier_questions, earlier_answers, question, answer, max_tokens)
+
+
+def build_timeline_context(turns: List, max_tokens: Optional[int] = None) -> str:
+    """
+    Build a conversation context from speaker turns that fits a token budget.
+
+    Like build_conversation_context, but the most recent question is the last
+    interviewer turn and the answer is exactly the interviewee turns after
+    it, instead of guesses from whole-channel transcripts.
+
+    Args:
+        turns: Turns in time order, each with speaker and text attributes
+        max_tokens: Token budget, defaults to PROMPT_TOKEN_BUDGET
+
+    Returns:
+        str: Conversation context no longer than max_tokens
+    """
+    max_tokens = PROMPT_TOKEN_BUDGET if max_tokens is None else max_tokens
+    whole = "\n\n".join(f"{turn.speaker.capitalize()}: {turn.text}" for turn in turns)
+    if count_tokens(whole) <= max_tokens:
+        return whole
+
+    question_index = max((i for i, turn in enumerate(turns) if turn.speaker == 'interviewer'), default=-1)
+    earlier = turns[:max(question_index, 0)]
+    recent_budget = int(max_tokens * RECENT_SHARE)
+
+    earlier_questions = " ".join(turn.text for turn in earlier if turn.speaker == 'interviewer')
+    earlier_answers = " ".join(turn.text for turn in earlier if turn.speaker == 'interviewee')
+    question = ""
+    if question_index >= 0:
+        question_earlier, question = split_last_question(turns[question_index].text, recent_budget // 4)
+        earlier_questions = f"{earlier_questions} {question_earlier}".strip()
+    answer_earlier, answer = _split_tail(
+        split_sentences(" ".join(turn.text for turn in turns[question_index + 1:])),
+        recent_budget - count_tokens(question)
+    )
+    earlier_answers = f"{earlier_answers} {answer_earlier}".strip()
+
+    return format_budgeted_context(earlier_questions, earlier_answers, question, answer, max_tokens)
+
+
+def format_budgeted_context(earlier_questions: str, earlier_answers: str, question: str, answer: str,
+                            max_tokens: int) -> str:
+    """
+    Lay out a recent question and answer with summaries of earlier turns.
+
+    The summaries get what the laid-out question and answer leave of the
+    budget, and are shortened until the whole context measures within it.
+    Only a budget too small for the question and answer themselves cuts
+    them, the question first, keeping the end of each.
+
+    Args:
+        earlier_questions: Interviewer text before the most recent question
+        earlier_answers: Interviewee text before the most recent answer
+        question: Most recent question, kept verbatim
+        answer: Most recent answer, kept verbatim
+        max_tokens: Token budget for the whole context
+
+    Returns:
+        str: Conversation context no longer than max_tokens
+    """
+    recent = _layout_context([], question, answer)
+    while count_tokens(recent) > max_tokens:
+        if not answer and not question:
+            return ""
+        overshoot = count_tokens(recent) - max_tokens
+        # The answer is what is graded, so the question goes first
+        if question:
+            question = _split_tail_words(question, max(0, count_tokens(question) - overshoot))[1]
+        else:
+            answer = _split_tail_words(answer, max(0, count_tokens(answer) - overshoot))[1]
+        recent = _layout_context([], question, answer)
+
+    earlier_total = count_tokens(earlier_questions) + count_tokens(earlier_answers)
+    remaining = max_tokens - count_tokens(recent)
+    while earlier_total and remaining > 0:
+        question_share = remaining * count_tokens(earlier_questions) // earlier_total
+        question_summary = extractive_summary(earlier_questions, question_share)
+        answer_summary = extractive_summary(earlier_answers, remaining - count_tokens(question_summary))
+        summary_lines = []
+        if question_summary:
+            summary_lines.append(f"Interviewer: {question_summary}")
+        if answer_summary:
+            summary_lines.append(f"Interviewee: {answer_summary}")
+        if not summary_lines:
+            break
+        context = _layout_context(summary_lines, question, answer)
+        overshoot = count_tokens(context) - max_tokens
+        if overshoot <= 0:
+            return context
+        remaining -= overshoot
+    return recent
+
+
+def _layout_context(summary_lines: List[str], question: str, answer: str) -> str:
+    sections = []
+    if summary_lines:
+        sections.append("Earlier conversation (summarized):\n" + "\n".join(summary_lines))
+    sections.append(f"Most recent question:\nInterviewer: {question}")
+    sections.append(f"Most recent answer:\nInterviewee: {answer}")
+    return "\n\n".join(sections)
+
+
+def split_last_question(interviewer_text: str, max_tokens: int) -> Tuple[str, str]:
+    """
+    Split interviewer text into earlier text and the most recent question.
+
+    The question runs from the last sentence ending in '?' to the end of the
+    text. Without a question mark, the tail of the text is used instead.
+
+    Returns:
+        tuple: (earlier text, most recent question)
+    """
+    sentences = split_sentences(interviewer_text)
+    question_indexes = [i for i, sentence in enumerate(sentences) if sentence.endswith('?')]
+    if question_indexes:
+        start = question_indexes[-1]
+        # Include the lead-in sentence just before the question, if it fits
+        if start > 0 and not sentences[start - 1].endswith('?'):
+            lead_in = " ".join(sentences[start - 1:])
+            if count_tokens(lead_in) <= max_tokens:
+                start -= 1
+        question = " ".join(sentences[start:])
+        if count_tokens(question) <= max_tokens:
+            return " ".join(sentences[:start]), question
+    return _split_tail(sentences, max_tokens)
+
+
+def _split_tail(sentences: List[str], max_tokens: int) -> Tuple[str, str]:
+    """Split sentences into earlier text and a tail of at most max_tokens."""
+    used = 0
+    start = len(sentences)
+    while start > 0:
+        cost = count_tokens(sentences[start - 1])
+        if used + cost > max_tokens:
+            break
+        used += cost
+        start -= 1
+
+    if start == len(sentences) and sentences:
+        # A single sentence longer than the budget: keep its last words
+        earlier, tail = _split_tail_words(sentences[-1], max_tokens)
+        return " ".join(sentences[:-1] + [earlier]).strip(), tail
+
+    return " ".join(sentences[:start]), " ".join(sentences[start:])
+
+
+def _split_tail_words(text: str, max_tokens: int) -> Tuple[str, str]:
+    """
+    Split text into earlier text and its last words, at most max_tokens.
+
+    The number of words is estimated by both the word and the character
+    rule of count_tokens, then reduced until the tail really fits. When even
+    the last word is over the budget, only its last characters are kept.
+    """
+    words = text.split()
+    if max_tokens <= 0 or not words:
+        return text, ""
+
+    keep = 0
+    chars = 0
+    char_limit = max_tokens * 4
+    word_limit = max(1, int(max_tokens / 1.33))
+    while keep < min(len(words), word_limit) and chars + len(words[-keep - 1]) + (1 if keep else 0) < char_limit:
+        chars += len(words[-keep - 1]) + (1 if keep else 0)
+        keep += 1
+    while keep > 0 and count_tokens(" ".join(words[-keep:])) > max_tokens:
+        keep -= 1
+
+    if keep == 0:
+        last = words[-1]
+        cut = len(last) - (char_limit - 1)
+        return " ".join(words[:-1] + [last[:cut]]), last[cut:]
+    return " ".join(words[:-keep]), " ".join(words[-keep:])
@@ -0,0 +1,280 @@
+import threading
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+from .timeline import SPEAKERS
+from .vad import FRAME_SAMPLES, SPEECH_MARGIN_DB, ABSOLUTE_FLOOR_DB, frame_energies
+
+# Silences at least this long between two stretches of speech count as pauses
+MIN_PAUSE_SECONDS = 0.25
+
+# Upper edges in seconds of the pause-length histogram bins; the last bin is open
+PAUSE_BINS = (0.5, 1.0, 2.0, 4.0)
+
+# How fast the tracked noise floor may rise, in dB per second of audio. The
+# floor starts low so a channel that opens mid-sentence still counts as
+# speech, and rises towards the real background noise.
+NOISE_FLOOR_RISE_DB = 2.0
+
+# Seconds of per-frame speech flags kept per channel to line the channels up
+# for overlap; must cover how far one channel may run ahead of the other
+OVERLAP_HISTORY_SECONDS = 30.0
+
+# Seconds of each channel added at a time when a whole recording is measured.
+# The channels are interleaved as if they were streamed, so they stay within
+# the overlap history and the noise floor adapts as it does live.
+RECORDING_BLOCK_SECONDS = 0.5
+
+# Flags kept per frame of the overlap history
+_SPEECH = 1
+_ONSET = 2
+
+
+class _ChannelProsody:
+    def __init__(self, frames_per_second: float, history_frames: int):
+        """Running signal statistics of one channel; every update is O(chunk) with O(1) state."""
+        self.frames_per_second = frames_per_second
+        self.min_pause_frames = max(1, int(round(MIN_PAUSE_SECONDS * frames_per_second)))
+        self.frames = 0
+        self.speech_frames = 0
+        self.noise_floor = ABSOLUTE_FLOOR_DB - SPEECH_MARGIN_DB
+        # Welford mean and sum of squared deviations of speech frame levels
+        self.level_count = 0
+        self.level_mean = 0.0
+        self.level_m2 = 0.0
+        # Silent frames since the last speech frame, and whether speech has started
+        self.silence = 0
+        self.spoken = False
+        self.pause_counts = np.zeros(len(PAUSE_BINS) + 1, dtype=np.int64)
+        self.pause_total = 0.0
+        self.pause_max = 0.0
+        # Words and seconds of transcribed segments, for words per minute
+        self.words = 0
+        self.segment_seconds = 0.0
+        # Samples left over from the last chunk, short of a whole frame
+        self.tail = np.array([], dtype=np.float32)
+        # Speech/onset flags by session frame index, and the frame after the last one written
+        self.flags = np.zeros(history_frames, dtype=np.int8)
+        self.covered_until = 0
+
+    def add(self, audio: np.ndarray, start_time: float) -> Tuple[int, np.ndarray]:
+        """
+        Update the statistics with a chunk of audio.
+
+        Returns:
+            tuple: (session frame index of the first whole frame, speech/onset
+            flags of each whole frame)
+        """
+        tail_seconds = len(self.tail) / (self.frames_per_second * FRAME_SAMPLES)
+        first_frame = max(self.covered_until, int(round((start_time - tail_seconds) * self.frames_per_second)))
+        if first_frame > self.covered_until:
+            # The channel paused; leftover samples belong before the gap
+            self.tail = np.array([], dtype=np.float32)
+        audio = np.concatenate([self.tail, np.asarray(audio, dtype=np.float32)])
+        levels = frame_energies(audio)
+        self.tail = audio[len(levels) * FRAME_SAMPLES:]
+        if not len(levels):
+            return first_frame, np.array([], dtype=np.int8)
+
+        # Follow the noise floor down immediately and up slowly
+        chunk_floor = float(np.percentile(levels, 10))
+        rise = NOISE_FLOOR_RISE_DB * len(levels) / self.frames_per_second
+        self.noise_floor = min(chunk_floor, self.noise_floor + rise)
+        speech = levels > max(self.noise_floor + SPEECH_MARGIN_DB, ABSOLUTE_FLOOR_DB)
+        self.frames += len(levels)
+
+        flags = speech.astype(np.int8)
+        indexes = np.flatnonzero(speech)
+        if len(indexes):
+            self._add_levels(levels[indexes])
+            self.speech_frames += len(indexes)
+            # Silent frames before each speech frame, the first continuing the last chunk
+            gaps = np.diff(np.concatenate([[-self.silence - 1], indexes])) - 1
+            starts = gaps >= self.min_pause_frames
+            pauses = gaps[starts]
+            if not self.spoken:
+                # Silence before the first words is not a pause
+                pauses = pauses[1:] if starts[0] else pauses
+                starts[0] = True
+            self._add_pauses(pauses / self.frames_per_second)
+            flags[indexes[starts]] |= _ONSET
+            self.silence = len(levels) - 1 - int(indexes[-1])
+            self.spoken = True
+        else:
+            self.silence += len(levels)
+        return first_frame, flags
+
+    def _add_levels(self, levels: np.ndarray):
+        """Merge a batch of speech frame levels into the running mean and variance."""
+        count = len(levels)
+        mean = float(levels.mean())
+        m2 = float(np.square(levels - mean).sum())
+        total = self.level_count + count
+        delta = mean - self.level_mean
+        self.level_mean += delta * count / total
+        self.level_m2 += m2 + delta * delta * self.level_count * count / total
+        self.level_count = total
+
+    def _add_pauses(self, pauses: np.ndarray):
+        """Add pause lengths in seconds to the histogram."""
+        if not len(pauses):
+            return
+        bins = np.searchsorted(PAUSE_BINS, pauses, side='right')
+        self.pause_counts += np.bincount(bins, minlength=len(self.pause_counts))
+        self.pause_total += float(pauses.sum())
+        self.pause_max = max(self.pause_max, float(pauses.max()))
+
+    def summary(self) -> dict:
+        """Get the channel's metrics, as in ProsodyTracker.summary."""
+        speaking_seconds = self.speech_frames / self.frames_per_second
+        pause_count = int(self.pause_counts.sum())
+        labels = [f"{low:g}-{high:g}s" for low, high in zip((MIN_PAUSE_SECONDS,) + PAUSE_BINS, PAUSE_BINS)]
+        labels.append(f"{PAUSE_BINS[-1]:g}s+")
+        return {
+            'speaking_seconds': round(speaking_seconds, 2),
+            'speech_ratio': round(self.speech_frames / self.frames, 3) if self.frames else 0.0,
+            'words_per_minute': round(self.words / (self.segment_seconds / 60.0), 1) if self.segment_seconds else None,
+            'pauses': {
+                'count': pause_count,
+                'mean_seconds': round(self.pause_total / pause_count, 2) if pause_count else 0.0,
+                'max_seconds': round(self.pause_max, 2),
+                'histogram': dict(zip(labels, self.pause_counts.tolist()))
+            },
+            'loudness_db': round(self.level_mean, 1) if self.level_count else None,
+            'loudness_variation_db': (
+                round((self.level_m2 / self.level_count) ** 0.5, 1) if self.level_count else None
+            )
+        }
+
+
+class ProsodyTracker:
+    def __init__(self, channels: Iterable[str] = SPEAKERS, sample_rate: int = 16000):
+        """
+        Initialize streaming delivery metrics for the channels of a session.
+
+        Speaking time, pause lengths and loudness variation are computed from
+        20 ms frame levels as audio arrives; words per minute comes from the
+        transcribed segment timestamps. Speech on the two channels is lined
+        up on the session clock to measure overlap and count interruptions.
+        Each chunk costs one vectorized pass over its frames, so the summary
+        is ready as soon as a session stops.
+
+        Args:
+            channels: Channels tracked, each mapped to a speaker by SPEAKERS
+            sample_rate: Sample rate of the added audio
+        """
+        self.sample_rate = sample_rate
+        self.frames_per_second = sample_rate / FRAME_SAMPLES
+        history_frames = max(1, int(OVERLAP_HISTORY_SECONDS * self.frames_per_second))
+        self.channels: Dict[str, _ChannelProsody] = {
+            channel: _ChannelProsody(self.frames_per_second, history_frames) for channel in channels
+        }
+        self.overlap_frames = 0
+        self.interruptions = {channel: 0 for channel in self.channels}
+        self._lock = threading.Lock()
+
+    def add_audio(self, channel: str, audio: np.ndarray, start_time: float):
+        """
+        Add a chunk of a channel's audio.
+
+        Args:
+            channel: Channel the audio was captured on
+            audio: float32 samples
+            start_time: Session time in seconds of the first sample
+        """
+        with self._lock:
+            stats = self.channels[channel]
+            first_frame, flags = stats.add(audio, start_time)
+            self._write_flags(stats, first_frame, flags)
+            for other_channel, other in self.channels.items():
+                if other is not stats:
+                    self._compare(channel, stats, other_channel, other, first_frame, len(flags))
+
+    def add_recording(self, audio: Dict[str, np.ndarray], start_time: float = 0.0,
+                      block_seconds: float = RECORDING_BLOCK_SECONDS):
+        """
+        Add audio captured on several channels at the same time, such as a whole file.
+
+        The channels are added in alternating blocks, the way they arrive
+        when streamed, so overlap is measured over the whole recording and
+        the result matches streaming the same audio in blocks of that size.
+
+        Args:
+            audio: float32 samples of each channel, all starting at start_time
+            start_time: Session time in seconds of the first samples
+            block_seconds: Length of the blocks the channels are added in
+        """
+        block = max(1, int(block_seconds * self.sample_rate))
+        length = max((len(samples) for samples in audio.values()), default=0)
+        for begin in range(0, length, block):
+            for channel, samples in audio.items():
+                if begin < len(samples):
+                    self.add_audio(channel, samples[begin:begin + block], start_time + begin / self.sample_rate)
+
+    def _write_flags(self, stats: _ChannelProsody, first_frame: int, flags: np.ndarray):
+        """Store a chunk's frame flags in the channel's ring, clearing any gap before it."""
+        capacity = len(stats.flags)
+        gap = min(first_frame - stats.covered_until, capacity)
+        if gap > 0:
+            stats.flags[np.arange(first_frame - gap, first_frame) % capacity] = 0
+        end = first_frame + len(flags)
+        flags = flags[-capacity:]
+        stats.flags[np.arange(end - len(flags), end) % capacity] = flags
+        stats.covered_until = end
+
+    def _compare(self, channel: str, stats: _ChannelProsody, other_channel: str, other: _ChannelProsody,
+                 first_frame: int, count: int):
+        """
+        Count overlap and interruptions over the new frames the other channel already covers.
+
+        Frames the other channel hasn't reached yet are compared when its
+        audio arrives, so every frame pair is counted exactly once.
+        """
+        capacity = len(stats.flags)
+        start = max(first_frame, other.covered_until - capacity, stats.covered_until - capacity)
+        end = min(first_frame + count, other.covered_until)
+        if end <= start:
+            return
+        positions = np.arange(start, end) % capacity
+        mine = stats.flags[positions]
+        theirs = other.flags[positions]
+        both = (mine & _SPEECH).astype(bool) & (theirs & _SPEECH).astype(bool)
+        self.overlap_frames += int(both.sum())
+        # Starting to speak while the other side is talking is an interruption
+        self.interruptions[channel] += int((both & (mine & _ONSET).astype(bool)).sum())
+        self.interruptions[other_channel] += int((both & (theirs & _ONSET).astype(bool)).sum())
+
+    def add_segments(self, channel: str, segments: Iterable[Tuple[float, float, str]]):
+        """Add transcribed (start, end, text) segments of a channel for words per minute."""
+        with self._lock:
+            stats = self.channels[channel]
+            for start, end, text in segments:
+                stats.words += len(text.split())
+                stats.segment_seconds += max(0.0, end - start)
+
+    def clear_segments(self, channel: str):
+        """Forget a channel's segments, e.g. before adding a final transcript."""
+        with self._lock:
+            self.channels[channel].words = 0
+            self.channels[channel].segment_seconds = 0.0
+
+    def summary(self) -> dict:
+        """
+        Get the delivery metrics so far.
+
+        Returns:
+            dict: For each speaker with audio, speaking time, speech ratio, words
+            per minute, pause distribution and loudness mean and variation;
+            plus overlap_seconds and interruptions made by each speaker
+        """
+        with self._lock:
+            summary = {
+                SPEAKERS.get(channel, channel): stats.summary()
+                for channel, stats in self.channels.items() if stats.frames
+            }
+            summary['overlap_seconds'] = round(self.overlap_frames / self.frames_per_second, 2)
+            summary['interruptions'] = {
+                SPEAKERS.get(channel, channel): count for channel, count in self.interruptions.items()
+            }
+            return summary
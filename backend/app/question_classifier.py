@@ -0,0 +1,185 @@
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Weighted keywords for each question type. A trailing '*' matches any word
+# starting with the keyword ('fail*' matches 'failed' and 'failure'); all
+# keywords must start at a word boundary, so 'lead' never matches 'mislead'.
+QUESTION_TYPES_PATH = os.getenv(
+    "QUESTION_TYPES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'question_types.json')
+)
+
+# Words of unfinished question text kept while waiting for a '?'; Whisper
+# often drops the punctuation, and the last words carry the question anyway
+PENDING_MAX_WORDS = 200
+
+
+def load_question_keywords(path: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Load weighted question type keywords from a JSON config file.
+
+    Args:
+        path: Config file path, defaults to QUESTION_TYPES_PATH
+
+    Returns:
+        dict: Mapping of question type to {keyword: weight}
+    """
+    with open(path or QUESTION_TYPES_PATH) as f:
+        return json.load(f)
+
+
+class QuestionClassifier:
+    def __init__(self, keywords: Optional[Dict[str, Dict[str, float]]] = None):
+        """
+        Initialize the question classifier.
+
+        All keywords are compiled into a single regex, so classifying a piece
+        of text is one pass over it regardless of the number of keywords.
+
+        Args:
+            keywords: Mapping of question type to {keyword: weight}, loaded
+                      from QUESTION_TYPES_PATH if not given
+        """
+        keywords = keywords if keywords is not None else load_question_keywords()
+
+        # Group keywords so that one shared keyword scores every type it belongs to
+        weights_by_keyword: Dict[str, List[Tuple[str, float]]] = {}
+        for qtype, type_keywords in keywords.items():
+            for keyword, weight in type_keywords.items():
+                weights_by_keyword.setdefault(keyword.lower(), []).append((qtype, float(weight)))
+
+        # Longest keywords first so multi-word phrases win over their first word
+        ordered = sorted(weights_by_keyword, key=len, reverse=True)
+        self._weights = [weights_by_keyword[keyword] for keyword in ordered]
+        alternatives = [f"(?P<k{i}>{self._keyword_pattern(keyword)})" for i, keyword in enumerate(ordered)]
+        self._pattern = re.compile(r"\b(?:" + "|".join(alternatives) + ")", re.IGNORECASE) if alternatives else None
+
+    @staticmethod
+    def _keyword_pattern(keyword: str) -> str:
+        """Build the regex for one keyword, honouring the '*' prefix wildcard."""
+        is_prefix = keyword.endswith('*')
+        words = keyword.rstrip('*').split()
+        pattern = r"\s+".join(re.escape(word) for word in words)
+        return pattern + (r"\w*\b" if is_prefix else r"\b")
+
+    def score(self, text: str) -> Dict[str, float]:
+        """
+        Score text against every question type in a single pass.
+
+        Returns:
+            dict: Total keyword weight for each question type that matched
+        """
+        scores: Dict[str, float] = {}
+        if self._pattern is None:
+            return scores
+        for match in self._pattern.finditer(text):
+            for qtype, weight in self._weights[int(match.lastgroup[1:])]:
+                scores[qtype] = scores.get(qtype, 0.0) + weight
+        return scores
+
+    def classify(self, text: str) -> str:
+        """
+        Classify text as the question type with the highest keyword weight.
+
+        Returns:
+            str: Question type, or 'general' if no keyword matched
+        """
+        scores = self.score(text)
+        if not scores:
+            return 'general'
+        return max(scores, key=scores.get)
+
+
+class QuestionTracker:
+    def __init__(self, classifier: Optional[QuestionClassifier] = None):
+        """
+        Track and classify interviewer questions as segments arrive.
+
+        Args:
+            classifier: Compiled classifier to use, defaults to the shared one
+        """
+        self.classifier = classifier or default_classifier
+        self.questions: List[Tuple[str, str]] = []
+        self._pending = ""
+        # Result of current_type until the next feed
+        self._current_type: Optional[str] = None
+
+    def feed(self, segment: str) -> List[Tuple[str, str]]:
+        """
+        Add a newly transcribed interviewer segment.
+
+        Text is buffered until a question ends with '?', then each completed
+        question (with its lead-in since the previous question) is classified.
+        Only the new text is scanned, so cost grows with the segment, not the
+        whole transcript. Unfinished text is capped at the last
+        PENDING_MAX_WORDS words.
+
+        Args:
+            segment: Newly transcribed interviewer text
+
+        Returns:
+            list: (question, question type) pairs completed by this segment
+        """
+        if not segment.strip():
+            return []
+        self._current_type = None
+        pending = f"{self._pending} {segment}".strip()
+        end = pending.rfind('?')
+        if end == -1:
+            self._pending = self._cap(pending)
+            return []
+
+        completed, self._pending = pending[:end + 1], self._cap(pending[end + 1:].strip())
+        new_questions = []
+        for question in completed.split('?'):
+            question = question.strip()
+            if question:
+                new_questions.append((f"{question}?", self.classifier.classify(question)))
+        self.questions.extend(new_questions)
+        return new_questions
+
+    @staticmethod
+    def _cap(text: str) -> str:
+        """Keep the last PENDING_MAX_WORDS words of text."""
+        words = text.split()
+        if len(words) <= PENDING_MAX_WORDS:
+            return text
+        return " ".join(words[-PENDING_MAX_WORDS:])
+
+    def current_type(self) -> str:
+        """
+        Get the type of the most recent question.
+
+        Skips trailing generic questions such as "Does that make sense?" in
+        favour of the last question with a specific type, and falls back to
+        the buffered text when no question has been completed yet. The
+        result is cached until the next feed.
+        """
+        if self._current_type is None:
+            self._current_type = next((qtype for _, qtype in reversed(self.questions) if qtype != 'general'),
+                                      None) or self.classifier.classify(self._pending)
+        return self._current_type
+
+    def reset(self):
+        """Clear the incremental state."""
+        self._pending = ""
+        self.questions = []
+        self._current_type = None
+
+
+# Shared classifier compiled once from the default config
+default_classifier = QuestionClassifier()
+
+
+def classify_questions(text: str) -> List[Tuple[str, str]]:
+    """
+    Split a full interviewer transcript into questions and classify each one.
+
+    Returns:
+        list: (question, question type) pairs, in order
+    """
+    tracker = QuestionTracker()
+    tracker.feed(text)
+    return tracker.questions
@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from .metrics import CAPTURE_OVERFLOWS, CAPTURE_XRUNS
+
+logger = logging.getLogger(__name__)
+
+# Seconds of audio the capture ring holds before the callback starts dropping chunks
+CAPTURE_RING_SECONDS = float(os.getenv("CAPTURE_RING_SECONDS", "10"))
+
+# Seconds between polls of an empty ring by the consumer
+CAPTURE_POLL_INTERVAL = 0.01
+
+
+class AudioRing:
+    def __init__(self, capacity: int, dtype=np.float32):
+        """
+        Initialize a preallocated single-producer/single-consumer sample ring.
+
+        The producer (an audio callback) only copies into the buffer and then
+        publishes its write index; the consumer only reads and publishes its
+        read index. Each index has a single writer, and in CPython an
+        attribute store is atomic, so neither side takes a lock. A chunk that
+        doesn't fit is dropped whole and counted as an overflow rather than
+        blocking the callback.
+
+        Args:
+            capacity: Samples the ring holds
+            dtype: Sample type
+        """
+        self.capacity = capacity
+        self._buffer = np.zeros(capacity, dtype=dtype)
+        # Total samples ever written and read; only the producer and the
+        # consumer, respectively, store to them
+        self._written = 0
+        self._read = 0
+        # Producer-side counters
+        self.overflows = 0
+        self.dropped_samples = 0
+        self.xruns = 0
+
+    def available(self) -> int:
+        """Get the number of samples waiting to be read."""
+        return self._written - self._read
+
+    def write(self, samples: np.ndarray) -> bool:
+        """
+        Copy samples into the ring. Producer only; never blocks or allocates.
+
+        Returns:
+            bool: False if the samples didn't fit and were dropped
+        """
+        count = len(samples)
+        written = self._written
+        if count > self.capacity - (written - self._read):
+            self.overflows += 1
+            self.dropped_samples += count
+            return False
+        position = written % self.capacity
+        first = min(count, self.capacity - position)
+        self._buffer[position:position + first] = samples[:first]
+        if first < count:
+            self._buffer[:count - first] = samples[first:]
+        # Publish only once the samples are in place
+        self._written = written + count
+        return True
+
+    def read(self, max_samples: Optional[int] = None) -> np.ndarray:
+        """
+        Take up to max_samples samples out of the ring. Consumer only.
+
+        Returns:
+            np.ndarray: A copy of the samples read, possibly empty
+        """
+        read = self._read
+        count = self._written - read
+        if max_samples is not None:
+            count = min(count, max_samples)
+        position = read % self.capacity
+        first = min(count, self.capacity - position)
+        samples = np.empty(count, dtype=self._buffer.dtype)
+        samples[:first] = self._buffer[position:position + first]
+        samples[first:] = self._buffer[:count - first]
+        # Free the space only once the samples are copied out
+        self._read = read + count
+        return samples
+
+
+class RingConsumer:
+    def __init__(self, ring: AudioRing, sink: Callable[[np.ndarray], None], channel: str,
+                 block_samples: int = 4000, poll_interval: float = CAPTURE_POLL_INTERVAL):
+        """
+        Initialize the thread that moves captured audio from a ring to its sink.
+
+        All allocation, locking and transcription work happens here, off the
+        audio callback. The ring's xrun and overflow counters are published
+        to the capture metrics as they change.
+
+        Args:
+            ring: Ring filled by the audio callback
+            sink: Called with each block of samples, e.g. add_audio_data
+            channel: Channel label of the metrics
+            block_samples: Most samples passed to the sink at once
+            poll_interval: Seconds to sleep when the ring is empty
+        """
+        self.ring = ring
+        self.sink = sink
+        self.channel = channel
+        self.block_samples = block_samples
+        self.poll_interval = poll_interval
+        self._reported_xruns = 0
+        self._reported_overflows = 0
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start consuming in a background thread."""
+        if not self._running:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the thread once everything already captured has reached the sink."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while self._running or self.ring.available():
+            samples = self.ring.read(self.block_samples)
+            self._report()
+            if not len(samples):
+                time.sleep(self.poll_interval)
+                continue
+            try:
+                self.sink(samples)
+            except Exception as e:
+                logger.error(f"Error handling captured {self.channel} audio: {str(e)}")
+
+    def _report(self):
+        """Publish new xruns and overflows counted by the producer."""
+        xruns, overflows = self.ring.xruns, self.ring.overflows
+        if xruns > self._reported_xruns:
+            CAPTURE_XRUNS.inc(xruns - self._reported_xruns, channel=self.channel)
+            self._reported_xruns = xruns
+        if overflows > self._reported_overflows:
+            CAPTURE_OVERFLOWS.inc(overflows - self._reported_overflows, channel=self.channel)
+            logger.warning(f"Capture ring overflowed on {self.channel}: {self.ring.dropped_samples} samples dropped so far")
+            self._reported_overflows = overflows
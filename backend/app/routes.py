@@ -1,15 +1,33 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g, Response
 from werkzeug.utils import secure_filename
 import os
+import math
+import secrets
+import time
+import logging
 import numpy as np
 from .audio_processing import process_audio
 from .tab_transcribe import TabTranscriber
+from .session_registry import SessionRegistry, SessionLimitError
+from .session_storage import purge_stale_sessions, is_valid_session_id
+from .session_store import get_session_store
+from .history import get_history, HISTORY_PAGE_SIZE, PROGRESS_DAYS
+from .uploads import uploads, UploadError, UPLOAD_CHUNK_BYTES, UPLOAD_MAX_BYTES
+from .admission import admission, OverloadedError
+from .transcription_service import SAMPLE_RATE
+from .metrics import REQUESTS, REQUEST_LATENCY, ACTIVE_SESSIONS, ADMISSION_REJECTIONS, render_metrics
+from .tracing import start_trace, end_trace
+from .warmup import readiness
+
+logger = logging.getLogger(__name__)
 
 # Create blueprint
 bp = Blueprint('main', __name__)
 
-# Global transcriber instance
-tab_transcriber = None
+# Tab transcribers keyed by session token; sessions left by a previous
+# process, or served by another node sharing the session store, are resumed
+# on their next request
+tab_sessions = SessionRegistry(TabTranscriber, loader=TabTranscriber.resume, cleanup=purge_stale_sessions)
 
 # Configure upload settings
 ALLOWED_EXTENSIONS = {'wav', 'webm', 'mp3'}
@@ -17,6 +35,36 @@ ALLOWED_EXTENSIONS = {'wav', 'webm', 'mp3'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def overloaded(message, retry_after, status=503):
+    """Reject a request with a Retry-After hint"""
+    response = jsonify({
+        'error': message,
+        'retry_after': retry_after
+    })
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response, status
+
+@bp.before_request
+def start_request_timer():
+    """Record when the request started and start its trace"""
+    g.request_start = time.perf_counter()
+    start_trace(request.path)
+
+@bp.after_request
+def record_request_metrics(response):
+    """Count the request and record its latency by route"""
+    route = request.url_rule.rule if request.url_rule else 'unknown'
+    REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+    REQUEST_LATENCY.observe(time.perf_counter() - g.request_start, route=route)
+    end_trace(status=response.status_code)
+    return response
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Metrics scrape endpoint in the Prometheus text format"""
+    ACTIVE_SESSIONS.set(len(tab_sessions))
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 @bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -25,25 +73,34 @@ def health_check():
         'message': 'Service is running'
     }), 200
 
+@bp.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint; fails until the models and LLM client are warmed up"""
+    return jsonify({
+        'status': 'ready' if readiness.ready else 'warming_up',
+        'components': readiness.status()
+    }), 200 if readiness.ready else 503
+
 @bp.route('/start-tab-recording', methods=['POST'])
 def start_tab_recording():
-    """Start recording tab audio"""
-    global tab_transcriber
-    
+    """Start recording tab audio and return the session token"""
     try:
         interview_type = request.json.get('interview_type', 'behavioral')
+        user_id = request.json.get('user_id')
         
-        # Create new transcriber if needed
-        if tab_transcriber is None:
-            tab_transcriber = TabTranscriber(interview_type=interview_type)
-        
+        session_id, tab_transcriber = tab_sessions.create(interview_type=interview_type, user_id=user_id)
         tab_transcriber.start_recording()
         
         return jsonify({
             'status': 'success',
-            'message': 'Tab recording started'
+            'message': 'Tab recording started',
+            'session_id': session_id
         }), 200
         
+    except SessionLimitError as e:
+        return jsonify({
+            'error': str(e)
+        }), 503
     except Exception as e:
         return jsonify({
             'error': f'Error starting tab recording: {str(e)}'
@@ -52,23 +109,42 @@ def start_tab_recording():
 @bp.route('/stop-tab-recording', methods=['POST'])
 def stop_tab_recording():
     """Stop recording tab audio and return final transcript"""
-    global tab_transcriber
-    
     try:
+        session_id = request.json.get('session_id') if request.is_json else None
+        tab_transcriber = tab_sessions.get(session_id)
         if tab_transcriber is None:
             return jsonify({
-                'error': 'No active tab recording'
+                'error': 'No active tab recording for this session'
             }), 400
         
-        # Stop recording and get final transcript
-        tab_transcriber.stop_recording()
-        final_transcript = tab_transcriber.get_transcription()
+        try:
+            # Stop recording and get final transcript
+            tab_transcriber.stop_recording()
+            final_transcript = tab_transcriber.get_transcription()
+            
+            # Analyze the transcript
+            feedback = tab_transcriber.analyze_transcript(final_transcript)
+        finally:
+            # Only dropped once stopped, so a failed stop has still released the session
+            tab_sessions.remove(session_id)
         
-        # Analyze the transcript
-        feedback = tab_transcriber.analyze_transcript(final_transcript)
+        # Keep the result where any node can serve it again
+        try:
+            get_session_store().save_feedback(session_id, {'transcript': final_transcript, 'feedback': feedback})
+        except Exception as e:
+            logger.error(f"Error saving feedback for session {session_id}: {str(e)}")
         
-        # Clean up
-        tab_transcriber = None
+        # Queue the session for the history; written off the request path
+        try:
+            get_history().record_session(
+                session_id, 'tab', final_transcript, feedback,
+                interview_type=tab_transcriber.interview_type,
+                question_type=tab_transcriber.get_question_type(),
+                turns=tab_transcriber.get_turns(),
+                user_id=tab_transcriber.user_id
+            )
+        except Exception as e:
+            logger.error(f"Error recording session {session_id} in the history: {str(e)}")
         
         return jsonify({
             'status': 'success',
@@ -81,23 +157,33 @@ def stop_tab_recording():
             'error': f'Error stopping tab recording: {str(e)}'
         }), 500
 
+@bp.route('/session-feedback', methods=['GET'])
+def session_feedback():
+    """Get the transcript and feedback of a stopped tab recording session"""
+    session_id = request.args.get('session_id')
+    if not is_valid_session_id(session_id):
+        return jsonify({'error': 'Invalid session id'}), 400
+    result = get_session_store().load_feedback(session_id)
+    if result is None:
+        return jsonify({'error': 'No feedback for this session'}), 404
+    return jsonify(dict(result, status='success')), 200
+
 @bp.route('/stream-tab-audio', methods=['POST'])
 def stream_tab_audio():
     """Stream audio data from the tab"""
-    global tab_transcriber
-    
     try:
-        if tab_transcriber is None:
-            return jsonify({
-                'error': 'No active tab recording'
-            }), 400
-        
         # Get audio data from request
         if not request.is_json:
             return jsonify({
                 'error': 'Request must be JSON'
             }), 400
         
+        tab_transcriber = tab_sessions.get(request.json.get('session_id'))
+        if tab_transcriber is None:
+            return jsonify({
+                'error': 'No active tab recording for this session'
+            }), 400
+        
         # Extract audio data from request
         audio_data = request.json.get('audio_data')
         if not audio_data:
@@ -108,15 +194,24 @@ def stream_tab_audio():
         # Convert audio data to numpy array
         audio_array = np.array(audio_data, dtype=np.float32)
         
+        # Reject sessions streaming faster than real time allows
+        retry_after = tab_transcriber.rate_limiter.consume(len(audio_array) / SAMPLE_RATE)
+        if retry_after:
+            ADMISSION_REJECTIONS.inc(reason='session_rate')
+            return overloaded('Session is streaming audio too fast', max(1, retry_after), status=429)
+        
         # Add to transcriber
         tab_transcriber.add_audio_data(audio_array)
         
         # Get current transcription
         current_transcript = tab_transcriber.get_transcription()
+        scheduling = tab_transcriber.scheduling_status()
         
         return jsonify({
             'status': 'success',
-            'transcript': current_transcript
+            'transcript': current_transcript,
+            'falling_behind': scheduling['falling_behind'],
+            'lag_seconds': scheduling['backlog_seconds']
         }), 200
         
     except Exception as e:
@@ -131,6 +226,7 @@ def analyze_interview():
     Expects:
     - audio_file: Audio file in the request
     - interview_type: Type of interview (optional, defaults to 'behavioral')
+    - user_id: User the session is recorded for (optional)
     """
     # Check if audio file is present in request
     if 'audio_file' not in request.files:
@@ -156,11 +252,173 @@ def analyze_interview():
         # Get interview type from request or use default
         interview_type = request.form.get('interview_type', 'behavioral')
         
-        # Process the audio and get feedback
-        feedback = process_audio(audio_file, interview_type)
+        # Process the audio and get feedback; uploads yield to live sessions
+        history_key = secrets.token_urlsafe(16)
+        with admission.batch_job():
+            feedback = process_audio(audio_file, interview_type, history_key=history_key,
+                                     user_id=request.form.get('user_id'))
         
-        return jsonify(feedback), 200
+        # The key the session is recorded under, for /history/<history_key>
+        return jsonify(dict(feedback, history_key=history_key)), 200
         
+    except OverloadedError as e:
+        return overloaded(str(e), e.retry_after)
+    except Exception as e:
+        return jsonify({
+            'error': f'Error processing audio: {str(e)}'
+        }), 500
+
+@bp.route('/history', methods=['GET'])
+def history_list():
+    """
+    List recorded sessions, newest first
+    Accepts:
+    - limit: Page size (optional, at most 100)
+    - cursor: next_cursor of the previous page (optional)
+    - question_type: Only sessions answering this type of question (optional)
+    - user_id: Only this user's sessions (optional)
+    """
+    try:
+        page = get_history().list_sessions(
+            limit=request.args.get('limit', HISTORY_PAGE_SIZE, type=int),
+            cursor=request.args.get('cursor'),
+            question_type=request.args.get('question_type'),
+            user_id=request.args.get('user_id')
+        )
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    return jsonify(dict(page, status='success')), 200
+
+@bp.route('/history/search', methods=['GET'])
+def history_search():
+    """
+    Full-text search of recorded transcripts, best matches first
+    Accepts:
+    - q: Words the matching segments contain
+    - limit: Page size (optional, at most 100)
+    - offset: next_offset of the previous page (optional)
+    - user_id: Only this user's sessions (optional)
+    """
+    query = request.args.get('q', '')
+    if not query.strip():
+        return jsonify({'error': 'No search query provided'}), 400
+    page = get_history().search(
+        query,
+        limit=request.args.get('limit', HISTORY_PAGE_SIZE, type=int),
+        offset=request.args.get('offset', 0, type=int),
+        user_id=request.args.get('user_id')
+    )
+    return jsonify(dict(page, status='success')), 200
+
+@bp.route('/history/<session_key>', methods=['GET'])
+def history_session(session_key):
+    """Get a recorded session with its transcript, timed segments, questions and feedback"""
+    session = get_history().get_session(session_key)
+    if session is None:
+        return jsonify({'error': 'No recorded session with this key'}), 404
+    return jsonify(dict(session, status='success')), 200
+
+@bp.route('/progress', methods=['GET'])
+def progress():
+    """
+    Get a user's daily feedback trend per question type, from precomputed rollups
+    Accepts:
+    - user_id: User to report on
+    - days: Number of days up to today (optional, defaults to 30)
+    - question_type: Only this type of question (optional)
+    """
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'No user id provided'}), 400
+    trend = get_history().progress(
+        user_id,
+        days=request.args.get('days', PROGRESS_DAYS, type=int),
+        question_type=request.args.get('question_type')
+    )
+    return jsonify(dict(trend, status='success')), 200
+
+def upload_error(error):
+    """Reject a chunked upload request, with the offset to resume from when known"""
+    body = {'error': str(error)}
+    if error.offset is not None:
+        body['offset'] = error.offset
+    return jsonify(body), error.status
+
+@bp.route('/uploads', methods=['POST'])
+def create_upload():
+    """
+    Start a resumable chunked upload of a recording to analyze, for files
+    beyond the single-request limit of /analyze
+    Expects JSON:
+    - filename: Name of the recording, with a wav, webm or mp3 extension
+    - size: Total bytes (optional, checked on finalize when given)
+    - interview_type: Type of interview (optional, defaults to 'behavioral')
+    - user_id: User the session is recorded for (optional)
+    """
+    body = request.get_json(silent=True) or {}
+    filename = secure_filename(body.get('filename') or '')
+    if not allowed_file(filename):
+        return jsonify({
+            'error': f'Invalid file type. Allowed types are: {", ".join(ALLOWED_EXTENSIONS)}'
+        }), 400
+    size = body.get('size')
+    if size is not None and not isinstance(size, int):
+        return jsonify({'error': 'size must be an integer'}), 400
+    try:
+        upload = uploads.create(filename, size, body.get('interview_type', 'behavioral'), body.get('user_id'))
+    except UploadError as e:
+        return upload_error(e)
+    return jsonify(dict(upload.status(), status='success', chunk_size=UPLOAD_CHUNK_BYTES,
+                        max_size=UPLOAD_MAX_BYTES)), 201
+
+@bp.route('/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Get the offset to resume an upload from and how much of it is transcribed"""
+    upload = uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'error': 'No upload with this id'}), 404
+    return jsonify(dict(upload.status(), status='success')), 200
+
+@bp.route('/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """
+    Store the next chunk of an upload
+    Expects:
+    - offset: Byte offset of the chunk, the offset returned for the previous one
+    - X-Chunk-Sha256 header: Hex SHA-256 of the chunk
+    - Body: Raw chunk bytes
+    """
+    upload = uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'error': 'No upload with this id'}), 404
+    offset = request.args.get('offset', type=int)
+    if offset is None or offset < 0:
+        return jsonify({'error': 'A non-negative offset is required'}), 400
+    try:
+        received = upload.write_chunk(offset, request.get_data(cache=False), request.headers.get('X-Chunk-Sha256'))
+    except UploadError as e:
+        return upload_error(e)
+    return jsonify({'status': 'success', 'offset': received}), 200
+
+@bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """
+    Finish an upload and return its interview feedback, as /analyze
+    Accepts JSON:
+    - sha256: Hex SHA-256 of the whole file (optional)
+    """
+    upload = uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'error': 'No upload with this id'}), 404
+    body = request.get_json(silent=True) or {}
+    try:
+        # The upload's decoder takes the batch job slots, so waiting here holds none
+        feedback = upload.finalize(body.get('sha256'))
+        return jsonify(feedback), 200
+    except UploadError as e:
+        return upload_error(e)
+    except OverloadedError as e:
+        return overloaded(str(e), e.retry_after)
     except Exception as e:
         return jsonify({
             'error': f'Error processing audio: {str(e)}'
@@ -0,0 +1,179 @@
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+from .metrics import FALLING_BEHIND, SCHEDULER_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Shortest time between live transcriptions of a channel, when the engine is idle
+SCHEDULER_MIN_INTERVAL = float(os.getenv("SCHEDULER_MIN_INTERVAL", "0.5"))
+
+# Longest time between live transcriptions of a channel under load; bounds
+# how stale a live transcript gets while the engine keeps up
+SCHEDULER_MAX_INTERVAL = float(os.getenv("SCHEDULER_MAX_INTERVAL", "5.0"))
+
+# Most audio in seconds transcribed in one live window; Whisper decodes up
+# to 30 s per pass, so catching up in large windows costs little more than
+# a small one
+SCHEDULER_MAX_WINDOW_SECONDS = float(os.getenv("SCHEDULER_MAX_WINDOW_SECONDS", "30"))
+
+# Fraction of the engine's time the live channels sharing it should need
+TARGET_UTILIZATION = 0.7
+
+# Seconds of untranscribed audio beyond which a channel is falling behind
+FALLING_BEHIND_SECONDS = float(os.getenv("FALLING_BEHIND_SECONDS", "10"))
+
+# Seconds without audio after which a channel stops counting towards its
+# engine's load, e.g. the unused mic channel of a tab session
+SCHEDULER_IDLE_SECONDS = float(os.getenv("SCHEDULER_IDLE_SECONDS", "5"))
+
+# Weight of the newest measurement in the real-time factor average
+RTF_SMOOTHING = 0.3
+
+# Factors the interval is multiplied by when backing off and when recovering
+BACKOFF_FACTOR = 1.5
+RECOVERY_FACTOR = 0.8
+
+
+class EngineStats:
+    def __init__(self, name: str):
+        """
+        Measured speed of one inference engine (a loaded model), shared by
+        every channel transcribing with it.
+
+        Args:
+            name: Engine name, e.g. the Whisper model name
+        """
+        self.name = name
+        # EWMA of inference seconds per second of audio; None until measured
+        self.realtime_factor: Optional[float] = None
+        self.channels = 0
+        self._lock = threading.Lock()
+
+    def record(self, audio_seconds: float, compute_seconds: float):
+        """Add a measured inference over audio_seconds of audio."""
+        if audio_seconds <= 0:
+            return
+        rtf = compute_seconds / audio_seconds
+        with self._lock:
+            if self.realtime_factor is None:
+                self.realtime_factor = rtf
+            else:
+                self.realtime_factor += RTF_SMOOTHING * (rtf - self.realtime_factor)
+
+    def attach(self):
+        """Count a live channel using the engine."""
+        with self._lock:
+            self.channels += 1
+
+    def detach(self):
+        """Stop counting a live channel using the engine."""
+        with self._lock:
+            self.channels = max(0, self.channels - 1)
+
+    def utilization(self) -> float:
+        """Fraction of the engine's time the attached live channels need at the measured speed."""
+        with self._lock:
+            return (self.realtime_factor or 0.0) * max(1, self.channels)
+
+
+_engines: Dict[str, EngineStats] = {}
+_engines_lock = threading.Lock()
+
+
+def engine_stats(name: str) -> EngineStats:
+    """Get the shared stats of an engine, creating them on first use."""
+    with _engines_lock:
+        if name not in _engines:
+            _engines[name] = EngineStats(name)
+        return _engines[name]
+
+
+class AdaptiveScheduler:
+    def __init__(self, engine: EngineStats, channel: str, min_interval: float = SCHEDULER_MIN_INTERVAL,
+                 max_interval: float = SCHEDULER_MAX_INTERVAL, max_window_seconds: float = SCHEDULER_MAX_WINDOW_SECONDS,
+                 behind_seconds: float = FALLING_BEHIND_SECONDS):
+        """
+        Initialize the scheduling of one channel's live transcription.
+
+        Each time a window is transcribed the interval to the next one is
+        adapted: it grows while the engine is busier than
+        TARGET_UTILIZATION or audio is piling up, so larger windows amortize
+        each pass, and shrinks back towards min_interval when the engine has
+        headroom. Audio that piled up is taken in one window of up to
+        max_window_seconds rather than chunk by chunk. Only channels receiving
+        audio count towards the engine's load; the transcription loop starts
+        the scheduler as audio arrives and stops it when the channel idles.
+
+        Args:
+            engine: Stats of the engine transcribing the channel
+            channel: Channel label for logs and metrics
+            min_interval: Shortest interval in seconds
+            max_interval: Longest interval in seconds
+            max_window_seconds: Most audio in seconds per window
+            behind_seconds: Backlog in seconds that counts as falling behind
+        """
+        self.engine = engine
+        self.channel = channel
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.max_window_seconds = max_window_seconds
+        self.behind_seconds = behind_seconds
+        self.interval = min_interval
+        self.backlog_seconds = 0.0
+        self.falling_behind = False
+        self._attached = False
+
+    def start(self):
+        """Attach the channel to its engine's load, once it receives audio."""
+        if not self._attached:
+            self._attached = True
+            self.engine.attach()
+
+    def stop(self):
+        """Detach the channel from its engine's load, once it idles or stops."""
+        if self._attached:
+            self._attached = False
+            self.engine.detach()
+        if self.falling_behind:
+            self.falling_behind = False
+            FALLING_BEHIND.dec(channel=self.channel)
+
+    def update(self, backlog_seconds: float):
+        """
+        Adapt the interval after a window, given the audio still waiting.
+
+        Args:
+            backlog_seconds: Seconds of the channel's audio not yet transcribed
+        """
+        self.backlog_seconds = backlog_seconds
+        utilization = self.engine.utilization()
+        if utilization > TARGET_UTILIZATION or backlog_seconds > self.interval:
+            self.interval = min(self.max_interval, self.interval * BACKOFF_FACTOR)
+        elif utilization < TARGET_UTILIZATION / 2:
+            self.interval = max(self.min_interval, self.interval * RECOVERY_FACTOR)
+        SCHEDULER_INTERVAL.set(self.interval, channel=self.channel)
+        self._set_behind(backlog_seconds > self.behind_seconds)
+
+    def _set_behind(self, behind: bool):
+        if behind == self.falling_behind:
+            return
+        self.falling_behind = behind
+        if behind:
+            FALLING_BEHIND.inc(channel=self.channel)
+            logger.warning(f"{self.channel} transcription is falling behind: {self.backlog_seconds:.1f}s of audio waiting, "
+                           f"engine {self.engine.name} at {self.engine.utilization():.0%} utilization")
+        else:
+            FALLING_BEHIND.dec(channel=self.channel)
+            logger.info(f"{self.channel} transcription caught up")
+
+    def status(self) -> dict:
+        """Get the current schedule and backlog of the channel."""
+        return {
+            'interval': round(self.interval, 3),
+            'backlog_seconds': round(self.backlog_seconds, 2),
+            'realtime_factor': round(self.engine.realtime_factor, 3) if self.engine.realtime_factor is not None else None,
+            'falling_behind': self.falling_behind
+        }
@@ -0,0 +1,198 @@
+import logging
+import os
+import secrets
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of concurrent recording sessions per process
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "8"))
+
+# Seconds without any request after which a session is stopped and removed
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "300"))
+
+
+class SessionLimitError(Exception):
+    """Raised when a new session would exceed the max-sessions cap."""
+
+
+class SessionRegistry:
+    def __init__(self, factory: Callable[..., Any], max_sessions: int = MAX_SESSIONS,
+                 idle_timeout: float = SESSION_IDLE_TIMEOUT, reap_interval: float = 30.0,
+                 loader: Optional[Callable[[str], Any]] = None,
+                 cleanup: Optional[Callable[[float], Any]] = None):
+        """
+        Initialize a thread-safe registry of recording sessions.
+
+        Args:
+            factory: Callable that creates the per-session transcriber; it is
+                     passed the session token as session_id
+            max_sessions: Maximum number of concurrent sessions
+            idle_timeout: Seconds of inactivity before a session is evicted
+            reap_interval: Seconds between background idle checks
+            loader: Optional callable that resumes a session unknown to this
+                    process (e.g. from disk after a restart), or returns None
+            cleanup: Optional callable run on every reap with idle_timeout,
+                     e.g. to purge sessions abandoned by a previous process
+        """
+        self.factory = factory
+        self.loader = loader
+        self.cleanup = cleanup
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self._sessions: Dict[str, Any] = {}
+        self._last_seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+
+    def create(self, **kwargs) -> Tuple[str, Any]:
+        """
+        Create a new session.
+
+        Idle sessions are evicted first, so an expired session never blocks
+        a new one.
+
+        Args:
+            **kwargs: Passed to the transcriber factory
+
+        Returns:
+            tuple: (session token, transcriber)
+
+        Raises:
+            SessionLimitError: If max_sessions sessions are already active
+        """
+        self.evict_idle()
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                raise SessionLimitError(f'Maximum of {self.max_sessions} concurrent sessions reached')
+            session_id = secrets.token_urlsafe(16)
+            # Reserve the slot before building the transcriber outside the lock
+            self._sessions[session_id] = None
+            self._last_seen[session_id] = time.monotonic()
+
+        try:
+            transcriber = self.factory(session_id=session_id, **kwargs)
+        except Exception:
+            with self._lock:
+                self._sessions.pop(session_id, None)
+                self._last_seen.pop(session_id, None)
+            raise
+
+        with self._lock:
+            self._sessions[session_id] = transcriber
+        self._ensure_reaper()
+        return session_id, transcriber
+
+    def get(self, session_id: Optional[str]) -> Optional[Any]:
+        """
+        Get the transcriber for a session and mark the session as active.
+
+        Returns:
+            The transcriber, or None if the session does not exist
+        """
+        if not session_id:
+            return None
+        with self._lock:
+            transcriber = self._sessions.get(session_id)
+            if transcriber is not None:
+                self._last_seen[session_id] = time.monotonic()
+                return transcriber
+            if self.loader is None or session_id in self._sessions:
+                return None
+        return self._resume(session_id)
+
+    def _resume(self, session_id: str) -> Optional[Any]:
+        """Load a session this process doesn't know through the loader."""
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                return None
+            # Reserve the slot so concurrent requests don't load it twice
+            self._sessions[session_id] = None
+            self._last_seen[session_id] = time.monotonic()
+
+        transcriber = None
+        try:
+            transcriber = self.loader(session_id)
+        except Exception as e:
+            logger.error(f"Error resuming session {session_id}: {str(e)}")
+
+        with self._lock:
+            if transcriber is None:
+                self._sessions.pop(session_id, None)
+                self._last_seen.pop(session_id, None)
+                return None
+            self._sessions[session_id] = transcriber
+        logger.info(f"Resumed session {session_id}")
+        self._ensure_reaper()
+        return transcriber
+
+    def remove(self, session_id: Optional[str]) -> Optional[Any]:
+        """
+        Remove a session from the registry without stopping it.
+
+        A session unknown to this process is resumed through the loader
+        first, so it can still be stopped after a restart.
+
+        Returns:
+            The removed transcriber, or None if the session does not exist
+        """
+        if not session_id:
+            return None
+        with self._lock:
+            if session_id in self._sessions or self.loader is None:
+                self._last_seen.pop(session_id, None)
+                return self._sessions.pop(session_id, None)
+        if self._resume(session_id) is None:
+            return None
+        return self.remove(session_id)
+
+    def evict_idle(self) -> List[str]:
+        """
+        Stop and remove every session idle for longer than idle_timeout.
+
+        Returns:
+            list: Tokens of the evicted sessions
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            expired = [
+                session_id for session_id, last_seen in self._last_seen.items()
+                if last_seen < cutoff and self._sessions.get(session_id) is not None
+            ]
+            evicted = [(session_id, self._sessions.pop(session_id)) for session_id in expired]
+            for session_id in expired:
+                self._last_seen.pop(session_id, None)
+
+        # Stop outside the lock; stopping flushes remaining audio and can be slow
+        for session_id, transcriber in evicted:
+            try:
+                transcriber.stop_recording()
+            except Exception as e:
+                logger.error(f"Error stopping idle session {session_id}: {str(e)}")
+        return expired
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def _ensure_reaper(self):
+        """Start the background idle-eviction thread on first use."""
+        with self._lock:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(target=self._reap, daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        """Periodically evict idle sessions."""
+        while True:
+            time.sleep(self.reap_interval)
+            self.evict_idle()
+            if self.cleanup is not None:
+                try:
+                    self.cleanup(self.idle_timeout)
+                except Exception as e:
+                    logger.error(f"Error cleaning up sessions: {str(e)}")
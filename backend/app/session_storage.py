@@ -0,0 +1,352 @@
+import json
+import logging
+import os
+import re
+import secrets
+import shutil
+import socket
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sessions are not protected against a second writer
+    fcntl = None
+
+from .session_store import SessionStore, get_session_store
+
+logger = logging.getLogger(__name__)
+
+# Directory holding one subdirectory per live session
+SESSION_DIR = os.getenv("SESSION_DIR", os.path.join(os.getcwd(), "sessions"))
+
+# Seconds of the most recent audio per channel kept in memory
+HOT_WINDOW_SECONDS = float(os.getenv("HOT_WINDOW_SECONDS", "30"))
+
+# Session tokens are URL-safe base64; anything else could escape SESSION_DIR
+_SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Audio is stored at the Whisper sample rate
+SAMPLE_RATE = 16000
+
+
+class SessionLockedError(Exception):
+    """Raised when another process already has the session open."""
+
+
+class _HotWindow:
+    def __init__(self, capacity: int):
+        """Fixed-size circular buffer holding the most recent samples."""
+        self.buffer = np.zeros(max(1, capacity), dtype=np.float32)
+        self.position = 0
+        self.filled = 0
+
+    def append(self, samples: np.ndarray):
+        capacity = len(self.buffer)
+        if len(samples) >= capacity:
+            self.buffer[:] = samples[-capacity:]
+            self.position = 0
+            self.filled = capacity
+            return
+        first = min(len(samples), capacity - self.position)
+        self.buffer[self.position:self.position + first] = samples[:first]
+        self.buffer[:len(samples) - first] = samples[first:]
+        self.position = (self.position + len(samples)) % capacity
+        self.filled = min(capacity, self.filled + len(samples))
+
+    def last(self, count: int) -> np.ndarray:
+        """Copy of the last count samples, oldest first."""
+        count = min(count, self.filled)
+        start = (self.position - count) % len(self.buffer)
+        if start + count <= len(self.buffer):
+            return self.buffer[start:start + count].copy()
+        return np.concatenate([self.buffer[start:], self.buffer[:self.position]])
+
+
+class SessionStorage:
+    def __init__(self, session_id: str, root: str = SESSION_DIR, hot_window_seconds: float = HOT_WINDOW_SECONDS,
+                 store: Optional[SessionStore] = None):
+        """
+        Open (or create) the state of a recording session.
+
+        Audio is appended per channel to raw float32 files on this node, and
+        metadata and transcribed segments go to the session store, so neither
+        is held in memory and a restarted process can pick the session up
+        where it left off. Only the last hot_window_seconds of each channel
+        stay in memory.
+
+        With a shared store another process, on this node or another, can
+        take the session over: it claims the session, continues from the
+        stored transcript and appends new audio after the samples the
+        previous owner transcribed. Each owner writes its own audio files and
+        holds the session directory lock shared, so workers on one node don't
+        lock each other out. Audio captured before the takeover stays with
+        the previous owner. Other stores keep one process per session with an
+        exclusive lock.
+
+        Args:
+            session_id: Session token
+            root: Directory holding the session directories
+            hot_window_seconds: Seconds of recent audio kept in memory per channel
+            store: Store for metadata and segments, defaults to SESSION_STORE
+
+        Raises:
+            ValueError: If session_id is not a valid token
+            SessionLockedError: If another process has the session open and
+            the store isn't shared
+        """
+        if not is_valid_session_id(session_id):
+            raise ValueError(f'Invalid session id: {session_id!r}')
+        self.session_id = session_id
+        self.path = os.path.join(root, session_id)
+        os.makedirs(self.path, exist_ok=True)
+
+        self.store = store if store is not None else get_session_store()
+        tag = secrets.token_hex(4)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{tag}"
+        # Suffix of this owner's audio and offsets files
+        self._suffix = f'.{tag}' if self.store.shared else ''
+
+        self._lock = threading.Lock()
+        self._lock_file = open(os.path.join(self.path, '.lock'), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file, (fcntl.LOCK_SH if self.store.shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+            except OSError:
+                self._lock_file.close()
+                raise SessionLockedError(f'Session {session_id} is open in another process')
+
+        self.store.claim(session_id, self.owner)
+
+        self.hot_samples = int(hot_window_seconds * SAMPLE_RATE)
+        self._audio_files: Dict[str, object] = {}
+        self._hot: Dict[str, _HotWindow] = {}
+        self._written: Dict[str, int] = {}
+        # Channel sample index of the first sample in each local audio file;
+        # non-zero when the session was taken over from another node
+        self._offsets: Dict[str, int] = {}
+        try:
+            with open(self._offsets_path(), encoding='utf-8') as f:
+                self._offsets = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            pass
+
+    def _audio_path(self, channel: str) -> str:
+        return os.path.join(self.path, f'{channel}{self._suffix}.f32')
+
+    def _offsets_path(self) -> str:
+        return os.path.join(self.path, f'offsets{self._suffix}.json')
+
+    def _open_channel(self, channel: str):
+        """Open a channel's audio file for appending; call with the lock held."""
+        if channel not in self._audio_files:
+            path = self._audio_path(channel)
+            if os.path.exists(path):
+                local = os.path.getsize(path) // 4
+            else:
+                local = 0
+                # Audio transcribed elsewhere before a takeover isn't here;
+                # new audio continues after it
+                offset = max((segment['end'] for segment in self.segments(channel)), default=0)
+                if offset:
+                    self._offsets[channel] = offset
+                    with open(self._offsets_path(), 'w', encoding='utf-8') as f:
+                        json.dump(self._offsets, f)
+            self._written[channel] = self._offsets.get(channel, 0) + local
+            self._audio_files[channel] = open(path, 'ab')
+            self._hot[channel] = _HotWindow(self.hot_samples)
+
+    def audio_start(self, channel: str) -> int:
+        """Get the first sample of a channel stored on this node; earlier samples read as silence."""
+        with self._lock:
+            self._open_channel(channel)
+            return self._offsets.get(channel, 0)
+
+    def samples_written(self, channel: str) -> int:
+        """Get the number of samples stored for a channel."""
+        with self._lock:
+            self._open_channel(channel)
+            return self._written[channel]
+
+    def append_audio(self, channel: str, samples: np.ndarray):
+        """Append float32 samples to a channel's audio file and hot window."""
+        samples = np.asarray(samples, dtype=np.float32)
+        with self._lock:
+            self._open_channel(channel)
+            self._audio_files[channel].write(samples.tobytes())
+            self._hot[channel].append(samples)
+            self._written[channel] += len(samples)
+
+    def read_audio(self, channel: str, start: int, end: Optional[int] = None) -> np.ndarray:
+        """
+        Read samples [start, end) of a channel.
+
+        Served from the hot window when it covers the range, otherwise from
+        a memory map of the audio file. Samples before audio_start read as
+        silence.
+        """
+        with self._lock:
+            self._open_channel(channel)
+            total = self._written[channel]
+            end = total if end is None else min(end, total)
+            if start >= end:
+                return np.array([], dtype=np.float32)
+            hot = self._hot[channel]
+            if start >= total - hot.filled:
+                return hot.last(total - start)[:end - start]
+            self._audio_files[channel].flush()
+            offset = self._offsets.get(channel, 0)
+
+        if end <= offset:
+            return np.zeros(end - start, dtype=np.float32)
+        audio = np.memmap(self._audio_path(channel), dtype=np.float32, mode='r', shape=(total - offset,))
+        try:
+            local = np.array(audio[max(start, offset) - offset:end - offset])
+        finally:
+            del audio
+        if start < offset:
+            local = np.concatenate([np.zeros(offset - start, dtype=np.float32), local])
+        return local
+
+    def recent_audio(self, channel: str) -> np.ndarray:
+        """Get the in-memory hot window of a channel."""
+        with self._lock:
+            self._open_channel(channel)
+            hot = self._hot[channel]
+            return hot.last(hot.filled)
+
+    def append_segment(self, channel: str, start: int, end: int, text: str, **extra):
+        """
+        Record a transcribed window of a channel.
+
+        Every processed window is recorded, including silent ones with empty
+        text, so resuming knows exactly how far each channel was transcribed.
+
+        Args:
+            channel: 'mic' or 'tab'
+            start: First sample of the window
+            end: Sample after the last sample of the window
+            text: Transcribed text
+            **extra: Additional fields stored with the segment
+        """
+        record = dict(extra, channel=channel, start=int(start), end=int(end), text=text)
+        if not self.is_owner():
+            # Another node took the session over; its transcript wins
+            logger.warning(f"Dropping segment of session {self.session_id}, now served by another process")
+            return
+        self.store.append_segment(self.session_id, record)
+
+    def segments(self, channel: Optional[str] = None) -> Iterator[dict]:
+        """Iterate over stored segments in the order they were recorded."""
+        for segment in self.store.segments(self.session_id):
+            if channel is None or segment.get('channel') == channel:
+                yield segment
+
+    def is_owner(self) -> bool:
+        """Whether this storage still serves the session, i.e. no other process has claimed it."""
+        owner = self.store.owner(self.session_id)
+        return owner is None or owner == self.owner
+
+    def save_meta(self, meta: dict):
+        """Replace the session metadata."""
+        self.store.save_meta(self.session_id, meta)
+
+    def load_meta(self) -> dict:
+        """Get the session metadata, or an empty dict if none was saved."""
+        return self.store.load_meta(self.session_id)
+
+    def close(self):
+        """Flush and close the session files and release the session lock."""
+        with self._lock:
+            for audio_file in self._audio_files.values():
+                audio_file.close()
+            self._audio_files = {}
+            self._hot = {}
+            self._written = {}
+        self._lock_file.close()
+
+    def delete(self):
+        """
+        Close the session and remove its files, and its stored state unless another owner took it over.
+
+        The session directory goes once no other process has the session open.
+        """
+        owner = self.is_owner()
+        with self._lock:
+            paths = [self._audio_path(channel) for channel in self._audio_files] + [self._offsets_path()]
+        self.close()
+        if owner:
+            self.store.delete(self.session_id)
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with open(os.path.join(self.path, '.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return
+            shutil.rmtree(self.path, ignore_errors=True)
+
+
+def is_valid_session_id(session_id: Optional[str]) -> bool:
+    """Whether session_id is a token that can safely name a directory."""
+    return bool(session_id) and _SESSION_ID_PATTERN.match(session_id) is not None
+
+
+def session_exists(session_id: Optional[str], root: str = SESSION_DIR, store: Optional[SessionStore] = None) -> bool:
+    """Whether a session has audio on this node or state in the session store."""
+    if not is_valid_session_id(session_id):
+        return False
+    if os.path.exists(os.path.join(root, session_id, '.lock')):
+        return True
+    return (store if store is not None else get_session_store()).exists(session_id)
+
+
+def list_sessions(root: str = SESSION_DIR) -> List[str]:
+    """List the sessions with a directory on this node."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root)
+        if is_valid_session_id(name) and os.path.isdir(os.path.join(root, name))
+    )
+
+
+def purge_stale_sessions(max_age: float, root: str = SESSION_DIR) -> List[str]:
+    """
+    Delete sessions nobody has written to for max_age seconds.
+
+    Sessions open in a live process are skipped.
+
+    Returns:
+        list: Tokens of the deleted sessions
+    """
+    purged = []
+    cutoff = time.time() - max_age
+    for session_id in list_sessions(root):
+        path = os.path.join(root, session_id)
+        try:
+            last_write = max(os.path.getmtime(os.path.join(path, name)) for name in os.listdir(path))
+        except (OSError, ValueError):
+            continue
+        if last_write >= cutoff:
+            continue
+        # Only this node's files are removed; shared store entries expire on
+        # their own and may belong to a session another node now serves
+        with open(os.path.join(path, '.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue
+            shutil.rmtree(path, ignore_errors=True)
+        purged.append(session_id)
+    if purged:
+        logger.info(f"Purged {len(purged)} stale sessions")
+    return purged
@@ -0,0 +1,535 @@
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Where session metadata, transcribed segments and feedback are kept:
+# 'local' (files next to the session audio), 'memory' (this process only) or
+# a redis://host:port/db URL shared by every node
+SESSION_STORE = os.getenv("SESSION_STORE", "local")
+
+# Seconds a session's shared state outlives its last write
+SESSION_STORE_TTL = int(os.getenv("SESSION_STORE_TTL", "86400"))
+
+# Key prefix of the shared store
+KEY_PREFIX = "talkfish:session:"
+
+# Binary layout of a segment record: start sample, end sample, session time,
+# then the lengths of the channel name, text, timeline segments and extra fields
+_RECORD = struct.Struct('<QQdBIHI')
+
+# One timeline segment of a record: start and end in session seconds, text length
+_TIMELINE_SEGMENT = struct.Struct('<ddH')
+
+
+def pack_segment(record: dict) -> bytes:
+    """
+    Serialize a transcribed-window record compactly.
+
+    The fields SessionStorage writes (channel, start, end, text, time and
+    the timeline segments) are packed as fixed-width binary with UTF-8 text;
+    any other fields follow as JSON.
+    """
+    channel = record['channel'].encode('utf-8')
+    text = record.get('text', '').encode('utf-8')
+    timeline = record.get('segments') or []
+    extra = {key: value for key, value in record.items()
+             if key not in ('channel', 'start', 'end', 'text', 'time', 'segments')}
+    extra_bytes = json.dumps(extra).encode('utf-8') if extra else b''
+    parts = [
+        _RECORD.pack(record['start'], record['end'], record.get('time', 0.0), len(channel), len(text),
+                     len(timeline), len(extra_bytes)),
+        channel,
+        text
+    ]
+    for start, end, segment_text in timeline:
+        segment_bytes = segment_text.encode('utf-8')
+        parts.append(_TIMELINE_SEGMENT.pack(start, end, len(segment_bytes)))
+        parts.append(segment_bytes)
+    parts.append(extra_bytes)
+    return b''.join(parts)
+
+
+def unpack_segment(data: bytes) -> dict:
+    """Deserialize a record written by pack_segment."""
+    start, end, time_, channel_length, text_length, segment_count, extra_length = _RECORD.unpack_from(data)
+    offset = _RECORD.size
+    channel = data[offset:offset + channel_length].decode('utf-8')
+    offset += channel_length
+    text = data[offset:offset + text_length].decode('utf-8')
+    offset += text_length
+    timeline = []
+    for _ in range(segment_count):
+        segment_start, segment_end, length = _TIMELINE_SEGMENT.unpack_from(data, offset)
+        offset += _TIMELINE_SEGMENT.size
+        timeline.append((segment_start, segment_end, data[offset:offset + length].decode('utf-8')))
+        offset += length
+    record = json.loads(data[offset:offset + extra_length]) if extra_length else {}
+    record.update(channel=channel, start=start, end=end, text=text, time=time_, segments=timeline)
+    return record
+
+
+class SessionStore:
+    """
+    Session state shared by the nodes serving recording sessions.
+
+    Holds what a node needs to pick up another node's session: metadata,
+    transcribed segments and the final feedback, plus the owner currently
+    serving the session. Audio stays on the node that captured it.
+    """
+
+    # Whether other processes see the same state, so one of them may take a
+    # session over through claim while this one still has it open
+    shared = False
+
+    def save_meta(self, session_id: str, meta: dict):
+        raise NotImplementedError
+
+    def load_meta(self, session_id: str) -> dict:
+        """Get the session metadata, or an empty dict if none was saved."""
+        raise NotImplementedError
+
+    def append_segment(self, session_id: str, record: dict):
+        raise NotImplementedError
+
+    def segments(self, session_id: str) -> Iterator[dict]:
+        """Iterate over the stored segment records in the order they were appended."""
+        raise NotImplementedError
+
+    def save_feedback(self, session_id: str, feedback: dict):
+        raise NotImplementedError
+
+    def load_feedback(self, session_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def claim(self, session_id: str, owner: str):
+        """Make owner the node serving the session, taking it over from any other."""
+        raise NotImplementedError
+
+    def owner(self, session_id: str) -> Optional[str]:
+        """Get the owner serving the session, or None if the store doesn't track owners."""
+        raise NotImplementedError
+
+    def exists(self, session_id: str) -> bool:
+        """Whether the session has segments or metadata in the store."""
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        """Remove the session's metadata, segments and owner, keeping its feedback."""
+        raise NotImplementedError
+
+
+class LocalSessionStore(SessionStore):
+    def __init__(self, root: Optional[str] = None):
+        """
+        Initialize a store keeping each session's state in its directory under root.
+
+        Files are JSON (segments.jsonl, meta.json, feedback.json), readable
+        by this node only. Owners aren't tracked; the session directory lock
+        already keeps a session in one process.
+
+        Args:
+            root: Directory holding the session directories, defaults to SESSION_DIR
+        """
+        if root is None:
+            from .session_storage import SESSION_DIR
+            root = SESSION_DIR
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _path(self, session_id: str, name: str) -> str:
+        return os.path.join(self.root, session_id, name)
+
+    def _write_json(self, session_id: str, name: str, value):
+        """Atomically replace a JSON file of the session."""
+        os.makedirs(os.path.join(self.root, session_id), exist_ok=True)
+        temp_path = self._path(session_id, name + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f)
+        os.replace(temp_path, self._path(session_id, name))
+
+    def _read_json(self, session_id: str, name: str):
+        try:
+            with open(self._path(session_id, name), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def save_meta(self, session_id: str, meta: dict):
+        self._write_json(session_id, 'meta.json', meta)
+
+    def load_meta(self, session_id: str) -> dict:
+        return self._read_json(session_id, 'meta.json') or {}
+
+    def append_segment(self, session_id: str, record: dict):
+        os.makedirs(os.path.join(self.root, session_id), exist_ok=True)
+        with self._lock:
+            with open(self._path(session_id, 'segments.jsonl'), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+
+    def segments(self, session_id: str) -> Iterator[dict]:
+        try:
+            f = open(self._path(session_id, 'segments.jsonl'), encoding='utf-8')
+        except OSError:
+            return
+        with f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write
+                    logger.warning(f"Skipping corrupt segment in session {session_id}")
+
+    def save_feedback(self, session_id: str, feedback: dict):
+        self._write_json(session_id, 'feedback.json', feedback)
+
+    def load_feedback(self, session_id: str) -> Optional[dict]:
+        return self._read_json(session_id, 'feedback.json')
+
+    def claim(self, session_id: str, owner: str):
+        pass
+
+    def owner(self, session_id: str) -> Optional[str]:
+        return None
+
+    def exists(self, session_id: str) -> bool:
+        return any(os.path.exists(self._path(session_id, name)) for name in ('segments.jsonl', 'meta.json'))
+
+    def delete(self, session_id: str):
+        for name in ('segments.jsonl', 'meta.json'):
+            try:
+                os.remove(self._path(session_id, name))
+            except OSError:
+                pass
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, ttl: float = SESSION_STORE_TTL):
+        """
+        Initialize a store held in this process's memory.
+
+        Segments are kept in the same binary form as the shared store, so
+        the memory backend exercises the serialization. Entries expire ttl
+        seconds after their last write.
+
+        Args:
+            ttl: Seconds a session's state outlives its last write
+        """
+        self.ttl = ttl
+        self._data: Dict[str, Dict[str, object]] = {}
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _session(self, session_id: str, create: bool = False) -> Optional[Dict[str, object]]:
+        """Get a session's entries, dropping them if expired; call with the lock held."""
+        now = time.monotonic()
+        if session_id in self._data and self._expires[session_id] < now:
+            del self._data[session_id]
+            del self._expires[session_id]
+        if create:
+            self._expires[session_id] = now + self.ttl
+            return self._data.setdefault(session_id, {})
+        return self._data.get(session_id)
+
+    def save_meta(self, session_id: str, meta: dict):
+        with self._lock:
+            self._session(session_id, create=True)['meta'] = json.dumps(meta)
+
+    def load_meta(self, session_id: str) -> dict:
+        with self._lock:
+            session = self._session(session_id) or {}
+            return json.loads(session['meta']) if 'meta' in session else {}
+
+    def append_segment(self, session_id: str, record: dict):
+        data = pack_segment(record)
+        with self._lock:
+            self._session(session_id, create=True).setdefault('segments', []).append(data)
+
+    def segments(self, session_id: str) -> Iterator[dict]:
+        with self._lock:
+            records = list((self._session(session_id) or {}).get('segments', []))
+        for data in records:
+            yield unpack_segment(data)
+
+    def save_feedback(self, session_id: str, feedback: dict):
+        with self._lock:
+            self._session(session_id, create=True)['feedback'] = json.dumps(feedback)
+
+    def load_feedback(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            session = self._session(session_id) or {}
+            return json.loads(session['feedback']) if 'feedback' in session else None
+
+    def claim(self, session_id: str, owner: str):
+        with self._lock:
+            self._session(session_id, create=True)['owner'] = owner
+
+    def owner(self, session_id: str) -> Optional[str]:
+        with self._lock:
+            return (self._session(session_id) or {}).get('owner')
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._session(session_id) or {}
+            return 'segments' in session or 'meta' in session
+
+    def delete(self, session_id: str):
+        with self._lock:
+            session = self._session(session_id)
+            if session is not None:
+                for key in ('meta', 'segments', 'owner'):
+                    session.pop(key, None)
+
+
+class RespError(Exception):
+    """Raised when a Redis-protocol server answers with an error."""
+
+
+class RespClient:
+    def __init__(self, host: str = '127.0.0.1', port: int = 6379, db: int = 0, password: Optional[str] = None,
+                 timeout: float = 5.0):
+        """
+        Initialize a minimal client for servers speaking the Redis protocol (RESP2).
+
+        One connection is shared by all threads and used one command (or one
+        pipeline of commands) at a time; it is opened on first use and
+        reopened once if it drops.
+
+        Args:
+            host: Server host
+            port: Server port
+            db: Database selected after connecting
+            password: Password sent with AUTH, if any
+            timeout: Socket timeout in seconds
+        """
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._socket: Optional[socket.socket] = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url: str) -> 'RespClient':
+        """Create a client from a redis://[:password@]host[:port][/db] URL."""
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip('/') or 0)
+        return cls(parsed.hostname or '127.0.0.1', parsed.port or 6379, db, parsed.password)
+
+    def _connect(self):
+        self._socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._socket.makefile('rb')
+        if self.password:
+            self._call('AUTH', self.password)
+        if self.db:
+            self._call('SELECT', self.db)
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._socket is not None:
+            self._reader.close()
+            self._socket.close()
+            self._socket = None
+
+    def execute(self, *args):
+        """
+        Send one command and return its reply.
+
+        Raises:
+            RespError: If the server answers with an error
+            OSError: If the server can't be reached
+        """
+        return self.pipeline(args)[0]
+
+    def pipeline(self, *commands):
+        """
+        Send several commands in one write and return their replies, in order.
+
+        The commands cost one round trip instead of one each. They aren't a
+        transaction: other clients' commands may run in between. If the
+        connection drops they are sent again on a new one, so commands whose
+        replies were lost may run twice; non-idempotent commands must be safe
+        to repeat (see RedisSessionStore.segments).
+
+        Raises:
+            RespError: If the server answers any command with an error, once
+            every reply has been read
+            OSError: If the server can't be reached
+        """
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._socket is None:
+                        self._connect()
+                    return self._call_many(commands)
+                except (OSError, EOFError):
+                    self._close()
+                    if attempt:
+                        raise
+
+    def _call(self, *args):
+        return self._call_many([args])[0]
+
+    def _call_many(self, commands):
+        parts = []
+        for args in commands:
+            parts.append(b'*%d\r\n' % len(args))
+            for arg in args:
+                if not isinstance(arg, bytes):
+                    arg = str(arg).encode('utf-8')
+                parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        self._socket.sendall(b''.join(parts))
+        replies = []
+        error = None
+        for _ in commands:
+            # Read every reply even after an error, so the next command gets its own
+            try:
+                replies.append(self._read_reply())
+            except RespError as e:
+                error = error or e
+                replies.append(None)
+        if error is not None:
+            raise error
+        return replies
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise EOFError('Connection closed by the server')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode('utf-8')
+        if kind == b'-':
+            raise RespError(payload.decode('utf-8'))
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            count = int(payload)
+            return None if count < 0 else [self._read_reply() for _ in range(count)]
+        raise RespError(f'Unexpected reply: {line!r}')
+
+
+class RedisSessionStore(SessionStore):
+    shared = True
+
+    def __init__(self, client: RespClient, ttl: int = SESSION_STORE_TTL):
+        """
+        Initialize a store on a Redis-protocol server shared by every node.
+
+        Each session has a metadata string, a list of binary segment records,
+        a feedback string and an owner string, all expiring ttl seconds after
+        the session's last write.
+
+        Args:
+            client: Connection to the server
+            ttl: Seconds a session's state outlives its last write
+        """
+        self.client = client
+        self.ttl = ttl
+
+    def _key(self, session_id: str, name: str) -> str:
+        return f"{KEY_PREFIX}{session_id}:{name}"
+
+    def _set(self, session_id: str, name: str, value):
+        self.client.execute('SET', self._key(session_id, name), value, 'EX', self.ttl)
+
+    def _touch(self, session_id: str, *names: str) -> list:
+        """Commands refreshing the expiry of a session's keys, to send in a pipeline."""
+        return [('EXPIRE', self._key(session_id, name), self.ttl) for name in names]
+
+    def save_meta(self, session_id: str, meta: dict):
+        self.client.pipeline(
+            ('SET', self._key(session_id, 'meta'), json.dumps(meta), 'EX', self.ttl),
+            *self._touch(session_id, 'segments', 'owner')
+        )
+
+    def load_meta(self, session_id: str) -> dict:
+        value = self.client.execute('GET', self._key(session_id, 'meta'))
+        return json.loads(value) if value else {}
+
+    def append_segment(self, session_id: str, record: dict):
+        # Called for every transcribed window, so the push and the expiry
+        # refreshes share one round trip
+        self.client.pipeline(
+            ('RPUSH', self._key(session_id, 'segments'), pack_segment(record)),
+            *self._touch(session_id, 'segments', 'meta', 'owner')
+        )
+
+    def segments(self, session_id: str) -> Iterator[dict]:
+        # A pipeline resent after its replies were lost pushes a record twice.
+        # The copies are byte-identical, while two windows never are (their
+        # start samples differ), so repeats are skipped.
+        seen = set()
+        for data in self.client.execute('LRANGE', self._key(session_id, 'segments'), 0, -1) or []:
+            if data in seen:
+                continue
+            seen.add(data)
+            yield unpack_segment(data)
+
+    def save_feedback(self, session_id: str, feedback: dict):
+        self._set(session_id, 'feedback', json.dumps(feedback))
+
+    def load_feedback(self, session_id: str) -> Optional[dict]:
+        value = self.client.execute('GET', self._key(session_id, 'feedback'))
+        return json.loads(value) if value else None
+
+    def claim(self, session_id: str, owner: str):
+        self._set(session_id, 'owner', owner)
+
+    def owner(self, session_id: str) -> Optional[str]:
+        value = self.client.execute('GET', self._key(session_id, 'owner'))
+        return value.decode('utf-8') if value else None
+
+    def exists(self, session_id: str) -> bool:
+        return bool(self.client.execute('EXISTS', self._key(session_id, 'segments'), self._key(session_id, 'meta')))
+
+    def delete(self, session_id: str):
+        self.client.execute('DEL', *(self._key(session_id, name) for name in ('meta', 'segments', 'owner')))
+
+
+def create_session_store(spec: str = SESSION_STORE) -> SessionStore:
+    """
+    Create the store named by spec: 'local', 'memory' or a redis:// URL.
+
+    Raises:
+        ValueError: If spec names no known backend
+    """
+    if spec == 'local':
+        return LocalSessionStore()
+    if spec == 'memory':
+        return MemorySessionStore()
+    if spec.startswith('redis://'):
+        return RedisSessionStore(RespClient.from_url(spec))
+    raise ValueError(f'Unknown SESSION_STORE: {spec!r}')
+
+
+_default_store: Optional[SessionStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Get the process-wide store configured by SESSION_STORE, creating it on first use."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = create_session_store()
+        return _default_store
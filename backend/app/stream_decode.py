@@ -0,0 +1,220 @@
+import logging
+import shutil
+import struct
+import subprocess
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# WAV format tags of the sample encodings the parser decodes
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Data chunk sizes written by encoders that don't know the length up front
+# (ffmpeg writing to a pipe, browser recorders)
+_UNKNOWN_SIZES = (0, 0xFFFFFFFF)
+
+# Bytes of compressed input handed to ffmpeg at a time
+FFMPEG_BLOCK_BYTES = 64 * 1024
+
+
+class DecodeError(Exception):
+    """The stream isn't audio this module can decode."""
+
+
+class WavStreamParser:
+    def __init__(self, on_samples: Callable[[np.ndarray], None]):
+        """
+        Initialize an incremental WAV decoder.
+
+        Bytes can be fed in arbitrary pieces; the header is parsed once it
+        has arrived, and every whole sample frame after it is decoded and
+        passed on straight away, so decoding keeps pace with the upload
+        instead of waiting for the file to be complete.
+
+        Args:
+            on_samples: Called with each decoded block, shape (n, channels),
+                        in the file's sample type (8-bit as int16, 24-bit as int32)
+        """
+        self.on_samples = on_samples
+        self.sample_rate: Optional[int] = None
+        self.channels: Optional[int] = None
+        self._format: Optional[int] = None
+        self._bits = 0
+        self._buffer = bytearray()
+        # Bytes left in the data chunk, or None while still in the header
+        self._data_left: Optional[float] = None
+        self._header_checked = False
+
+    def feed(self, data: bytes):
+        """
+        Decode the next bytes of the stream.
+
+        Raises:
+            DecodeError: If the stream isn't a WAV file of a supported encoding
+        """
+        self._buffer += data
+        if self._data_left is None:
+            self._parse_header()
+            if self._data_left is None:
+                return
+        frame_bytes = self.channels * self._bits // 8
+        usable = min(len(self._buffer), self._data_left)
+        usable -= usable % frame_bytes
+        if usable <= 0:
+            return
+        chunk = bytes(self._buffer[:usable])
+        del self._buffer[:usable]
+        self._data_left -= usable
+        self.on_samples(self._decode(chunk))
+
+    def _parse_header(self):
+        """Consume chunks up to the start of the data chunk, if they have all arrived."""
+        if not self._header_checked:
+            if len(self._buffer) < 12:
+                return
+            if self._buffer[:4] != b'RIFF' or self._buffer[8:12] != b'WAVE':
+                raise DecodeError('Not a WAV file')
+            del self._buffer[:12]
+            self._header_checked = True
+        while len(self._buffer) >= 8:
+            chunk_id, size = struct.unpack_from('<4sI', self._buffer)
+            if chunk_id == b'data':
+                if self._format is None:
+                    raise DecodeError('WAV data before the fmt chunk')
+                del self._buffer[:8]
+                self._data_left = float('inf') if size in _UNKNOWN_SIZES else size
+                return
+            # Chunks are padded to an even length
+            padded = size + (size & 1)
+            if len(self._buffer) < 8 + padded:
+                return
+            if chunk_id == b'fmt ':
+                self._parse_format(bytes(self._buffer[8:8 + size]))
+            del self._buffer[:8 + padded]
+
+    def _parse_format(self, fmt: bytes):
+        if len(fmt) < 16:
+            raise DecodeError('Truncated WAV fmt chunk')
+        format_tag, channels, sample_rate, _, _, bits = struct.unpack_from('<HHIIHH', fmt)
+        if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            # The real encoding is the first two bytes of the sub-format GUID
+            format_tag = struct.unpack_from('<H', fmt, 24)[0]
+        supported = (format_tag == WAVE_FORMAT_PCM and bits in (8, 16, 24, 32)) or \
+                    (format_tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64))
+        if not supported or channels < 1:
+            raise DecodeError(f'Unsupported WAV encoding: format {format_tag}, {bits} bits, {channels} channels')
+        self._format, self._bits = format_tag, bits
+        self.channels, self.sample_rate = channels, sample_rate
+
+    def _decode(self, chunk: bytes) -> np.ndarray:
+        if self._format == WAVE_FORMAT_IEEE_FLOAT:
+            samples = np.frombuffer(chunk, dtype='<f4' if self._bits == 32 else '<f8').astype(np.float32)
+        elif self._bits == 8:
+            # 8-bit WAV is unsigned around 128
+            samples = (np.frombuffer(chunk, dtype=np.uint8).astype(np.int16) - 128) << 8
+        elif self._bits == 24:
+            raw = np.frombuffer(chunk, dtype=np.uint8).reshape(-1, 3)
+            padded = np.zeros((len(raw), 4), dtype=np.uint8)
+            padded[:, 1:] = raw
+            samples = padded.view('<i4').reshape(-1)
+        else:
+            samples = np.frombuffer(chunk, dtype='<i2' if self._bits == 16 else '<i4')
+        return samples.reshape(-1, self.channels)
+
+
+def ffmpeg_available() -> bool:
+    """Whether ffmpeg is on the PATH to decode compressed uploads as they arrive."""
+    return shutil.which('ffmpeg') is not None
+
+
+class FfmpegStreamDecoder:
+    def __init__(self, on_samples: Callable[[np.ndarray], None]):
+        """
+        Initialize an incremental decoder for compressed audio (webm, mp3).
+
+        The bytes are piped through ffmpeg, which converts them to 16-bit
+        WAV on its stdout as it goes; a reader thread decodes that with
+        WavStreamParser. Feeding blocks while ffmpeg is behind, so the reader
+        and on_samples set the pace.
+
+        Args:
+            on_samples: Called from the reader thread with each decoded block
+        """
+        self.parser = WavStreamParser(on_samples)
+        self.error: Optional[Exception] = None
+        self._process = subprocess.Popen(
+            ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0', '-f', 'wav', '-acodec', 'pcm_s16le',
+             'pipe:1'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    @property
+    def sample_rate(self) -> Optional[int]:
+        return self.parser.sample_rate
+
+    @property
+    def channels(self) -> Optional[int]:
+        return self.parser.channels
+
+    def _read(self):
+        try:
+            while True:
+                data = self._process.stdout.read1(FFMPEG_BLOCK_BYTES)
+                if not data:
+                    return
+                self.parser.feed(data)
+        except Exception as e:
+            self.error = e
+            self._process.kill()
+
+    def feed(self, data: bytes):
+        """
+        Pipe the next bytes of the stream to ffmpeg.
+
+        Raises:
+            DecodeError: If ffmpeg or the output parser gave up on the stream
+        """
+        if self.error is not None:
+            raise DecodeError(str(self.error))
+        try:
+            for start in range(0, len(data), FFMPEG_BLOCK_BYTES):
+                self._process.stdin.write(data[start:start + FFMPEG_BLOCK_BYTES])
+        except (BrokenPipeError, ValueError):
+            raise DecodeError(self._stderr() or 'ffmpeg stopped reading')
+
+    def close(self):
+        """
+        Signal the end of the stream and wait for ffmpeg to decode the rest.
+
+        Raises:
+            DecodeError: If ffmpeg failed to decode the stream
+        """
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._reader.join()
+        returncode = self._process.wait()
+        if self.error is not None:
+            raise DecodeError(str(self.error))
+        if returncode != 0:
+            raise DecodeError(self._stderr() or f'ffmpeg exited with status {returncode}')
+
+    def abort(self):
+        """Stop ffmpeg without decoding the rest."""
+        self._process.kill()
+        self._reader.join()
+        self._process.wait()
+
+    def _stderr(self) -> str:
+        try:
+            return self._process.stderr.read().decode('utf-8', 'replace').strip()
+        except Exception:
+            return ''
@@ -10,6 +10,100 @@ if backend_dir not in sys.path:
     sys.path.insert(0, backend_dir)
 
 from app.transcription_service import TranscriptionService
+from app.nlp_analysis import analyze_transcript
+from app.admission import TokenBucket
+from app.session_storage import SessionStorage, SessionLockedError, session_exists
+from app.ring_buffer import AudioRing, RingConsumer, CAPTURE_RING_SECONDS
+
+class TabTranscriber:
+    def __init__(self, interview_type: str = 'behavioral', session_id: str = None, user_id: str = None):
+        """
+        Initialize a transcriber for tab audio streamed from the browser.
+        
+        Args:
+            interview_type: Type of interview for analysis
+            user_id: User the session's history and progress are recorded for
+            session_id: Session token; when given, the session's audio and
+                        transcript are kept on disk and an existing session
+                        with this token is resumed
+        """
+        self.storage = None
+        if session_id:
+            self.storage = SessionStorage(session_id)
+            # The stored interview type and user win when resuming
+            meta = self.storage.load_meta()
+            interview_type = meta.get('interview_type', interview_type)
+            user_id = meta.get('user_id', user_id)
+            self.storage.save_meta({'interview_type': interview_type, 'user_id': user_id})
+        self.interview_type = interview_type
+        self.user_id = user_id
+        self.transcription_service = TranscriptionService(storage=self.storage)
+        # Limits how many seconds of audio the session may stream per second
+        self.rate_limiter = TokenBucket()
+        self.is_recording = False
+
+    def start_recording(self):
+        """Start transcribing streamed tab audio."""
+        if not self.is_recording:
+            self.is_recording = True
+            self.transcription_service.start()
+
+    def add_audio_data(self, audio_data: np.ndarray):
+        """Add a chunk of streamed tab audio."""
+        self.transcription_service.add_audio_data(audio_data.astype(np.float32), 'tab')
+
+    def get_transcription(self) -> str:
+        """Get the current transcription."""
+        return self.transcription_service.get_transcription('tab')
+
+    def scheduling_status(self) -> dict:
+        """Get the live transcription schedule and backlog of the tab channel."""
+        return self.transcription_service.scheduling_status()['tab']
+
+    def get_question_type(self) -> str:
+        """Get the type of the most recent interviewer question."""
+        return self.transcription_service.get_question_type()
+
+    def get_turns(self):
+        """Get the timestamped speaker turns transcribed so far."""
+        return self.transcription_service.get_timeline().turns()
+
+    def stop_recording(self):
+        """Stop transcribing, process any remaining audio and discard the session files."""
+        if self.is_recording:
+            self.is_recording = False
+            try:
+                self.transcription_service.stop()
+            finally:
+                if self.storage is not None:
+                    self.storage.delete()
+
+    @classmethod
+    def resume(cls, session_id: str):
+        """
+        Resume a session left on disk by a previous process.
+        
+        Returns:
+            TabTranscriber: The recording transcriber, or None if there is no
+            such session or another process has it open
+        """
+        if not session_exists(session_id):
+            return None
+        try:
+            transcriber = cls(session_id=session_id)
+        except SessionLockedError:
+            return None
+        transcriber.start_recording()
+        return transcriber
+
+    def analyze_transcript(self, transcript: str):
+        """Analyze a transcript using the most recent interviewer question type and the delivery metrics."""
+        return analyze_transcript(
+            transcript,
+            self.interview_type,
+            question_type=self.get_question_type(),
+            prosody=self.transcription_service.get_prosody()
+        )
 
 class VirtualInputDevice:
     def __init__(self):
@@ -20,12 +114,24 @@ class VirtualInputDevice:
         self.RATE = 12000
         self.source_device = None  # The real device with 2 output channels
         self.stream = None
-        self.audio_data = []
+        
+        # Audio goes to disk as it arrives, so memory stays bounded however
+        # long the device records
+        self.storage = SessionStorage(f"device-{int(time.time())}")
         
         # Initialize transcription service
-        self.transcription_service = TranscriptionService()
+        self.transcription_service = TranscriptionService(storage=self.storage)
         self.transcription_service.start()
         
+        # The audio callback only copies into this ring; the consumer thread
+        # hands the audio on to transcription and storage
+        self.ring = AudioRing(int(CAPTURE_RING_SECONDS * 16000))
+        self.consumer = RingConsumer(
+            self.ring,
+            lambda audio_data: self.transcription_service.add_audio_data(audio_data, 'tab'),
+            'tab'
+        )
+        
     def list_devices(self):
         """List all available audio devices"""
         info = self.p.get_host_api_info_by_index(0)
@@ -69,27 +175,21 @@ class VirtualInputDevice:
         print(f"Sample rate: {self.RATE}Hz")
         print("\nPress Ctrl+C to stop the virtual device...")
         
-        # Start the stream
+        # Start the consumer before the stream so the ring never sits full
+        self.consumer.start()
         self.stream.start_stream()
         
     def audio_callback(self, in_data, frame_count, time_info, status):
         """
-        Callback function that receives audio from the source device
-        and converts it to mono for the virtual input device
+        Callback function that receives audio from the source device.
+        
+        Runs on PortAudio's thread, so it only copies the buffer into the
+        preallocated ring: no allocation, locking, printing or I/O here.
         """
         if status:
-            print(f"Status: {status}")
-            
-        # Convert input data to numpy array
-        audio_data = np.frombuffer(in_data, dtype=np.float32)
-        
-        # Store audio data for transcription
-        self.audio_data.append(audio_data.copy())
-        
-        # Send to transcription service
-        self.transcription_service.add_audio_data(audio_data, 'tab')
-        
-        return (in_data, pyaudio.paContinue)
+            self.ring.xruns += 1
+        self.ring.write(np.frombuffer(in_data, dtype=np.float32))
+        return (None, pyaudio.paContinue)
 
     def get_transcription(self):
         """Get the current transcription."""
@@ -100,7 +200,13 @@ class VirtualInputDevice:
         if self.stream:
             self.stream.stop_stream()
             self.stream.close()
+            self.stream = None
+        # Hand over everything captured before stopping transcription
+        self.consumer.stop()
+        if self.ring.xruns or self.ring.overflows:
+            print(f"Capture: {self.ring.xruns} xruns, {self.ring.overflows} dropped chunks")
         self.transcription_service.stop()
+        self.storage.close()
         self.p.terminate()
 
 def main():
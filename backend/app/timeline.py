@@ -0,0 +1,158 @@
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Speaker heard on each channel: the interviewee's microphone and the
+# interviewer's meeting tab
+SPEAKERS = {
+    'mic': 'interviewee',
+    'tab': 'interviewer'
+}
+
+
+class Segment(NamedTuple):
+    speaker: str
+    start: float
+    end: float
+    text: str
+
+
+class Turn:
+    def __init__(self, speaker: str):
+        """A run of consecutive segments from one speaker."""
+        self.speaker = speaker
+        self.segments: List[Segment] = []
+
+    @property
+    def start(self) -> float:
+        return self.segments[0].start
+
+    @property
+    def end(self) -> float:
+        return self.segments[-1].end
+
+    @property
+    def text(self) -> str:
+        return " ".join(segment.text for segment in self.segments)
+
+    def to_dict(self) -> dict:
+        return {'speaker': self.speaker, 'start': self.start, 'end': self.end, 'text': self.text}
+
+
+class ConversationTimeline:
+    def __init__(self, channels: Iterable[str] = SPEAKERS):
+        """
+        Initialize a timestamp-ordered timeline merged from several channels.
+
+        Each channel delivers its segments in time order but the channels run
+        independently, so a segment is only placed once every channel has
+        been transcribed past its start. Merging is then a k-way merge of the
+        pending heads, O(new segments) per update.
+
+        Args:
+            channels: Channels to merge, each mapped to a speaker by SPEAKERS
+        """
+        self.channels = list(channels)
+        self._pending: Dict[str, List[Segment]] = {channel: [] for channel in self.channels}
+        # How far (in seconds) each channel has been transcribed
+        self._watermarks: Dict[str, float] = {channel: 0.0 for channel in self.channels}
+        self._turns: List[Turn] = []
+        self._turn_starts: List[float] = []
+        # Running maximum of turn end times, for range queries
+        self._max_ends: List[float] = []
+        self._lock = threading.Lock()
+
+    def add(self, channel: str, segments: Iterable[Tuple[float, float, str]], transcribed_until: Optional[float] = None):
+        """
+        Add newly transcribed segments of a channel.
+
+        Args:
+            channel: Channel the segments were transcribed from
+            segments: (start, end, text) in seconds from the start of the channel
+            transcribed_until: Time up to which the channel is now transcribed;
+                               defaults to the end of the last segment
+        """
+        speaker = SPEAKERS.get(channel, channel)
+        with self._lock:
+            pending = self._pending[channel]
+            for start, end, text in segments:
+                text = text.strip()
+                if text:
+                    pending.append(Segment(speaker, start, end, text))
+            if transcribed_until is None:
+                transcribed_until = pending[-1].end if pending else self._watermarks[channel]
+            self._watermarks[channel] = max(self._watermarks[channel], transcribed_until)
+            self._merge(min(self._watermarks.values()))
+
+    def flush(self):
+        """Place every pending segment, e.g. once all channels have stopped."""
+        with self._lock:
+            self._merge(float('inf'))
+
+    def _merge(self, watermark: float):
+        """Move pending segments starting before watermark onto the turns, in time order."""
+        positions = {channel: 0 for channel in self.channels}
+        while True:
+            head = None
+            for channel in self.channels:
+                pending = self._pending[channel]
+                position = positions[channel]
+                if position < len(pending) and pending[position].start < watermark:
+                    if head is None or pending[position].start < head[1].start:
+                        head = (channel, pending[position])
+            if head is None:
+                break
+            positions[head[0]] += 1
+            self._place(head[1])
+        for channel, position in positions.items():
+            if position:
+                del self._pending[channel][:position]
+
+    def _place(self, segment: Segment):
+        if not self._turns or self._turns[-1].speaker != segment.speaker:
+            self._turns.append(Turn(segment.speaker))
+            self._turn_starts.append(segment.start)
+            self._max_ends.append(max(segment.end, self._max_ends[-1] if self._max_ends else 0.0))
+        else:
+            self._max_ends[-1] = max(self._max_ends[-1], segment.end)
+        self._turns[-1].segments.append(segment)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._turns)
+
+    def turns(self) -> List[Turn]:
+        """Get every placed turn in time order."""
+        with self._lock:
+            return list(self._turns)
+
+    def turn(self, index: int) -> Turn:
+        """Get a turn by index; negative indexes count from the latest turn."""
+        with self._lock:
+            return self._turns[index]
+
+    def between(self, start: float, end: float) -> List[Turn]:
+        """Get the turns overlapping the time range [start, end)."""
+        with self._lock:
+            first = bisect_right(self._max_ends, start)
+            last = bisect_left(self._turn_starts, end)
+            return [turn for turn in self._turns[first:last] if turn.end > start]
+
+    def last_exchange(self) -> Tuple[Optional[Turn], List[Turn]]:
+        """
+        Get the most recent interviewer turn and the interviewee turns after it.
+
+        Returns:
+            tuple: (question turn or None, answer turns)
+        """
+        with self._lock:
+            for index in range(len(self._turns) - 1, -1, -1):
+                if self._turns[index].speaker == 'interviewer':
+                    return self._turns[index], self._turns[index + 1:]
+            return None, list(self._turns)
+
+    def format(self, turns: Optional[List[Turn]] = None) -> str:
+        """Format turns, by default all of them, as 'Speaker: text' paragraphs."""
+        if turns is None:
+            turns = self.turns()
+        return "\n\n".join(f"{turn.speaker.capitalize()}: {turn.text}" for turn in turns)
@@ -0,0 +1,236 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from .metrics import STAGE_LATENCY
+
+# Log level for the backend's loggers
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Requests slower than this are logged at WARNING with their span breakdown
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "5000"))
+
+# Fraction of requests to run under the sampling profiler (0 disables it)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.getcwd(), "profiles"))
+
+_current_trace: ContextVar[Optional['Trace']] = ContextVar('current_trace', default=None)
+
+
+class _AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler whose listener thread writes the records to stderr.
+
+    The listener is started lazily in each process, so records logged in a
+    forked worker are not stranded behind the master's listener thread.
+    """
+
+    def __init__(self):
+        super().__init__(queue.SimpleQueue())
+        self._listener = None
+        self._listener_pid = None
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        if self._listener_pid != os.getpid():
+            self._start_listener()
+        super().emit(record)
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            stream_handler = logging.StreamHandler()
+            stream_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(name)s] %(message)s'))
+            self._listener = logging.handlers.QueueListener(self.queue, stream_handler)
+            self._listener.start()
+            self._listener_pid = os.getpid()
+
+
+def configure_logging():
+    """Send the backend's log records through the async queue handler."""
+    logger = logging.getLogger('app')
+    if not any(isinstance(handler, _AsyncQueueHandler) for handler in logger.handlers):
+        logger.addHandler(_AsyncQueueHandler())
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+
+
+class Span:
+    def __init__(self, name: str, parent: Optional['Span'], start: float, attributes: dict):
+        self.name = name
+        self.parent = parent
+        self.start = start
+        self.end: Optional[float] = None
+        self.attributes = attributes
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+
+class Trace:
+    def __init__(self, name: str, profile: bool = False):
+        """
+        Initialize a trace that records the spans of one request.
+
+        Args:
+            name: Name of the traced operation, usually the route
+            profile: Run the sampling profiler for this trace
+        """
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.spans: List[Span] = []
+        self.active_span: Optional[Span] = None
+        self.profiler = SamplingProfiler(threading.get_ident()) if profile else None
+        if self.profiler:
+            self.profiler.start()
+
+    def finish(self, **attributes):
+        """Finish the trace, log its breakdown and dump the profile if sampled."""
+        self.end = time.perf_counter()
+        total_ms = (self.end - self.start) * 1000
+        breakdown = ", ".join(f"{span.name}={span.duration * 1000:.1f}ms" for span in self.spans)
+        level = logging.WARNING if total_ms >= TRACE_SLOW_MS else logging.DEBUG
+        logger.log(level, f"trace {self.trace_id} {self.name} {total_ms:.1f}ms {attributes} [{breakdown}]")
+
+        if self.profiler:
+            self.profiler.stop()
+            self._dump_timeline(attributes)
+
+    def timeline(self, **attributes) -> dict:
+        """Get the trace as a timeline of spans relative to the trace start."""
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'attributes': attributes,
+            'duration_ms': ((self.end or time.perf_counter()) - self.start) * 1000,
+            'spans': [
+                {
+                    'name': span.name,
+                    'parent': span.parent.name if span.parent else None,
+                    'start_ms': (span.start - self.start) * 1000,
+                    'duration_ms': span.duration * 1000,
+                    'attributes': span.attributes
+                }
+                for span in self.spans
+            ],
+            'samples': [
+                {'t_ms': (t - self.start) * 1000, 'stack': stack}
+                for t, stack in (self.profiler.samples if self.profiler else [])
+            ]
+        }
+
+    def _dump_timeline(self, attributes: dict):
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{self.trace_id}.json")
+            with open(path, 'w') as f:
+                json.dump(self.timeline(**attributes), f, indent=2, default=str)
+            logger.info(f"Wrote profile timeline for trace {self.trace_id} to {path}")
+        except OSError as e:
+            logger.error(f"Could not write profile timeline: {str(e)}")
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL_MS / 1000):
+        """
+        Initialize a profiler that samples one thread's stack at an interval.
+
+        Args:
+            thread_id: Identifier of the thread to sample
+            interval: Seconds between samples
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < 32:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.samples.append((time.perf_counter(), stack))
+
+
+def start_trace(name: str) -> Trace:
+    """
+    Start a trace for the current request or job.
+
+    The trace is sampled for profiling with probability PROFILE_SAMPLE_RATE.
+    """
+    trace = Trace(name, profile=PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+    _current_trace.set(trace)
+    return trace
+
+
+def end_trace(**attributes):
+    """Finish the current trace, if any."""
+    trace = _current_trace.get()
+    if trace is not None:
+        _current_trace.set(None)
+        trace.finish(**attributes)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a pipeline stage.
+
+    The duration is always recorded in the stage latency histogram, and added
+    to the current trace as a span when one is active.
+
+    Args:
+        name: Stage name
+        **attributes: Extra values stored with the span
+    """
+    trace = _current_trace.get()
+    start = time.perf_counter()
+    record = None
+    if trace is not None:
+        record = Span(name, trace.active_span, start, attributes)
+        trace.spans.append(record)
+        trace.active_span = record
+    try:
+        yield record
+    finally:
+        end = time.perf_counter()
+        STAGE_LATENCY.observe(end - start, stage=name)
+        if record is not None:
+            record.end = end
+            trace.active_span = record.parent
+
+
+configure_logging()
+logger = logging.getLogger(__name__)
@@ -1,22 +1,141 @@
+import os
 import time
 import threading
-from typing import Optional, List, Dict
-import whisper
+import logging
+from bisect import bisect_right
+from typing import Optional, List, Dict, Tuple, TYPE_CHECKING
 import numpy as np
 from queue import Queue
 import time
+from .question_classifier import QuestionTracker
+from .timeline import ConversationTimeline
+from .metrics import STAGE_LATENCY, QUEUED_AUDIO_SECONDS, REALTIME_FACTOR
+from .admission import admission, LIVE, BATCH, BATCH_WINDOW_SECONDS
+from .cpu_profile import prepare_model
+from .vad import streamed_frame_energies, speech_regions
+from .feature_cache import StreamingLogMel, FEATURE_CACHE_SECONDS, N_FRAMES, decode_features
+from .prosody import ProsodyTracker
+from .scheduler import AdaptiveScheduler, engine_stats, SCHEDULER_IDLE_SECONDS
+
+if TYPE_CHECKING:
+    import whisper
+
+logger = logging.getLogger(__name__)
+
+# Whisper expects 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+# Model producing live partials while recording
+LIVE_MODEL = os.getenv("LIVE_MODEL", "base")
+
+# Larger model that re-transcribes the speech regions of a session when it
+# stops; empty disables the final pass
+FINAL_MODEL = os.getenv("FINAL_MODEL", "")
+
+# Streamed audio arriving this many seconds later than its channel's sample
+# clock means the channel paused; the clock jumps forward to the wall clock
+CLOCK_GAP_SECONDS = 1.0
+
+# How far behind the wall clock a caught-up channel's next audio may start
+IDLE_CHANNEL_LAG = 2.0
+
+# Loaded Whisper models shared by every TranscriptionService in the process
+_models: Dict[str, 'whisper.Whisper'] = {}
+_model_locks: Dict[str, threading.Lock] = {}
+_models_lock = threading.Lock()
+
+
+def load_model(model_name: str):
+    """
+    Load a Whisper model once per process and share it between services.
+
+    Whisper installs decoding hooks on the model while transcribing, so
+    concurrent transcriptions on one model must be serialized with the
+    returned lock.
+
+    Returns:
+        tuple: (model, lock guarding model.transcribe)
+    """
+    with _models_lock:
+        if model_name not in _models:
+            # Imported on first load, so the service runs on injected models
+            # (the benchmarks' fake engine) without whisper installed
+            import whisper
+            # Quantized per WHISPER_QUANTIZE before any worker forks
+            _models[model_name] = prepare_model(whisper.load_model(model_name))
+            _model_locks[model_name] = threading.Lock()
+        return _models[model_name], _model_locks[model_name]
+
+
+def preload_models(model_names: List[str]):
+    """
+    Load Whisper models ahead of time.
+
+    Called in a pre-fork server's master process so every worker shares the
+    same weights copy-on-write instead of loading its own copy.
+    """
+    for model_name in model_names:
+        load_model(model_name)
+
+
+def loaded_models() -> Dict[str, tuple]:
+    """
+    Get every model loaded in this process.
+
+    Returns:
+        dict: Model name to (model, lock)
+    """
+    with _models_lock:
+        return {name: (_models[name], _model_locks[name]) for name in _models}
+
+
+def split_windows(audio: np.ndarray, window: int, search: int = SAMPLE_RATE, frame: int = 320):
+    """
+    Split audio into windows of at most window samples.
+
+    Each cut is moved to the quietest 20 ms frame in the last search samples
+    of the window, so words are rarely split across windows.
+
+    Returns:
+        list: (start, end) sample offsets
+    """
+    bounds = []
+    start = 0
+    while len(audio) - start > window:
+        end = start + window
+        tail = audio[max(start, end - search):end]
+        frames = len(tail) // frame
+        if frames > 1:
+            energy = np.square(tail[:frames * frame].reshape(frames, frame)).mean(axis=1)
+            end = end - len(tail) + int(np.argmin(energy)) * frame + frame // 2
+        bounds.append((start, end))
+        start = end
+    bounds.append((start, len(audio)))
+    return bounds
 
 
 class TranscriptionService:
-    def __init__(self, model_name: str = "base", interval: float = 0.5):
+    def __init__(self, model_name: Optional[str] = None, interval: float = 0.5, storage=None,
+                 final_model_name: Optional[str] = None):
         """
         Initialize the transcription service.
         
         Args:
-            model_name: Whisper model to use for transcription
-            interval: Time interval in seconds for processing audio chunks
+            model_name: Whisper model for live transcription, defaults to LIVE_MODEL
+            interval: Shortest time interval in seconds between live
+                      transcriptions; the scheduler lengthens it under load
+            storage: Optional SessionStorage; audio and transcribed segments
+                     are written to it, and a service created on an existing
+                     session resumes where it stopped
+            final_model_name: Whisper model for the final pass at stop,
+                              defaults to FINAL_MODEL. The final pass reads
+                              the session audio back, so it needs storage.
         """
-        self.model = whisper.load_model(model_name)
+        self.model_name = model_name or LIVE_MODEL
+        self.model, self.model_lock = load_model(self.model_name)
+        final_model_name = FINAL_MODEL if final_model_name is None else final_model_name
+        self.final_model_name = final_model_name
+        self.final_model, self.final_model_lock = load_model(final_model_name) if final_model_name else (None, None)
         self.interval = interval
         self.audio_queues = {
             'mic': Queue(),
@@ -26,11 +145,92 @@ class TranscriptionService:
             'mic': [],
             'tab': []
         }
+        # Samples of each channel already taken off the queue and transcribed
+        self.samples_processed = {
+            'mic': 0,
+            'tab': 0
+        }
+        # (first sample, session time) of each transcribed window, per channel
+        self._window_times: Dict[str, List[Tuple[int, float]]] = {
+            'mic': [],
+            'tab': []
+        }
+        # Adapts each channel's interval and window size to the engine's load
+        self.schedulers = {
+            channel: AdaptiveScheduler(engine_stats(self.model_name), channel, min_interval=interval)
+            for channel in self.audio_queues
+        }
+        self.storage = storage
+        # Log-mel frames computed as audio arrives, so decoding a window
+        # never recomputes its spectrogram
+        self.features: Dict[str, StreamingLogMel] = {}
+        n_mels = getattr(getattr(self.model, 'dims', None), 'n_mels', None)
+        if n_mels and FEATURE_CACHE_SECONDS > 0:
+            self.features = {channel: StreamingLogMel(n_mels) for channel in self.audio_queues}
+        # Classifies interviewer questions as tab segments arrive
+        self.question_tracker = QuestionTracker()
+        # Both channels merged into speaker turns on a shared session clock
+        self.timeline = ConversationTimeline(self.audio_queues)
+        # Delivery metrics updated as audio and segments arrive
+        self.prosody = ProsodyTracker(self.audio_queues, SAMPLE_RATE)
+        self._started_at = time.monotonic()
+        # Session time of the next sample to arrive on each channel
+        self._clocks: Dict[str, Optional[float]] = {
+            'mic': None,
+            'tab': None
+        }
+        # Samples added but not yet transcribed, per channel
+        self._unprocessed = {
+            'mic': 0,
+            'tab': 0
+        }
+        self._clock_lock = threading.Lock()
         self.is_running = False
         self.processing_threads: Dict[str, Optional[threading.Thread]] = {
             'mic': None,
             'tab': None
         }
+        if storage is not None:
+            self._restore()
+
+    def _restore(self):
+        """Rebuild the transcripts from storage and requeue untranscribed audio."""
+        for segment in self.storage.segments():
+            channel = segment['channel']
+            if channel not in self.samples_processed:
+                continue
+            if segment['text']:
+                self._append_transcription(channel, segment['text'])
+            self.samples_processed[channel] = max(self.samples_processed[channel], segment['end'])
+            self._window_times[channel].append((segment['start'], segment.get('time', 0.0)))
+            window_end = segment.get('time', 0.0) + (segment['end'] - segment['start']) / SAMPLE_RATE
+            self._clocks[channel] = max(self._clocks[channel] or 0.0, window_end)
+            self.timeline.add(channel, segment.get('segments', []), window_end)
+            self.prosody.add_segments(channel, segment.get('segments', []))
+
+        # Continue the session clock from where the stored session stopped
+        self._started_at = time.monotonic() - max(clock or 0.0 for clock in self._clocks.values())
+
+        for channel, processed in self.samples_processed.items():
+            # Recompute the delivery metrics over the stored audio, a block at a time
+            total = self.storage.samples_written(channel)
+            block = 30 * SAMPLE_RATE
+            for start in range(self.storage.audio_start(channel), total, block):
+                end = min(start + block, total)
+                self.prosody.add_audio(channel, self.storage.read_audio(channel, start, end),
+                                       self._sample_time(channel, start))
+            if channel in self.features:
+                # Features resume with new audio; requeued audio is decoded from samples
+                self.features[channel] = StreamingLogMel(
+                    self.features[channel].n_mels, start_sample=self.storage.samples_written(channel)
+                )
+            pending = self.storage.read_audio(channel, processed)
+            if len(pending):
+                start_time = self._clocks[channel] or 0.0
+                self._clocks[channel] = start_time + len(pending) / SAMPLE_RATE
+                self._unprocessed[channel] += len(pending)
+                self.audio_queues[channel].put((time.time(), pending, start_time))
+                QUEUED_AUDIO_SECONDS.inc(len(pending) / SAMPLE_RATE, channel=channel)
 
     def start(self):
         """Start the transcription service for both channels."""
@@ -46,11 +246,78 @@ class TranscriptionService:
     def stop(self):
         """Stop the transcription service and process any remaining audio."""
         self.is_running = False
-        for channel in ['mic', 'tab']:
-            # Process any remaining audio in the queue
-            self._process_remaining_audio(channel)
-            if self.processing_threads[channel]:
-                self.processing_threads[channel].join()
+        try:
+            for channel in ['mic', 'tab']:
+                # Let the thread finish its window first so audio stays in order
+                if self.processing_threads[channel]:
+                    self.processing_threads[channel].join()
+                # Process any remaining audio in the queue
+                self._process_remaining_audio(channel)
+        finally:
+            # Detach from the engine's load even if the last windows failed
+            for channel in ['mic', 'tab']:
+                self.schedulers[channel].stop()
+        # Nothing more will arrive, so every segment can be placed
+        self.timeline.flush()
+        if self.final_model is not None:
+            self._final_pass()
+
+    def _final_pass(self):
+        """
+        Re-transcribe the speech regions of the whole session with the final model.
+        
+        Live partials from the small model are replaced by the final
+        transcript, timeline and question history. Only regions the energy
+        VAD marks as speech are decoded, read back from storage one region at
+        a time so memory stays bounded.
+        """
+        if self.storage is None:
+            logger.debug("Skipping the final pass: the session audio was not stored")
+            return
+        if any(self.storage.audio_start(channel) for channel in self.transcription_buffers):
+            logger.debug("Skipping the final pass: part of the session audio is on another node")
+            return
+
+        buffers = {channel: [] for channel in self.transcription_buffers}
+        timeline = ConversationTimeline(self.audio_queues)
+        final_segments = {channel: [] for channel in self.transcription_buffers}
+        with STAGE_LATENCY.time(stage='final_pass'):
+            for channel in buffers:
+                total = self.samples_processed[channel]
+                if not total:
+                    continue
+                levels = streamed_frame_energies(
+                    lambda start, end: self.storage.read_audio(channel, start, end), total
+                )
+                for start, end in speech_regions(levels, SAMPLE_RATE):
+                    text, segments = self.transcribe_segments(
+                        self.storage.read_audio(channel, start, end), channel, BATCH, final=True, sample_offset=start
+                    )
+                    if text:
+                        buffers[channel].append(text)
+                    offset = self._sample_time(channel, start)
+                    segments = [(offset + s, offset + e, t) for s, e, t in segments]
+                    timeline.add(channel, segments)
+                    final_segments[channel].extend(segments)
+        timeline.flush()
+
+        question_tracker = QuestionTracker()
+        for text in buffers['tab']:
+            question_tracker.feed(text)
+        # Swap everything at once so readers never see a half-built transcript
+        self.transcription_buffers, self.timeline, self.question_tracker = buffers, timeline, question_tracker
+        for channel, segments in final_segments.items():
+            self.prosody.clear_segments(channel)
+            self.prosody.add_segments(channel, segments)
+
+    def _sample_time(self, channel: str, sample: int) -> float:
+        """Get the session time of a stored sample of a channel."""
+        windows = self._window_times[channel]
+        index = bisect_right(windows, (sample, float('inf'))) - 1
+        if index < 0:
+            return sample / SAMPLE_RATE
+        window_start, window_time = windows[index]
+        return window_time + (sample - window_start) / SAMPLE_RATE
 
     def add_audio_data(self, audio_data: np.ndarray, channel: str):
         """
@@ -61,63 +328,264 @@ class TranscriptionService:
             channel: 'mic' for microphone or 'tab' for tab audio
         """
         if channel in self.audio_queues:
-            self.audio_queues[channel].put(audio_data)
+            duration = len(audio_data) / SAMPLE_RATE
+            with self._clock_lock:
+                now = time.monotonic() - self._started_at
+                start_time = self._clocks[channel]
+                if start_time is None or start_time < now - duration - CLOCK_GAP_SECONDS:
+                    # The channel started or resumed after a pause; align it
+                    # with the wall clock, the chunk having just ended
+                    start_time = max(start_time or 0.0, now - duration)
+                self._clocks[channel] = start_time + duration
+                self._unprocessed[channel] += len(audio_data)
+            if self.storage is not None:
+                self.storage.append_audio(channel, audio_data)
+            if channel in self.features:
+                with STAGE_LATENCY.time(stage='features'):
+                    self.features[channel].append(audio_data)
+            with STAGE_LATENCY.time(stage='prosody'):
+                self.prosody.add_audio(channel, audio_data, start_time)
+            # Queue the enqueue time with the chunk to measure queue wait
+            self.audio_queues[channel].put((time.time(), audio_data, start_time))
+            QUEUED_AUDIO_SECONDS.inc(duration, channel=channel)
 
     def get_transcription(self, channel: str = None) -> str:
         """
         Get the current accumulated transcription.
         
         Args:
-            channel: 'mic', 'tab', or None for both channels combined
+            channel: 'mic', 'tab', or None for the conversation as speaker
+                     turns in time order
         """
         if channel:
             return " ".join(self.transcription_buffers[channel])
         else:
-            mic_text = " ".join(self.transcription_buffers['mic'])
-            tab_text = " ".join(self.transcription_buffers['tab'])
-            return f"Microphone: {mic_text}\n\nTab Audio: {tab_text}"
+            return self.get_timeline().format()
+
+    def get_timeline(self) -> ConversationTimeline:
+        """Get the conversation timeline, with every settled segment placed."""
+        self._advance_idle_channels()
+        return self.timeline
+
+    def _advance_idle_channels(self):
+        """Let channels with nothing left to transcribe stop holding back the timeline."""
+        now = time.monotonic() - self._started_at
+        for channel in self.timeline.channels:
+            with self._clock_lock:
+                if self._unprocessed[channel]:
+                    continue
+                clock = self._clocks[channel]
+            self.timeline.add(channel, [], max(clock or 0.0, now - IDLE_CHANNEL_LAG))
+
+    def get_prosody(self) -> dict:
+        """Get the delivery metrics of the session so far, as ProsodyTracker.summary."""
+        return self.prosody.summary()
+
+    def scheduling_status(self) -> Dict[str, dict]:
+        """Get each channel's live transcription interval, backlog and whether it is falling behind."""
+        return {channel: scheduler.status() for channel, scheduler in self.schedulers.items()}
+
+    def get_question_type(self) -> str:
+        """Get the type of the most recent interviewer question."""
+        return self.question_tracker.current_type()
+
+    def _append_transcription(self, channel: str, text: str):
+        """Append transcribed text to a channel buffer."""
+        self.transcription_buffers[channel].append(text)
+        if channel == 'tab':
+            self.question_tracker.feed(text)
+
+    def _take_chunk(self, channel: str, item) -> Tuple[np.ndarray, float]:
+        """
+        Unpack a queued chunk and record how long it waited.
+        
+        Returns:
+            tuple: (samples, session time of the first sample)
+        """
+        enqueued_at, audio_chunk, start_time = item
+        STAGE_LATENCY.observe(time.time() - enqueued_at, stage='queue_wait')
+        QUEUED_AUDIO_SECONDS.dec(len(audio_chunk) / SAMPLE_RATE, channel=channel)
+        return audio_chunk, start_time
+
+    def transcribe(self, audio: np.ndarray, channel: Optional[str] = None, priority: Optional[int] = None) -> str:
+        """
+        Transcribe a complete piece of audio with the shared model.
+        
+        Returns:
+            str: Transcribed text
+        """
+        return self.transcribe_segments(audio, channel, priority)[0]
+
+    def transcribe_segments(self, audio: np.ndarray, channel: Optional[str] = None, priority: Optional[int] = None,
+                            final: bool = False,
+                            sample_offset: Optional[int] = None) -> Tuple[str, List[Tuple[float, float, str]]]:
+        """
+        Transcribe a complete piece of audio with the shared model, with timestamps.
+        
+        Batch audio is transcribed in windows of BATCH_WINDOW_SECONDS, each
+        admitted separately, so live windows can run between them.
+        
+        Args:
+            audio: float32 samples at SAMPLE_RATE
+            channel: Channel label for the real-time factor metric
+            priority: LIVE or BATCH; defaults to LIVE for streamed channels
+                      and BATCH for whole files
+            final: Use the final-pass model instead of the live model
+            sample_offset: Channel sample index of audio[0]; when given,
+                           windows covered by the feature cache are decoded
+                           from cached log-mel frames
+        
+        Returns:
+            tuple: (transcribed text, segments as (start, end, text) in
+            seconds from the start of the audio)
+        
+        Raises:
+            OverloadedError: If a batch window could not be admitted in time
+        """
+        if len(audio) == 0:
+            return "", []
+        if priority is None:
+            priority = LIVE if channel else BATCH
+        window = len(audio) if priority == LIVE else int(BATCH_WINDOW_SECONDS * SAMPLE_RATE)
+
+        model, model_lock = (self.final_model, self.final_model_lock) if final else (self.model, self.model_lock)
+
+        texts = []
+        segments = []
+        elapsed = 0.0
+        for start, end in split_windows(audio, window):
+            features = None
+            if sample_offset is not None:
+                features = self._cached_features(channel, model, sample_offset + start, sample_offset + end)
+            with admission.slot(priority):
+                with model_lock:
+                    window_start = time.perf_counter()
+                    if features is not None:
+                        result = decode_features(model, features)
+                    else:
+                        result = model.transcribe(audio[start:end])
+                    elapsed += time.perf_counter() - window_start
+            texts.append(result["text"].strip())
+            offset = start / SAMPLE_RATE
+            window_segments = result.get("segments") or [
+                {'start': 0.0, 'end': (end - start) / SAMPLE_RATE, 'text': result["text"]}
+            ]
+            segments.extend(
+                (offset + segment['start'], offset + segment['end'], segment['text'].strip())
+                for segment in window_segments if segment['text'].strip()
+            )
+        STAGE_LATENCY.observe(elapsed, stage='inference')
+        engine_stats(self.final_model_name if final else self.model_name).record(len(audio) / SAMPLE_RATE, elapsed)
+        REALTIME_FACTOR.set(elapsed / (len(audio) / SAMPLE_RATE), channel='final' if final else channel or 'file')
+        return " ".join(text for text in texts if text), segments
+
+    def _cached_features(self, channel: Optional[str], model, start: int, end: int) -> Optional[np.ndarray]:
+        """Get cached log-mel frames for channel samples [start, end) if they fit one decoder window."""
+        cache = self.features.get(channel)
+        if cache is None or getattr(getattr(model, 'dims', None), 'n_mels', None) != cache.n_mels:
+            return None
+        frames = cache.window(start, end)
+        if frames is None or frames.shape[1] > N_FRAMES:
+            return None
+        return frames
+
+    def _transcribe(self, channel: str, audio: np.ndarray, start_time: float):
+        """
+        Transcribe audio with the shared model, append the text to the channel
+        and place its segments on the timeline.
+        
+        Args:
+            channel: 'mic' or 'tab'
+            audio: Window of samples taken off the channel's queue
+            start_time: Session time of the first sample
+        """
+        text, segments = self.transcribe_segments(audio, channel, sample_offset=self.samples_processed[channel])
+        segments = [(start_time + start, start_time + end, segment_text) for start, end, segment_text in segments]
+        start = self.samples_processed[channel]
+        self.samples_processed[channel] = start + len(audio)
+        self._window_times[channel].append((start, start_time))
+        if self.storage is not None:
+            self.storage.append_segment(channel, start, start + len(audio), text, time=start_time, segments=segments)
+        if text:
+            self._append_transcription(channel, text)
+
+        with self._clock_lock:
+            self._unprocessed[channel] -= len(audio)
+        self.timeline.add(channel, segments, start_time + len(audio) / SAMPLE_RATE)
+        self.prosody.add_segments(channel, segments)
+        self._advance_idle_channels()
 
     def _process_remaining_audio(self, channel: str):
         """Process any remaining audio in the queue."""
         accumulated_audio = np.array([], dtype=np.float32)
+        window_start = None
         
         # Get all remaining audio from the queue
         while not self.audio_queues[channel].empty():
             try:
-                audio_chunk = self.audio_queues[channel].get_nowait()
+                audio_chunk, chunk_start = self._take_chunk(channel, self.audio_queues[channel].get_nowait())
                 accumulated_audio = np.concatenate([accumulated_audio, audio_chunk])
+                if window_start is None:
+                    window_start = chunk_start
             except:
                 break
 
         if len(accumulated_audio) > 0:
             # Transcribe the remaining audio
-            result = self.model.transcribe(accumulated_audio)
-            if result["text"].strip():
-                self.transcription_buffers[channel].append(result["text"].strip())
+            self._transcribe(channel, accumulated_audio, window_start)
 
     def _process_audio(self, channel: str):
         """Process audio chunks for a specific channel and update transcription."""
-        accumulated_audio = np.array([], dtype=np.float32)
+        scheduler = self.schedulers[channel]
+        max_window = int(scheduler.max_window_seconds * SAMPLE_RATE)
+        chunks = []
+        accumulated = 0
+        # Session time of the first sample in the accumulated chunks
+        window_start = None
         last_process_time = time.time()
+        last_audio_time = last_process_time
 
         while self.is_running:
             try:
-                audio_chunk = self.audio_queues[channel].get(timeout=0.1)
-                accumulated_audio = np.concatenate([accumulated_audio, audio_chunk])
+                audio_chunk, chunk_start = self._take_chunk(channel, self.audio_queues[channel].get(timeout=0.1))
+                chunks.append(audio_chunk)
+                accumulated += len(audio_chunk)
+                if window_start is None:
+                    window_start = chunk_start
             except:
+                if time.time() - last_audio_time >= SCHEDULER_IDLE_SECONDS:
+                    # An idle channel doesn't load the engine
+                    scheduler.stop()
                 continue
+            # Count the channel towards the engine's load while audio arrives
+            scheduler.start()
+            last_audio_time = time.time()
 
             current_time = time.time()
-            if current_time - last_process_time >= self.interval:
-                if len(accumulated_audio) > 0:
-                    # Transcribe the accumulated audio
-                    result = self.model.transcribe(accumulated_audio)
-                    if result["text"].strip():
-                        self.transcription_buffers[channel].append(result["text"].strip())
-                    
-                    # Reset the audio buffer
-                    accumulated_audio = np.array([], dtype=np.float32)
-                    last_process_time = current_time
+            if current_time - last_process_time >= scheduler.interval and accumulated:
+                # Take whatever piled up during the last window along, up to
+                # the window bound, instead of falling behind chunk by chunk
+                while accumulated < max_window and not self.audio_queues[channel].empty():
+                    try:
+                        audio_chunk, _ = self._take_chunk(channel, self.audio_queues[channel].get_nowait())
+                    except:
+                        break
+                    chunks.append(audio_chunk)
+                    accumulated += len(audio_chunk)
+
+                self._transcribe(channel, np.concatenate(chunks), window_start)
+                chunks = []
+                accumulated = 0
+                window_start = None
+                last_process_time = current_time
+
+                with self._clock_lock:
+                    backlog = self._unprocessed[channel] / SAMPLE_RATE
+                scheduler.update(backlog)
+
+        # Transcribe the partial window taken off the queue before stopping
+        if accumulated:
+            self._transcribe(channel, np.concatenate(chunks), window_start)
 
 # # Example usage:
 # service = TranscriptionService()
@@ -0,0 +1,571 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import secrets
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, TYPE_CHECKING
+
+try:
+    import fcntl
+except ImportError:  # Windows: chunks are only serialized within one process
+    fcntl = None
+
+from .admission import OverloadedError, admission
+from .stream_decode import DecodeError, FfmpegStreamDecoder, WavStreamParser, ffmpeg_available
+
+if TYPE_CHECKING:
+    from .audio_processing import StreamingAnalysis
+
+logger = logging.getLogger(__name__)
+
+# Directory holding one subdirectory per upload in progress
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(os.getcwd(), "uploads"))
+
+# Largest recording accepted through chunked uploads
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+# Chunk size suggested to clients; each chunk request is still bound by MAX_CONTENT_LENGTH
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Seconds after its last chunk an unfinished upload, or a finished upload's result, is kept
+UPLOAD_TTL = float(os.getenv("UPLOAD_TTL", "86400"))
+
+# Bytes of the received file decoded at a time while the upload is still arriving
+DECODE_READ_BYTES = 1024 * 1024
+
+# Seconds between checks for chunks and finalize requests received by other processes
+DECODE_POLL_SECONDS = float(os.getenv("UPLOAD_DECODE_POLL_SECONDS", "1"))
+
+# Upload ids are URL-safe base64; anything else could escape UPLOAD_DIR
+_UPLOAD_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class UploadError(Exception):
+    def __init__(self, message: str, status: int = 400, offset: Optional[int] = None):
+        """
+        A chunked upload request that can't be applied.
+
+        Args:
+            message: Description for the client
+            status: HTTP status to answer with
+            offset: Bytes received so far, for the client to resume from
+        """
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def sha256_hex(data: bytes) -> str:
+    """Get the hex SHA-256 digest clients send as a checksum."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class Upload:
+    def __init__(self, upload_id: str, path: str, meta: dict, on_finished: Optional[Callable[[str], None]] = None):
+        """
+        Initialize a resumable upload stored in path.
+
+        Chunks must arrive in order: each is written at the offset where
+        the previous one ended, after its checksum is verified. The file and
+        its metadata are on disk, so a client can resume after a dropped
+        connection or a server restart from the offset GET reports.
+
+        While chunks arrive, one process decodes the bytes received so far
+        and transcribes every completed window (StreamingAnalysis), so most
+        of the recording is transcribed by the time the client finalizes.
+        That process holds a lock on decoder.lock; chunks and the finalize
+        request may reach any process, which records them in meta.json for
+        the decoder to pick up. Each transcribed window is appended to
+        windows.jsonl, so a process taking over after the decoder stopped
+        decodes the file again but only transcribes what is left. WAV is
+        decoded in-process, webm and mp3 through ffmpeg; without ffmpeg
+        they are decoded whole on finalize.
+
+        The decoder takes a batch job slot for each block it transcribes and
+        for the final analysis, so uploads in progress count towards
+        MAX_BATCH_JOBS while they are being transcribed, not only on finalize.
+
+        Args:
+            upload_id: Upload token
+            path: Directory of the upload
+            meta: Upload metadata, as written by UploadManager.create
+            on_finished: Called with the upload id once the result is stored
+        """
+        self.upload_id = upload_id
+        self.path = path
+        self.meta = meta
+        self.on_finished = on_finished
+        self.analysis: Optional['StreamingAnalysis'] = None
+        self._lock = threading.Lock()
+        self._finalize_lock = threading.Lock()
+        self._received = threading.Condition()
+        self._changed = False
+        self._cancelled = False
+        self._worker: Optional[threading.Thread] = None
+        # Windows of the analysis already in windows.jsonl
+        self._saved_windows = 0
+
+    @property
+    def data_path(self) -> str:
+        # Keep the extension so ffmpeg can tell the container when decoding the whole file
+        return os.path.join(self.path, 'audio' + os.path.splitext(self.meta['filename'])[1].lower())
+
+    @property
+    def received(self) -> int:
+        return self.meta['received']
+
+    @property
+    def finished(self) -> bool:
+        return os.path.exists(os.path.join(self.path, 'result.json'))
+
+    def status(self) -> dict:
+        """Get the bytes received, the declared size and how far transcription has got."""
+        if self.analysis is not None:
+            seconds = self.analysis.seconds_transcribed
+        else:
+            # Decoded by another process
+            seconds = max((record['end'] / record['sample_rate'] for record in self._load_windows()
+                           if record['channel'] == 'mic'), default=0.0)
+        return {
+            'upload_id': self.upload_id,
+            'offset': self.received,
+            'size': self.meta.get('size'),
+            'state': 'finished' if self.finished else 'receiving',
+            'seconds_transcribed': round(seconds, 1)
+        }
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialize writers of this upload across threads and processes."""
+        with self._lock, open(os.path.join(self.path, '.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _reload_meta(self):
+        with open(os.path.join(self.path, 'meta.json')) as f:
+            self.meta = json.load(f)
+
+    def _save_meta(self):
+        meta_path = os.path.join(self.path, 'meta.json')
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def _load_windows(self) -> List[dict]:
+        """Get the windows transcribed so far, skipping a line cut short by a crash."""
+        windows = []
+        try:
+            with open(os.path.join(self.path, 'windows.jsonl')) as f:
+                for line in f:
+                    try:
+                        windows.append(json.loads(line))
+                    except ValueError:
+                        break
+        except OSError:
+            pass
+        return windows
+
+    def _save_windows(self, analysis: 'StreamingAnalysis'):
+        """Append the windows transcribed since the last call to windows.jsonl."""
+        windows = analysis.windows[self._saved_windows:]
+        if windows:
+            with open(os.path.join(self.path, 'windows.jsonl'), 'a') as f:
+                for record in windows:
+                    f.write(json.dumps(dict(record, sample_rate=analysis.sample_rate)) + '\n')
+            self._saved_windows += len(windows)
+
+    def _notify(self):
+        with self._received:
+            self._changed = True
+            self._received.notify_all()
+
+    def _wait(self):
+        """Wait for a change made in this process, or DECODE_POLL_SECONDS for one made in another."""
+        with self._received:
+            if not self._changed:
+                self._received.wait(DECODE_POLL_SECONDS)
+            self._changed = False
+
+    def write_chunk(self, offset: int, data: bytes, checksum: Optional[str]) -> int:
+        """
+        Store the chunk of the file starting at offset.
+
+        A chunk resent after its acknowledgement was lost is accepted again
+        without being written twice.
+
+        Args:
+            offset: Byte offset of the chunk in the file
+            data: Chunk bytes
+            checksum: Hex SHA-256 of data
+
+        Returns:
+            int: Bytes received so far, the offset of the next chunk
+
+        Raises:
+            UploadError: If the checksum doesn't match, the offset isn't where
+            the upload stands, or the chunk runs past the declared size
+        """
+        if not checksum or sha256_hex(data) != checksum.strip().lower():
+            raise UploadError('Chunk checksum mismatch')
+        with self._file_lock():
+            self._reload_meta()
+            if self.finished or self.meta.get('complete'):
+                raise UploadError('Upload is already finalized', 409, self.received)
+            received = self.received
+            if offset < received and offset + len(data) <= received:
+                with open(self.data_path, 'rb') as f:
+                    f.seek(offset)
+                    if sha256_hex(f.read(len(data))) == sha256_hex(data):
+                        return received
+            if offset != received:
+                raise UploadError(f'Expected a chunk at offset {received}', 409, received)
+            size = self.meta.get('size')
+            if offset + len(data) > (size if size is not None else UPLOAD_MAX_BYTES):
+                raise UploadError('Chunk runs past the end of the upload', 413, received)
+
+            with open(self.data_path, 'r+b') as f:
+                f.seek(offset)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            self.meta['received'] = offset + len(data)
+            self.meta['updated_at'] = time.time()
+            self._save_meta()
+
+        self._notify()
+        self._start_worker()
+        return self.received
+
+    def _start_worker(self):
+        """Start decoding in this process, unless this or another process already decodes the upload."""
+        with self._lock:
+            if self._cancelled or (self._worker is not None and self._worker.is_alive()) or self.finished:
+                return
+            try:
+                lock_file = open(os.path.join(self.path, 'decoder.lock'), 'a')
+            except OSError:
+                # Purged meanwhile
+                return
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    lock_file.close()
+                    return
+            self._worker = threading.Thread(target=self._decode, args=(lock_file,), daemon=True)
+            self._worker.start()
+
+    def _decode(self, lock_file):
+        """Decode and transcribe the file as its bytes arrive, then finish it once it is finalized."""
+        from .audio_processing import StreamingAnalysis
+        try:
+            transcribed = self._load_windows()
+            analysis = self.analysis = StreamingAnalysis(transcribed=transcribed)
+            if transcribed:
+                logger.debug("Upload %s: reusing %d transcribed windows", self.upload_id, len(transcribed))
+            self._saved_windows = len(transcribed)
+            decoder = self._receive(analysis)
+            if decoder is not None:
+                self._finish(analysis, decoder)
+        finally:
+            # Lets another process take over
+            lock_file.close()
+            self._notify()
+
+    def _receive(self, analysis: 'StreamingAnalysis'):
+        """
+        Feed the decoder the bytes received, until the upload is finalized.
+
+        Returns:
+            The decoder, False if the file couldn't be decoded as it arrived,
+            or None if the upload was cancelled, purged or abandoned
+        """
+        decoder = False
+
+        def on_samples(samples):
+            # Blocks that can't get a batch job or inference slot are
+            # retried; once added, the samples stay buffered in the analysis
+            while True:
+                try:
+                    with admission.batch_job():
+                        block, samples = samples, samples[:0]
+                        analysis.add(block, decoder.sample_rate)
+                    return
+                except OverloadedError as e:
+                    if self._cancelled:
+                        raise
+                    time.sleep(e.retry_after)
+
+        extension = os.path.splitext(self.meta['filename'])[1].lower()
+        if extension == '.wav':
+            decoder = WavStreamParser(on_samples)
+        elif ffmpeg_available():
+            decoder = FfmpegStreamDecoder(on_samples)
+        else:
+            logger.debug("No ffmpeg to decode upload %s as it arrives; decoding it on finalize", self.upload_id)
+
+        position = 0
+        try:
+            with open(self.data_path, 'rb') as f:
+                while not self._cancelled:
+                    # Chunks and finalize may have been handled by another process
+                    try:
+                        self._reload_meta()
+                    except OSError:
+                        break
+                    end = self.received
+                    if decoder and position < end:
+                        try:
+                            f.seek(position)
+                            while position < end:
+                                block = f.read(min(DECODE_READ_BYTES, end - position))
+                                if not block:
+                                    break
+                                decoder.feed(block)
+                                position += len(block)
+                        except Exception as e:
+                            logger.warning(f"Decoding upload {self.upload_id} as it arrived failed, decoding it whole "
+                                           f"on finalize: {type(e).__name__}: {str(e)}")
+                            if isinstance(decoder, FfmpegStreamDecoder):
+                                decoder.abort()
+                            decoder = False
+                        self._save_windows(analysis)
+                        continue
+                    if self.meta.get('complete'):
+                        return decoder
+                    if time.time() - self.meta['updated_at'] > UPLOAD_TTL:
+                        logger.info(f"Upload {self.upload_id} was abandoned, no longer decoding it")
+                        break
+                    self._wait()
+        except OSError:
+            # Purged meanwhile
+            pass
+        if isinstance(decoder, FfmpegStreamDecoder):
+            decoder.abort()
+        return None
+
+    def _finish(self, analysis: 'StreamingAnalysis', decoder):
+        """Analyze the finalized upload, storing the result or the error for finalize to return."""
+        from .audio_processing import process_audio
+        result_path = os.path.join(self.path, 'result.json')
+        error_path = os.path.join(self.path, 'error.json')
+        if isinstance(decoder, FfmpegStreamDecoder):
+            try:
+                decoder.close()
+            except DecodeError as e:
+                logger.warning(f"Decoding upload {self.upload_id} as it arrived failed, decoding it whole: {str(e)}")
+                decoder = False
+
+        interview_type = self.meta.get('interview_type', 'behavioral')
+        try:
+            with admission.batch_job():
+                if decoder and analysis.sample_rate is not None:
+                    logger.debug("Upload %s: %.1fs transcribed while uploading", self.upload_id,
+                                 analysis.seconds_transcribed)
+                    try:
+                        feedback = analysis.finish(interview_type, history_key=self.upload_id,
+                                                   user_id=self.meta.get('user_id'))
+                    finally:
+                        self._save_windows(analysis)
+                else:
+                    feedback = process_audio(self.data_path, interview_type, history_key=self.upload_id,
+                                             user_id=self.meta.get('user_id'))
+        except Exception as e:
+            logger.warning(f"Finishing upload {self.upload_id} failed: {type(e).__name__}: {str(e)}")
+            with open(error_path + '.tmp', 'w') as f:
+                json.dump({'error': str(e), 'retry_after': getattr(e, 'retry_after', None)}, f)
+            os.replace(error_path + '.tmp', error_path)
+            return
+
+        with open(result_path + '.tmp', 'w') as f:
+            json.dump(feedback, f)
+        os.replace(result_path + '.tmp', result_path)
+        os.remove(self.data_path)
+        if self.on_finished is not None:
+            self.on_finished(self.upload_id)
+
+    def cancel(self):
+        """Stop decoding, e.g. because the upload was abandoned."""
+        self._cancelled = True
+        self._notify()
+
+    def finalize(self, checksum: Optional[str] = None) -> dict:
+        """
+        Finish transcribing the upload and analyze it, as /analyze.
+
+        The process decoding the upload does the work, and this one waits
+        for its result; if no process is decoding it, this one takes over.
+        The result is kept, so finalizing again (e.g. after the response was
+        lost) returns it without redoing the work.
+
+        Args:
+            checksum: Hex SHA-256 of the whole file, verified when given
+
+        Returns:
+            dict: Feedback based on the interview analysis
+
+        Raises:
+            UploadError: If bytes are missing, the file checksum doesn't match
+            or the analysis failed
+            OverloadedError: If transcription could not be admitted in time
+        """
+        result_path = os.path.join(self.path, 'result.json')
+        error_path = os.path.join(self.path, 'error.json')
+        with self._finalize_lock:
+            if not self.finished:
+                with self._file_lock():
+                    self._reload_meta()
+                size = self.meta.get('size')
+                if not self.received or (size is not None and self.received != size):
+                    raise UploadError(f'Upload is incomplete: {self.received} of {size or "?"} bytes received',
+                                      409, self.received)
+                if checksum:
+                    digest = hashlib.sha256()
+                    with open(self.data_path, 'rb') as f:
+                        for block in iter(lambda: f.read(DECODE_READ_BYTES), b''):
+                            digest.update(block)
+                    if digest.hexdigest() != checksum.strip().lower():
+                        raise UploadError('File checksum mismatch')
+
+                with self._file_lock():
+                    self._reload_meta()
+                    if os.path.exists(error_path):
+                        # Try again after a failed attempt
+                        os.remove(error_path)
+                    self.meta['complete'] = True
+                    self._save_meta()
+                self._notify()
+
+            while not self.finished:
+                if not os.path.exists(os.path.join(self.path, 'meta.json')):
+                    raise UploadError('Upload was purged before it finished', 404)
+                if os.path.exists(error_path):
+                    with open(error_path) as f:
+                        error = json.load(f)
+                    if error['retry_after'] is not None:
+                        raise OverloadedError(error['error'], error['retry_after'])
+                    raise UploadError(f"Error processing audio: {error['error']}", 500)
+                self._start_worker()
+                self._wait()
+            if self.on_finished is not None:
+                self.on_finished(self.upload_id)
+            with open(result_path) as f:
+                return json.load(f)
+
+
+class UploadManager:
+    def __init__(self, root: str = UPLOAD_DIR, ttl: float = UPLOAD_TTL):
+        """
+        Initialize the registry of chunked uploads.
+
+        Uploads are found again on disk by id, so a client can resume with
+        any process on the node after a restart.
+
+        Args:
+            root: Directory holding the uploads
+            ttl: Seconds an upload is kept after its last write
+        """
+        self.root = root
+        self.ttl = ttl
+        self._uploads: Dict[str, Upload] = {}
+        self._lock = threading.Lock()
+
+    def create(self, filename: str, size: Optional[int] = None, interview_type: str = 'behavioral',
+               user_id: Optional[str] = None) -> Upload:
+        """
+        Start a new upload.
+
+        Args:
+            filename: Name of the recording, whose extension gives its format
+            size: Total bytes the client will send, if known
+            interview_type: Type of interview for analysis
+            user_id: User the session is recorded for
+
+        Raises:
+            UploadError: If size is beyond UPLOAD_MAX_BYTES
+        """
+        if size is not None and (size <= 0 or size > UPLOAD_MAX_BYTES):
+            raise UploadError(f'Upload size must be between 1 and {UPLOAD_MAX_BYTES} bytes', 413)
+        self.purge_stale()
+        upload_id = secrets.token_urlsafe(16)
+        path = os.path.join(self.root, upload_id)
+        os.makedirs(path)
+        now = time.time()
+        upload = Upload(upload_id, path, {
+            'filename': filename,
+            'size': size,
+            'interview_type': interview_type,
+            'user_id': user_id,
+            'received': 0,
+            'created_at': now,
+            'updated_at': now
+        }, self.discard)
+        open(upload.data_path, 'wb').close()
+        upload._save_meta()
+        with self._lock:
+            self._uploads[upload_id] = upload
+        return upload
+
+    def get(self, upload_id: Optional[str]) -> Optional[Upload]:
+        """
+        Get an upload by id, loading it from disk if this process hasn't seen it.
+
+        Returns:
+            Upload: The upload, or None if there is no such upload
+        """
+        if not upload_id or _UPLOAD_ID_PATTERN.match(upload_id) is None:
+            return None
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if upload is not None:
+                if not upload.finished:
+                    return upload
+                # Finalized by another process
+                del self._uploads[upload_id]
+            path = os.path.join(self.root, upload_id)
+            try:
+                with open(os.path.join(path, 'meta.json')) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                return None
+            upload = Upload(upload_id, path, meta, self.discard)
+            if not upload.finished:
+                # Finished uploads are answered from disk
+                self._uploads[upload_id] = upload
+            return upload
+
+    def discard(self, upload_id: str):
+        """Forget a finished upload; its result stays on disk until purged."""
+        with self._lock:
+            self._uploads.pop(upload_id, None)
+
+    def purge_stale(self):
+        """Delete uploads, finished or not, last written more than ttl seconds ago."""
+        cutoff = time.time() - self.ttl
+        try:
+            upload_ids = os.listdir(self.root)
+        except OSError:
+            return
+        for upload_id in upload_ids:
+            path = os.path.join(self.root, upload_id)
+            try:
+                if os.path.getmtime(os.path.join(path, 'meta.json')) >= cutoff:
+                    continue
+            except OSError:
+                continue
+            with self._lock:
+                upload = self._uploads.pop(upload_id, None)
+            if upload is not None:
+                upload.cancel()
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"Purged stale upload {upload_id}")
+
+
+# Process-wide upload registry
+uploads = UploadManager()
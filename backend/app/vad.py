@@ -0,0 +1,87 @@
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+# 20 ms analysis frames at 16 kHz
+FRAME_SAMPLES = 320
+
+# Frames this far above the noise floor count as speech
+SPEECH_MARGIN_DB = 10.0
+
+# Frames below this level are never speech, however quiet the noise floor
+ABSOLUTE_FLOOR_DB = -50.0
+
+# Pauses shorter than this don't split a region
+MIN_SILENCE_SECONDS = 0.5
+
+# Regions shorter than this are dropped as clicks and breaths
+MIN_SPEECH_SECONDS = 0.2
+
+# Padding kept around each region so word onsets aren't clipped
+PAD_SECONDS = 0.2
+
+
+def frame_energies(audio: np.ndarray, frame: int = FRAME_SAMPLES) -> np.ndarray:
+    """Get the RMS level in dBFS of each whole frame."""
+    frames = len(audio) // frame
+    if frames == 0:
+        return np.array([], dtype=np.float32)
+    power = np.square(audio[:frames * frame].reshape(frames, frame).astype(np.float32)).mean(axis=1)
+    return 10 * np.log10(power + 1e-10)
+
+
+def streamed_frame_energies(read: Callable[[int, int], np.ndarray], total: int, frame: int = FRAME_SAMPLES,
+                            block_frames: int = 3000) -> np.ndarray:
+    """
+    Get frame levels of long audio read block by block.
+
+    Args:
+        read: Callable returning samples [start, end), e.g. SessionStorage.read_audio
+        total: Number of samples
+        frame: Samples per frame
+        block_frames: Frames read per block
+
+    Returns:
+        np.ndarray: dBFS level of each whole frame
+    """
+    block = frame * block_frames
+    levels = [frame_energies(read(start, min(start + block, total)), frame) for start in range(0, total, block)]
+    return np.concatenate(levels) if levels else np.array([], dtype=np.float32)
+
+
+def speech_regions(levels: np.ndarray, sample_rate: int = 16000, frame: int = FRAME_SAMPLES) -> List[Tuple[int, int]]:
+    """
+    Find speech regions from frame levels with an adaptive energy threshold.
+
+    The noise floor is the 10th percentile frame level; frames more than
+    SPEECH_MARGIN_DB above it (and above ABSOLUTE_FLOOR_DB) are speech.
+
+    Returns:
+        list: (start, end) sample offsets of each region, in order
+    """
+    if len(levels) == 0:
+        return []
+    threshold = max(float(np.percentile(levels, 10)) + SPEECH_MARGIN_DB, ABSOLUTE_FLOOR_DB)
+    speech = levels > threshold
+
+    frames_per_second = sample_rate / frame
+    min_silence = int(MIN_SILENCE_SECONDS * frames_per_second)
+    min_speech = int(MIN_SPEECH_SECONDS * frames_per_second)
+    pad = int(PAD_SECONDS * frames_per_second)
+
+    # Edges of runs of speech frames
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], speech.astype(np.int8), [0]])))
+    runs = list(zip(edges[::2], edges[1::2]))
+
+    regions: List[List[int]] = []
+    for start, end in runs:
+        if regions and start - regions[-1][1] < min_silence:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    total = len(levels)
+    return [
+        (max(0, start - pad) * frame, min(total, end + pad) * frame)
+        for start, end in regions if end - start >= min_speech
+    ]
@@ -0,0 +1,137 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from .transcription_service import SAMPLE_RATE, loaded_models
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Seconds of dummy audio run through each model during warm-up
+WARMUP_AUDIO_SECONDS = float(os.getenv("WARMUP_AUDIO_SECONDS", "5"))
+
+# Whether readiness waits for a successful LLM ping. Off by default because
+# analysis falls back to the local analyzer when Gemini is unreachable.
+WARMUP_REQUIRE_LLM = os.getenv("WARMUP_REQUIRE_LLM", "false").lower() == "true"
+
+# Seconds before failed components are warmed up again, doubled after each
+# failed attempt up to WARMUP_RETRY_MAX_SECONDS
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+WARMUP_RETRY_MAX_SECONDS = float(os.getenv("WARMUP_RETRY_MAX_SECONDS", "300"))
+
+
+def dummy_speech(seconds: float = WARMUP_AUDIO_SECONDS) -> np.ndarray:
+    """
+    Generate speech-like audio: harmonic, amplitude-modulated bursts.
+
+    Silence would let Whisper skip most of the decoder, so warm-up audio has
+    to look like speech to exercise the same kernels as real traffic.
+
+    Returns:
+        np.ndarray: float32 samples at SAMPLE_RATE
+    """
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t))
+    tone = sum(np.sin(2 * np.pi * 150 * k * t) / k for k in range(1, 5))
+    audio = 0.2 * envelope * tone + rng.normal(0, 0.002, len(t))
+    return audio.astype(np.float32)
+
+
+class Readiness:
+    def __init__(self):
+        """Track whether this process has finished warming up."""
+        self.components: Dict[str, str] = {}
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def status(self) -> Dict[str, str]:
+        """Get the warm-up state of each component."""
+        with self._lock:
+            return dict(self.components)
+
+    def start(self):
+        """Start warming up on a background thread, once per process."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self._ready.is_set():
+                return
+            self._thread = threading.Thread(target=self.warm_up, daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until warm; returns whether the process is ready."""
+        return self._ready.wait(timeout)
+
+    def _set(self, component: str, state: str):
+        with self._lock:
+            self.components[component] = state
+
+    def warm_up(self):
+        """
+        Run dummy audio through every loaded model, then ping the LLM.
+
+        The first transcribe after startup pays for lazy allocations and
+        kernel initialization; doing it here keeps that cost off the first
+        real user. Components that fail are retried with exponential backoff
+        until they are warm, so a transient failure doesn't keep the process
+        unready until it is restarted.
+        """
+        delay = WARMUP_RETRY_SECONDS
+        while not self._attempt():
+            logger.error(f"Warm-up failed; retrying the failed components in {delay:.0f}s")
+            time.sleep(delay)
+            delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+        self._ready.set()
+
+    def _attempt(self) -> bool:
+        """
+        Warm up every component that isn't warm yet.
+
+        Returns:
+            bool: Whether every required component is warm
+        """
+        audio = dummy_speech()
+        models = {name: model for name, model in loaded_models().items()
+                  if self.status().get(f'model:{name}') != 'warm'}
+        for name in models:
+            self._set(f'model:{name}', 'pending')
+
+        failed = False
+        for name, (model, lock) in models.items():
+            try:
+                start = time.perf_counter()
+                with span('warmup', model=name), lock:
+                    model.transcribe(audio)
+                self._set(f'model:{name}', 'warm')
+                logger.info(f"Warmed up model {name} in {time.perf_counter() - start:.2f}s")
+            except Exception as e:
+                failed = True
+                self._set(f'model:{name}', 'failed')
+                logger.error(f"Error warming up model {name}: {str(e)}")
+
+        if self.status().get('llm') != 'warm':
+            self._set('llm', 'pending')
+            try:
+                from .nlp_analysis import ping
+                ping()
+                self._set('llm', 'warm')
+            except Exception as e:
+                self._set('llm', 'failed')
+                logger.warning(f"LLM ping failed during warm-up: {str(e)}")
+                failed = failed or WARMUP_REQUIRE_LLM
+        return not failed
+
+
+# Warm-up state of this process
+readiness = Readiness()
@@ -0,0 +1,123 @@
+"""
+Offline stand-ins for the Whisper model and the Gemini client.
+
+The fake engine and stub LLM reproduce the interfaces the backend calls
+(model.transcribe and model.generate_content) with deterministic output and
+configurable latency, so the benchmarks measure the backend's own overhead
+without a GPU, model weights or network access.
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+WORDS = (
+    "in my previous role i was responsible for the billing system and we needed to "
+    "reduce latency so i decided to profile the batch job and i implemented a cache "
+    "as a result we reduced processing time by forty percent and saved money"
+).split()
+
+
+class FakeWhisperModel:
+    def __init__(self, realtime_factor: float = 0.05, words_per_second: float = 2.5):
+        """
+        Initialize a fake Whisper engine.
+
+        Args:
+            realtime_factor: Seconds of simulated inference per second of audio
+            words_per_second: Words emitted per second of non-silent audio
+        """
+        self.realtime_factor = realtime_factor
+        self.words_per_second = words_per_second
+        self.calls = 0
+
+    def transcribe(self, audio, **kwargs):
+        self.calls += 1
+        audio = np.asarray(audio, dtype=np.float32)
+        duration = len(audio) / SAMPLE_RATE
+        time.sleep(duration * self.realtime_factor)
+
+        if len(audio) == 0 or float(np.abs(audio).max()) < 1e-3:
+            return {'text': '', 'segments': [], 'language': 'en'}
+
+        word_count = max(1, int(duration * self.words_per_second))
+        text = " ".join(WORDS[i % len(WORDS)] for i in range(word_count)) + "."
+        return {
+            'text': text,
+            'segments': [{'start': 0.0, 'end': duration, 'text': text}],
+            'language': 'en'
+        }
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubLLM:
+    def __init__(self, latency: float = 0.2):
+        """
+        Initialize a stub for genai.GenerativeModel.
+
+        Args:
+            latency: Seconds to sleep per generate_content call
+        """
+        self.latency = latency
+        self.calls = 0
+        self.prompt_chars = 0
+
+    def generate_content(self, prompt, generation_config=None):
+        self.calls += 1
+        self.prompt_chars += len(prompt)
+        time.sleep(self.latency)
+        feedback = {
+            'message': "Clear structure. Quantify the result to show your impact.",
+            'type': 'neutral',
+            'details': {'suggestion': "Add one number describing the outcome."}
+        }
+        return _StubResponse("```json\n" + json.dumps(feedback) + "\n```")
+
+    def count_tokens(self, contents):
+        return {'total_tokens': len(str(contents)) // 4}
+
+
+def install_fakes(engine: str = 'fake', llm_latency: float = 0.2, realtime_factor: float = 0.05):
+    """
+    Install the fake engine and stub LLM before the app modules load.
+
+    Must be called before importing app.audio_processing, which creates the
+    global TranscriptionService at import time.
+
+    Args:
+        engine: 'fake' for FakeWhisperModel, or a Whisper model name such as
+                'tiny' to benchmark with real (small) weights
+        llm_latency: Simulated Gemini latency in seconds
+        realtime_factor: Simulated real-time factor of the fake engine
+
+    Returns:
+        tuple: (engine instance, stub LLM)
+    """
+    # nlp_analysis refuses to import without a key; the stub never uses it
+    os.environ.setdefault('GEMINI_API_KEY', 'offline-benchmark')
+    # Always call the LLM so its path is measured
+    os.environ.setdefault('LOCAL_CONFIDENCE_THRESHOLD', '2')
+
+    from app import transcription_service, nlp_analysis
+
+    if engine == 'fake':
+        model = FakeWhisperModel(realtime_factor=realtime_factor)
+        for name in ('tiny', 'base', 'small'):
+            transcription_service._models[name] = model
+            transcription_service._model_locks[name] = threading.Lock()
+    else:
+        model, lock = transcription_service.load_model(engine)
+        transcription_service._models['base'] = model
+        transcription_service._model_locks['base'] = lock
+
+    llm = StubLLM(latency=llm_latency)
+    nlp_analysis.model = llm
+    return model, llm
@@ -0,0 +1,72 @@
+"""
+Audio fixtures for the benchmarks.
+
+Synthetic fixtures are generated deterministically: bursts of harmonic,
+amplitude-modulated tones separated by pauses, which look like speech to
+energy-based code paths. Recorded fixtures are any .wav files placed in
+benchmarks/fixtures/ (left channel interviewee, right channel interviewer).
+"""
+import glob
+import os
+from typing import List
+
+import numpy as np
+from scipy.io import wavfile
+
+SAMPLE_RATE = 16000
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def synthetic_speech(seconds: float, seed: int = 0, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Generate speech-like mono audio.
+
+    Returns:
+        np.ndarray: float32 samples in [-1, 1]
+    """
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sample_rate)
+    audio = np.zeros(total, dtype=np.float32)
+    position = 0
+    while position < total:
+        burst = int(rng.uniform(0.8, 3.0) * sample_rate)
+        pause = int(rng.uniform(0.2, 0.8) * sample_rate)
+        end = min(total, position + burst)
+        t = np.arange(end - position) / sample_rate
+        pitch = rng.uniform(100, 220)
+        envelope = 0.5 * (1 + np.sin(2 * np.pi * rng.uniform(3, 6) * t))
+        tone = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 5))
+        audio[position:end] = (0.2 * envelope * tone).astype(np.float32)
+        position = end + pause
+    audio += rng.normal(0, 0.002, total).astype(np.float32)
+    return np.clip(audio, -1, 1)
+
+
+def synthetic_interview(seconds: float, seed: int = 0, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Generate a stereo interview with the speakers taking turns.
+
+    Returns:
+        np.ndarray: int16 samples with shape (n, 2), left interviewee and
+        right interviewer
+    """
+    total = int(seconds * sample_rate)
+    interviewee = synthetic_speech(seconds, seed, sample_rate)
+    interviewer = synthetic_speech(seconds, seed + 1, sample_rate)
+    # Alternate turns of about ten seconds, interviewer first
+    turn = (np.arange(total) // (10 * sample_rate)) % 2
+    interviewee[turn == 0] *= 0.02
+    interviewer[turn == 1] *= 0.02
+    stereo = np.stack([interviewee, interviewer], axis=1)
+    return (stereo * 32767).astype(np.int16)
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> str:
+    """Write samples to a .wav file and return its path."""
+    wavfile.write(path, sample_rate, samples)
+    return path
+
+
+def recorded_fixtures() -> List[str]:
+    """List the recorded .wav fixtures available in FIXTURES_DIR."""
+    return sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.wav')))
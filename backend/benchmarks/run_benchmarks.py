@@ -0,0 +1,331 @@
+"""
+Offline performance benchmarks for the transcription and analysis pipeline.
+
+Runs entirely offline with a fake (or tiny) Whisper engine and a stubbed LLM
+and compares the results against stored baselines:
+
+    python -m benchmarks.run_benchmarks                      # compare with baselines
+    python -m benchmarks.run_benchmarks --update-baselines   # record new baselines
+    python -m benchmarks.run_benchmarks --engine tiny        # real tiny Whisper weights
+    python -m benchmarks.run_benchmarks --engine base --compare-quantization
+
+Exits with status 1 if any metric regressed by more than the tolerance, or
+if no metric has a baseline to compare with. Baselines for the fake engine
+are committed in baselines.json; it runs without whisper installed.
+
+Wall-clock metrics depend on the machine, so they are compared in units of a
+fixed numpy calibration workload timed at startup on the same machine; only
+machine-independent metrics (memory per session minute, word error rate,
+speedup ratios) are kept as absolute baselines.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from scipy.io import wavfile
+
+from .fakes import install_fakes
+from .fixtures import SAMPLE_RATE, recorded_fixtures, synthetic_interview, synthetic_speech, write_wav
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+# Whether a higher or lower value is better, by metric name suffix
+HIGHER_IS_BETTER = ('_per_second', '_throughput', '_speedup')
+
+# Metrics that don't depend on the speed of the machine, by metric name suffix;
+# every other metric is a wall-clock time or rate
+MACHINE_INDEPENDENT = ('_bytes_per_session_minute', '_word_error_rate', '_speedup')
+
+
+def percentile(values, pct):
+    """Get the pct-th percentile of a list of values."""
+    return float(np.percentile(np.asarray(values), pct)) if values else 0.0
+
+
+def calibrate(runs: int = 5) -> float:
+    """
+    Time a fixed numpy workload on this machine.
+
+    The workload (FFTs over ten seconds of audio and a small matrix product,
+    the kinds of work the pipeline does per window) gives the unit wall-clock
+    metrics are compared in, so baselines recorded on one machine hold on
+    another.
+
+    Returns:
+        float: Fastest of runs timings of the workload, in seconds
+    """
+    rng = np.random.default_rng(0)
+    frames = rng.standard_normal((1000, 400)).astype(np.float32)
+    weights = rng.standard_normal((400, 400)).astype(np.float32)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for _ in range(3):
+            spectrum = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+            np.log10(np.maximum(spectrum, 1e-10)) @ weights[:spectrum.shape[1]]
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def is_machine_independent(name: str) -> bool:
+    """Whether a metric can be compared with an absolute baseline."""
+    return name.endswith(MACHINE_INDEPENDENT)
+
+
+def calibrated(name: str, value: float, calibration: float) -> float:
+    """
+    Express a metric in units of the calibration workload.
+
+    Times (and real-time factors) are divided by the calibration time and
+    rates are multiplied by it; machine-independent metrics are unchanged.
+    """
+    if is_machine_independent(name):
+        return value
+    if name.endswith('_per_second'):
+        return value * calibration
+    return value / calibration
+
+
+def bench_realtime_factor(seconds: float):
+    """Real-time factor of TranscriptionService.transcribe on a synthetic clip."""
+    from app.transcription_service import TranscriptionService
+
+    service = TranscriptionService()
+    audio = synthetic_speech(seconds)
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        service.transcribe(audio)
+        timings.append(time.perf_counter() - start)
+    return {'realtime_factor': min(timings) / seconds}
+
+
+def bench_process_audio(seconds: float, runs: int):
+    """Latency and throughput of process_audio on stereo interview files."""
+    from app.audio_processing import process_audio
+
+    paths = recorded_fixtures()
+    with tempfile.TemporaryDirectory() as tmp:
+        if not paths:
+            paths = [write_wav(os.path.join(tmp, 'synthetic_interview.wav'), synthetic_interview(seconds))]
+
+        latencies = []
+        audio_seconds = 0.0
+        for i in range(runs):
+            path = paths[i % len(paths)]
+            sample_rate, data = wavfile.read(path)
+            audio_seconds += len(data) / sample_rate
+
+            start = time.perf_counter()
+            process_audio(path)
+            latencies.append(time.perf_counter() - start)
+
+    total = sum(latencies)
+    return {
+        'latency_p50_seconds': percentile(latencies, 50),
+        'latency_p95_seconds': percentile(latencies, 95),
+        'files_per_second': runs / total,
+        'audio_seconds_per_second': audio_seconds / total
+    }
+
+
+def bench_stream_tab_audio(minutes: float, chunk_seconds: float):
+    """Per-chunk overhead of /stream-tab-audio and memory growth per session minute."""
+    from app import create_app
+
+    app = create_app({'TESTING': True}, start_services=False)
+    client = app.test_client()
+
+    response = client.post('/start-tab-recording', json={'interview_type': 'behavioral'})
+    session_id = response.get_json()['session_id']
+
+    audio = synthetic_speech(minutes * 60, seed=7)
+    chunk = int(chunk_seconds * SAMPLE_RATE)
+    chunks = [audio[i:i + chunk] for i in range(0, len(audio), chunk)]
+
+    tracemalloc.start()
+    baseline_memory = tracemalloc.get_traced_memory()[0]
+    latencies = []
+    for samples in chunks:
+        payload = {'session_id': session_id, 'audio_data': samples.tolist()}
+        start = time.perf_counter()
+        client.post('/stream-tab-audio', json=payload)
+        latencies.append(time.perf_counter() - start)
+    grown = tracemalloc.get_traced_memory()[0] - baseline_memory
+    tracemalloc.stop()
+
+    client.post('/stop-tab-recording', json={'session_id': session_id})
+    return {
+        'chunk_latency_p50_seconds': percentile(latencies, 50),
+        'chunk_latency_p99_seconds': percentile(latencies, 99),
+        'memory_bytes_per_session_minute': grown / minutes
+    }
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level edit distance between two transcripts, over the reference length."""
+    ref = reference.lower().split()
+    hyp = hypothesis.lower().split()
+    if not ref:
+        return float(bool(hyp))
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def bench_quantization(engine: str, seconds: float):
+    """
+    Speed and accuracy of the int8-quantized model against the fp32 model.
+
+    Accuracy is the word error rate against a reference transcript stored
+    next to each recorded fixture (same name, .txt), or against the fp32
+    transcript when there is none.
+    """
+    import copy
+    import whisper
+    from app.audio_processing import split_channels
+    from app.cpu_profile import quantize_model
+
+    clips = []
+    for path in recorded_fixtures():
+        sample_rate, data = wavfile.read(path)
+        reference = None
+        reference_path = os.path.splitext(path)[0] + '.txt'
+        if os.path.exists(reference_path):
+            with open(reference_path) as f:
+                reference = f.read()
+        clips.append((split_channels(data, sample_rate)[0], reference))
+    if not clips:
+        clips = [(synthetic_speech(seconds), None)]
+
+    fp32 = whisper.load_model(engine, device='cpu')
+    models = {'fp32': fp32, 'int8': quantize_model(copy.deepcopy(fp32))}
+
+    results = {}
+    transcripts = {}
+    for label, model in models.items():
+        model.transcribe(clips[0][0][:SAMPLE_RATE * 5], fp16=False)  # warm up
+        elapsed = 0.0
+        audio_seconds = 0.0
+        transcripts[label] = []
+        for audio, _ in clips:
+            start = time.perf_counter()
+            transcripts[label].append(model.transcribe(audio, fp16=False)['text'])
+            elapsed += time.perf_counter() - start
+            audio_seconds += len(audio) / SAMPLE_RATE
+        results[f'{label}_realtime_factor'] = elapsed / audio_seconds
+
+    for label in models:
+        rates = [
+            word_error_rate(reference if reference is not None else fp32_text, text)
+            for (_, reference), fp32_text, text in zip(clips, transcripts['fp32'], transcripts[label])
+        ]
+        results[f'{label}_word_error_rate'] = float(np.mean(rates))
+    results['int8_speedup'] = results['fp32_realtime_factor'] / results['int8_realtime_factor']
+    return results
+
+
+def compare(results: dict, baselines: dict, tolerance: float, calibration: float):
+    """
+    Compare results with baselines.
+
+    Args:
+        results: Measured metrics, by name
+        baselines: Baselines by name; wall-clock metrics in calibration units
+        tolerance: Allowed relative regression
+        calibration: Seconds the calibration workload took on this machine
+
+    Returns:
+        list: (metric, baseline, value, change) for every regressed metric,
+              with wall-clock values in calibration units
+    """
+    regressions = []
+    for name, measured in sorted(results.items()):
+        value = calibrated(name, measured, calibration)
+        unit = "" if is_machine_independent(name) else " cal"
+        baseline = baselines.get(name)
+        if baseline is None:
+            print(f"  {name:55s} {measured:12.4f}  {value:12.4f}{unit:4s}  (no baseline)")
+            continue
+        change = (value - baseline) / baseline if baseline else 0.0
+        higher_is_better = name.endswith(HIGHER_IS_BETTER)
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        marker = "REGRESSION" if regressed else "ok"
+        print(f"  {name:55s} {measured:12.4f}  {value:12.4f}{unit:4s}  baseline {baseline:12.4f}  "
+              f"{change:+7.1%}  {marker}")
+        if regressed:
+            regressions.append((name, baseline, value, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engine', default='fake', help="'fake' or a Whisper model name such as 'tiny'")
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='Stub LLM latency in seconds')
+    parser.add_argument('--clip-seconds', type=float, default=30.0, help='Length of synthetic clips')
+    parser.add_argument('--runs', type=int, default=5, help='process_audio runs')
+    parser.add_argument('--stream-minutes', type=float, default=2.0, help='Simulated session length')
+    parser.add_argument('--chunk-seconds', type=float, default=0.25, help='Streamed chunk length')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative regression')
+    parser.add_argument('--baselines', default=BASELINES_PATH, help='Baselines file')
+    parser.add_argument('--update-baselines', action='store_true', help='Write results as the new baselines')
+    parser.add_argument('--compare-quantization', action='store_true',
+                        help='Only compare the fp32 and int8-quantized model (needs a real --engine)')
+    args = parser.parse_args(argv)
+
+    install_fakes(args.engine, llm_latency=args.llm_latency)
+
+    benches = (
+        ('transcription', lambda: bench_realtime_factor(args.clip_seconds)),
+        ('process_audio', lambda: bench_process_audio(args.clip_seconds, args.runs)),
+        ('stream_tab_audio', lambda: bench_stream_tab_audio(args.stream_minutes, args.chunk_seconds)),
+    )
+    if args.compare_quantization:
+        if args.engine == 'fake':
+            parser.error('--compare-quantization needs a Whisper model name as --engine')
+        benches = (('quantization', lambda: bench_quantization(args.engine, args.clip_seconds)),)
+
+    calibration = calibrate()
+    print(f"Calibration workload: {calibration * 1000:.1f} ms")
+
+    results = {}
+    for prefix, bench in benches:
+        print(f"Running {prefix} benchmark...")
+        for name, value in bench().items():
+            results[f"{args.engine}.{prefix}.{name}"] = value
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+
+    print("\nResults (measured, then in calibration units where the machine matters):")
+    regressions = compare(results, baselines, args.tolerance, calibration)
+
+    if args.update_baselines:
+        baselines.update({name: calibrated(name, value, calibration) for name, value in results.items()})
+        with open(args.baselines, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"\nWrote baselines to {args.baselines}")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+        return 1
+    if not any(name in baselines for name in results):
+        print(f"\nNo baselines for the {args.engine} engine in {args.baselines}; record them with --update-baselines")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import gc
+import multiprocessing
+import os
+
+# Bind address, matching the development server port in run.py
+bind = os.getenv('TALKFISH_BIND', '0.0.0.0:5001')
+
+# Worker processes and request threads per worker
+workers = int(os.getenv('TALKFISH_WORKERS', max(1, multiprocessing.cpu_count() // 2)))
+threads = int(os.getenv('TALKFISH_THREADS', '4'))
+worker_class = 'gthread'
+
+# Transcription and LLM calls can take a while on long uploads
+timeout = int(os.getenv('TALKFISH_TIMEOUT', '120'))
+
+# Import the app, and load the Whisper models, once in the master process so
+# workers share the weights copy-on-write
+preload_app = True
+
+# Torch intra-op threads per worker; by default the cores are split evenly
+# between workers so they don't oversubscribe the machine. Set CPU_AFFINITY=auto
+# to also pin each worker to its own slice of cores.
+torch_threads = int(os.getenv('TALKFISH_TORCH_THREADS', max(1, multiprocessing.cpu_count() // workers)))
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far into the permanent generation so the
+    # garbage collector doesn't touch (and copy) the shared pages in workers
+    gc.freeze()
+
+    # Give the worker the lowest index no live worker holds, so a worker
+    # respawned after a crash takes over the cores of the one it replaces
+    # (worker ages keep counting up and would collide with live workers)
+    taken = {getattr(other, 'cpu_index', None) for other in server.WORKERS.values()}
+    worker.cpu_index = next(index for index in range(len(taken) + 1) if index not in taken)
+
+
+def post_fork(server, worker):
+    # Thread counts and CPU pinning from the CPU profile (see app/cpu_profile.py)
+    from app.cpu_profile import apply_cpu_profile
+    apply_cpu_profile(worker_index=worker.cpu_index, workers=workers, intra_op_threads=torch_threads)
+
+    # Threads don't survive fork, so each worker starts its own
+    from app.audio_processing import start_background_services
+    start_background_services()
+    server.log.info(f"Worker {worker.pid} started with {torch_threads} torch threads")
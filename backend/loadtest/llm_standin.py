@@ -0,0 +1,156 @@
+"""
+Local stand-in for the Gemini generateContent REST API.
+
+Mimics the latency distribution and response shape of
+models/<model>:generateContent, and answers the countTokens warm-up ping, so
+load tests never touch the real API or spend quota. Point the backend at it
+with:
+
+    python -m loadtest.llm_standin --port 8089 --median-latency 0.8 --p95-latency 2.0
+    GEMINI_API_ENDPOINT=http://localhost:8089 gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FEEDBACK = {
+    'message': "Clear structure. Quantify the result to show your impact.",
+    'type': 'neutral',
+    'details': {'suggestion': "Add one number describing the outcome."}
+}
+
+ID_PATTERN = re.compile(r'"id":\s*"([^"]+)"')
+
+
+class LatencyModel:
+    def __init__(self, median: float, p95: float):
+        """
+        Log-normal latency with the given median and 95th percentile.
+
+        Args:
+            median: Median latency in seconds
+            p95: 95th percentile latency in seconds
+        """
+        self.mu = math.log(median)
+        self.sigma = max(0.0, (math.log(p95) - self.mu) / 1.645)
+
+    def sample(self) -> float:
+        return random.lognormvariate(self.mu, self.sigma)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    latency: LatencyModel = LatencyModel(0.8, 2.0)
+    error_rate = 0.0
+    stats = {'requests': 0, 'errors': 0}
+    stats_lock = threading.Lock()
+
+    def do_POST(self):
+        if ':generateContent' not in self.path and ':countTokens' not in self.path:
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        prompt = " ".join(
+            part.get('text', '')
+            for content in body.get('contents', [])
+            for part in content.get('parts', [])
+        )
+
+        # Warm-up pings only count tokens and return immediately
+        if ':countTokens' in self.path:
+            self._send_json(200, {'totalTokens': len(prompt) // 4})
+            return
+
+        time.sleep(self.latency.sample())
+
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            failed = random.random() < self.error_rate
+            if failed:
+                self.stats['errors'] += 1
+        if failed:
+            self._send_json(503, {'error': {'code': 503, 'message': 'Stand-in overloaded', 'status': 'UNAVAILABLE'}})
+            return
+
+        # Batched prompts expect a JSON array with one item per id
+        ids = ID_PATTERN.findall(prompt) if 'JSON array' in prompt else []
+        if ids:
+            text = json.dumps([dict(FEEDBACK, id=item_id) for item_id in ids])
+        else:
+            text = json.dumps(FEEDBACK)
+
+        prompt_tokens = len(prompt) // 4
+        self._send_json(200, {
+            'candidates': [{
+                'content': {'parts': [{'text': f"```json\n{text}\n```"}], 'role': 'model'},
+                'finishReason': 'STOP',
+                'index': 0
+            }],
+            'usageMetadata': {
+                'promptTokenCount': prompt_tokens,
+                'candidatesTokenCount': len(text) // 4,
+                'totalTokenCount': prompt_tokens + len(text) // 4
+            }
+        })
+
+    def do_GET(self):
+        if self.path == '/stats':
+            with self.stats_lock:
+                self._send_json(200, dict(self.stats))
+        else:
+            self.send_error(404)
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Keep the load test output readable
+        pass
+
+
+def serve(host: str = '127.0.0.1', port: int = 8089, median_latency: float = 0.8, p95_latency: float = 2.0,
+          error_rate: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Start the stand-in server on a background thread.
+
+    Returns:
+        ThreadingHTTPServer: The running server; call shutdown() to stop it
+    """
+    StandInHandler.latency = LatencyModel(median_latency, p95_latency)
+    StandInHandler.error_rate = error_rate
+    server = ThreadingHTTPServer((host, port), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--median-latency', type=float, default=0.8, help='Median response latency in seconds')
+    parser.add_argument('--p95-latency', type=float, default=2.0, help='95th percentile latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.median_latency, args.p95_latency, args.error_rate)
+    print(f"Gemini stand-in listening on http://{args.host}:{args.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""
+Concurrent-session load generator.
+
+Replays recorded stereo sessions in real time against a running backend with
+N concurrent virtual users. Each user starts a tab recording, streams the
+interviewer (right) channel through /stream-tab-audio at real-time pace,
+stops the recording, then uploads the full stereo file to /analyze.
+
+    python -m loadtest.llm_standin --port 8089 &
+    GEMINI_API_ENDPOINT=http://localhost:8089 gunicorn -c gunicorn.conf.py wsgi:app &
+    python -m loadtest.load_generator --users 20 --recording session.wav --server-pid <gunicorn master pid>
+
+Reports p50/p95/p99 latency per endpoint, transcript lag and server CPU and
+memory use.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+from scipy.io import wavfile
+from scipy.signal import resample_poly
+
+SAMPLE_RATE = 16000
+
+
+class Recorder:
+    def __init__(self):
+        """Thread-safe collection of latencies, lags and errors."""
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.transcript_lags: List[float] = []
+        self.lock = threading.Lock()
+
+    def record(self, endpoint: str, latency: float, ok: bool):
+        with self.lock:
+            self.latencies[endpoint].append(latency)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def record_lag(self, lag: float):
+        with self.lock:
+            self.transcript_lags.append(lag)
+
+
+class ResourceSampler:
+    def __init__(self, pid: Optional[int], interval: float = 1.0):
+        """
+        Sample CPU and resident memory of a server process and its children.
+
+        Reads /proc directly, so it only works on Linux.
+        """
+        self.pid = pid
+        self.interval = interval
+        self.cpu_percent: List[float] = []
+        self.rss_bytes: List[int] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        if self.pid:
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _pids(self) -> List[int]:
+        pids = [self.pid]
+        try:
+            with open(f'/proc/{self.pid}/task/{self.pid}/children') as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+        return pids
+
+    def _totals(self):
+        ticks = 0
+        rss = 0
+        for pid in self._pids():
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+                ticks += int(fields[11]) + int(fields[12])
+                rss += int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+            except (OSError, IndexError):
+                continue
+        return ticks, rss
+
+    def _run(self):
+        clock_ticks = os.sysconf('SC_CLK_TCK')
+        last_ticks, _ = self._totals()
+        last_time = time.monotonic()
+        while not self._stop.wait(self.interval):
+            ticks, rss = self._totals()
+            now = time.monotonic()
+            self.cpu_percent.append(100.0 * (ticks - last_ticks) / clock_ticks / (now - last_time))
+            self.rss_bytes.append(rss)
+            last_ticks, last_time = ticks, now
+
+
+def load_recording(path: str):
+    """
+    Load the interviewer channel of a stereo recording.
+
+    Returns:
+        np.ndarray: float32 interviewer samples at the model sample rate
+    """
+    sample_rate, data = wavfile.read(path)
+    if data.ndim == 1:
+        data = np.stack([data, data], axis=1)
+    if np.issubdtype(data.dtype, np.integer):
+        interviewer = data[:, 1].astype(np.float32) / np.iinfo(data.dtype).max
+    else:
+        interviewer = data[:, 1].astype(np.float32)
+    if sample_rate != SAMPLE_RATE:
+        divisor = np.gcd(sample_rate, SAMPLE_RATE)
+        interviewer = resample_poly(interviewer, SAMPLE_RATE // divisor, sample_rate // divisor).astype(np.float32)
+    return interviewer
+
+
+def timed_post(session: requests.Session, recorder: Recorder, endpoint: str, url: str, **kwargs):
+    """POST a request and record its latency and outcome."""
+    start = time.perf_counter()
+    try:
+        response = session.post(url, timeout=300, **kwargs)
+        ok = response.status_code < 400
+    except requests.RequestException:
+        response = None
+        ok = False
+    recorder.record(endpoint, time.perf_counter() - start, ok)
+    return response
+
+
+def virtual_user(user_id: int, args, recording_path: str, interviewer: np.ndarray, recorder: Recorder):
+    """Run one virtual interview session."""
+    session = requests.Session()
+    base = args.base_url.rstrip('/')
+
+    response = timed_post(session, recorder, 'start-tab-recording', f'{base}/start-tab-recording',
+                          json={'interview_type': 'behavioral'})
+    if response is None or response.status_code != 200:
+        return
+    session_id = response.json().get('session_id')
+
+    chunk = int(args.chunk_seconds * SAMPLE_RATE)
+    # Send times of chunks not yet reflected in the transcript
+    pending_sends: List[float] = []
+    last_transcript = ""
+    session_start = time.monotonic()
+    for index, offset in enumerate(range(0, len(interviewer), chunk)):
+        # Pace the stream in real time
+        due = session_start + index * args.chunk_seconds
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        sent_at = time.monotonic()
+        pending_sends.append(sent_at)
+        response = timed_post(session, recorder, 'stream-tab-audio', f'{base}/stream-tab-audio', json={
+            'session_id': session_id,
+            'audio_data': interviewer[offset:offset + chunk].tolist()
+        })
+        if response is not None and response.status_code == 200:
+            transcript = response.json().get('transcript', '')
+            if transcript != last_transcript:
+                # The oldest unreflected chunk waited this long for its text
+                recorder.record_lag(time.monotonic() - pending_sends[0])
+                pending_sends = []
+                last_transcript = transcript
+
+    timed_post(session, recorder, 'stop-tab-recording', f'{base}/stop-tab-recording',
+               json={'session_id': session_id})
+
+    if args.analyze:
+        with open(recording_path, 'rb') as f:
+            timed_post(session, recorder, 'analyze', f'{base}/analyze',
+                       files={'audio_file': (os.path.basename(recording_path), f, 'audio/wav')},
+                       data={'interview_type': 'behavioral'})
+
+
+def summarize(values: List[float]) -> str:
+    if not values:
+        return "no samples"
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return f"n={len(values):5d}  p50={p50 * 1000:8.1f}ms  p95={p95 * 1000:8.1f}ms  p99={p99 * 1000:8.1f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:5001')
+    parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users')
+    parser.add_argument('--recording', action='append', default=[], help='Stereo .wav to replay (repeatable)')
+    parser.add_argument('--synthetic-seconds', type=float, default=60.0,
+                        help='Length of the synthetic session used when no recording is given')
+    parser.add_argument('--chunk-seconds', type=float, default=0.5, help='Streamed chunk length')
+    parser.add_argument('--ramp-seconds', type=float, default=5.0, help='Spread user start times over this period')
+    parser.add_argument('--no-analyze', dest='analyze', action='store_false', help='Skip the /analyze upload')
+    parser.add_argument('--server-pid', type=int, help='Server process to sample CPU and memory from')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        recordings = args.recording
+        if not recordings:
+            from benchmarks.fixtures import synthetic_interview, write_wav
+            recordings = [write_wav(os.path.join(tmp, 'synthetic.wav'), synthetic_interview(args.synthetic_seconds))]
+        channels = {path: load_recording(path) for path in recordings}
+
+        recorder = Recorder()
+        sampler = ResourceSampler(args.server_pid)
+        sampler.start()
+
+        started = time.monotonic()
+        threads = []
+        for user_id in range(args.users):
+            path = recordings[user_id % len(recordings)]
+            thread = threading.Thread(target=virtual_user, args=(user_id, args, path, channels[path], recorder))
+            threads.append(thread)
+            thread.start()
+            time.sleep(args.ramp_seconds / max(1, args.users))
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        sampler.stop()
+
+    print(f"\n{args.users} virtual users finished in {elapsed:.1f}s\n")
+    print("Latency by endpoint:")
+    for endpoint, values in recorder.latencies.items():
+        print(f"  {endpoint:22s} {summarize(values)}  errors={recorder.errors[endpoint]}")
+    print(f"\nTranscript lag:          {summarize(recorder.transcript_lags)}")
+    if sampler.cpu_percent:
+        print(f"\nServer CPU: mean {np.mean(sampler.cpu_percent):.0f}%  peak {max(sampler.cpu_percent):.0f}%")
+        print(f"Server RSS: peak {max(sampler.rss_bytes) / 2 ** 20:.0f} MiB")
+
+
+if __name__ == '__main__':
+    main()
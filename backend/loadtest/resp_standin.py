@@ -0,0 +1,182 @@
+"""
+Local stand-in for a Redis server, for testing the shared session store.
+
+Speaks the Redis protocol (RESP2) and implements the commands the session
+store uses, with key expiry, in a single process. Run several backend nodes
+against it to exercise session takeover without a real Redis:
+
+    python -m loadtest.resp_standin --port 6390
+    SESSION_STORE=redis://localhost:6390/0 gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import argparse
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class WrongType(Exception):
+    def __init__(self):
+        super().__init__('WRONGTYPE Operation against a key holding the wrong kind of value')
+
+
+class Keyspace:
+    def __init__(self):
+        """In-memory keys holding strings (bytes) or lists, with optional expiry."""
+        self.values: Dict[bytes, object] = {}
+        self.expires: Dict[bytes, float] = {}
+        self.lock = threading.Lock()
+
+    def _get(self, key: bytes):
+        """Get a key's value, dropping it if expired; call with the lock held."""
+        if key in self.expires and self.expires[key] <= time.monotonic():
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+        return self.values.get(key)
+
+    def _expire(self, key: bytes, seconds: float):
+        self.expires[key] = time.monotonic() + seconds
+
+    def execute(self, command: bytes, args: List[bytes]):
+        """Run a command and return its reply, or an Exception for an error reply."""
+        command = command.upper()
+        with self.lock:
+            if command == b'PING':
+                return 'PONG'
+            if command in (b'SELECT', b'AUTH'):
+                return 'OK'
+            if command == b'FLUSHDB':
+                self.values.clear()
+                self.expires.clear()
+                return 'OK'
+            if command == b'GET':
+                value = self._get(args[0])
+                if isinstance(value, list):
+                    return WrongType()
+                return value
+            if command == b'SET':
+                return self._set(args)
+            if command == b'DEL':
+                deleted = 0
+                for key in args:
+                    if self._get(key) is not None:
+                        deleted += 1
+                    self.values.pop(key, None)
+                    self.expires.pop(key, None)
+                return deleted
+            if command == b'EXISTS':
+                return sum(1 for key in args if self._get(key) is not None)
+            if command in (b'EXPIRE', b'PEXPIRE'):
+                if self._get(args[0]) is None:
+                    return 0
+                seconds = int(args[1]) / (1000.0 if command == b'PEXPIRE' else 1.0)
+                self._expire(args[0], seconds)
+                return 1
+            if command == b'RPUSH':
+                value = self._get(args[0])
+                if value is None:
+                    value = self.values[args[0]] = []
+                elif not isinstance(value, list):
+                    return WrongType()
+                value.extend(args[1:])
+                return len(value)
+            if command == b'LRANGE':
+                value = self._get(args[0]) or []
+                if not isinstance(value, list):
+                    return WrongType()
+                start, stop = int(args[1]), int(args[2])
+                stop = len(value) + stop if stop < 0 else stop
+                start = max(0, len(value) + start if start < 0 else start)
+                return value[start:stop + 1]
+            return Exception(f"ERR unknown command '{command.decode('utf-8', 'replace')}'")
+
+    def _set(self, args: List[bytes]):
+        key, value = args[0], args[1]
+        options = [arg.upper() for arg in args[2:]]
+        if b'NX' in options and self._get(key) is not None:
+            return None
+        self.values[key] = value
+        self.expires.pop(key, None)
+        for name, scale in ((b'EX', 1.0), (b'PX', 1000.0)):
+            if name in options:
+                self._expire(key, int(args[2 + options.index(name) + 1]) / scale)
+        return 'OK'
+
+
+def encode(reply) -> bytes:
+    """Encode a reply in RESP2."""
+    if isinstance(reply, Exception):
+        return b'-' + str(reply).encode('utf-8') + b'\r\n'
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, str):
+        return b'+' + reply.encode('utf-8') + b'\r\n'
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, bytes):
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+    return b'*%d\r\n' % len(reply) + b''.join(encode(item) for item in reply)
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    keyspace = Keyspace()
+
+    def handle(self):
+        try:
+            while True:
+                request = self._read_request()
+                if request is None:
+                    return
+                self.wfile.write(encode(self.keyspace.execute(request[0], request[1:])))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away without reading its replies
+            return
+
+    def _read_request(self) -> Optional[List[bytes]]:
+        """Read one command sent as an array of bulk strings."""
+        line = self.rfile.readline()
+        if not line.startswith(b'*'):
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args or None
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(host: str = '127.0.0.1', port: int = 6390) -> RespServer:
+    """
+    Start the stand-in server on a background thread with an empty keyspace.
+
+    Returns:
+        RespServer: The running server; call shutdown() to stop it
+    """
+    RespHandler.keyspace = Keyspace()
+    server = RespServer((host, port), RespHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port)
+    print(f"Redis stand-in listening on redis://{args.host}:{args.port}/0")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
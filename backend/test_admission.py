@@ -0,0 +1,135 @@
+import threading
+import time
+
+from app import admission as admission_module
+from app.admission import BATCH, LIVE, AdmissionController, OverloadedError, TokenBucket
+
+
+class FakeClock:
+    """Replaces the admission module's time module with a clock the test advances"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out waiting'
+        time.sleep(0.001)
+
+
+def waiters(controller, priority):
+    with controller._cond:
+        return controller._waiting[priority]
+
+
+def test_live_before_batch():
+    """A freed slot goes to a live window ahead of batch windows that queued earlier"""
+    controller = AdmissionController(max_concurrency=1, batch_wait_timeout=30)
+    order = []
+
+    def run(priority, name):
+        with controller.slot(priority):
+            order.append(name)
+
+    threads = []
+    with controller.slot(BATCH):
+        for name in ('batch-1', 'batch-2'):
+            threads.append(threading.Thread(target=run, args=(BATCH, name)))
+            threads[-1].start()
+        wait_until(lambda: waiters(controller, BATCH) == 2)
+        threads.append(threading.Thread(target=run, args=(LIVE, 'live')))
+        threads[-1].start()
+        wait_until(lambda: waiters(controller, LIVE) == 1)
+    for thread in threads:
+        thread.join()
+
+    print(f"\nAdmitted: {order}")
+    assert order[0] == 'live'
+    assert sorted(order[1:]) == ['batch-1', 'batch-2']
+    assert controller._active == 0 and controller._waiting == [0, 0]
+
+
+def test_batch_timeout():
+    """A batch window gives up after batch_wait_timeout while a live window keeps waiting"""
+    controller = AdmissionController(max_concurrency=1, batch_wait_timeout=0.1)
+    admitted = []
+
+    def run_live():
+        with controller.slot(LIVE):
+            admitted.append('live')
+
+    live = threading.Thread(target=run_live)
+    with controller.slot(LIVE):
+        start = time.monotonic()
+        try:
+            with controller.slot(BATCH):
+                assert False, 'expected OverloadedError'
+        except OverloadedError as e:
+            waited = time.monotonic() - start
+            print(f"\nRejected after {waited:.2f}s: {e}, retry after {e.retry_after}s")
+            assert waited >= 0.1
+            assert e.retry_after >= 1
+        assert controller._waiting == [0, 0]
+
+        live.start()
+        wait_until(lambda: waiters(controller, LIVE) == 1)
+        time.sleep(0.2)
+        assert not admitted and waiters(controller, LIVE) == 1
+    live.join()
+    assert admitted == ['live']
+
+
+def test_batch_job_cap():
+    """Batch jobs beyond max_batch_jobs are rejected at once, and admitted again once one finishes"""
+    controller = AdmissionController(max_batch_jobs=2)
+    with controller.batch_job():
+        with controller.batch_job():
+            try:
+                with controller.batch_job():
+                    assert False, 'expected OverloadedError'
+            except OverloadedError as e:
+                print(f"\nRejected: {e}, retry after {e.retry_after}s")
+                assert e.retry_after >= 1
+        with controller.batch_job():
+            assert controller._batch_jobs == 2
+    assert controller._batch_jobs == 0
+
+
+def test_token_bucket_refill():
+    """Tokens refill at rate up to burst, and a refused request is told how long to wait"""
+    clock = FakeClock()
+    saved = admission_module.time
+    admission_module.time = clock
+    try:
+        bucket = TokenBucket(rate=2.0, burst=10.0)
+        assert bucket.consume(10) == 0
+        assert bucket.consume(1) == 0.5
+
+        clock.now += 0.5
+        assert bucket.consume(1) == 0
+        assert bucket.consume(3) == 1.5
+
+        # Refilling stops at burst
+        clock.now += 100
+        assert bucket.consume(10) == 0
+        assert bucket.consume(0.5) == 0.25
+
+        # A request larger than burst waits for a full bucket rather than forever
+        clock.now += 2
+        assert bucket.consume(25) == 3.0
+        clock.now += 3
+        assert bucket.consume(10) == 0
+    finally:
+        admission_module.time = saved
+
+
+if __name__ == "__main__":
+    test_live_before_batch()
+    test_batch_timeout()
+    test_batch_job_cap()
+    test_token_bucket_refill()
@@ -0,0 +1,111 @@
+import json
+
+from app import nlp_analysis
+from app.nlp_analysis import analyze_transcripts_batch
+
+ANSWER = "I led the migration of our billing service, and it cut invoice errors by {} percent"
+
+
+class StubGemini:
+    """Stand-in for _generate that answers batches, records them and can fail or drop items"""
+
+    def __init__(self, answer=None):
+        self.batches = []
+        self.prompt_chars = []
+        self.answer = answer or (lambda attempt, ids: [{'id': item_id, 'message': f'llm {item_id}', 'type': 'positive'}
+                                                       for item_id in ids])
+
+    def __call__(self, prompt):
+        payloads = json.loads(prompt.rsplit('Now analyze these responses:', 1)[1])
+        ids = [payload['id'] for payload in payloads]
+        self.batches.append(ids)
+        self.prompt_chars.append(sum(len(json.dumps(payload)) for payload in payloads))
+        return json.dumps(self.answer(len(self.batches), ids))
+
+
+def run(stub, items, **kwargs):
+    """Analyze items with Gemini stubbed out and every item sent to it"""
+    generate, threshold, sleep = nlp_analysis._generate, nlp_analysis.LOCAL_CONFIDENCE_THRESHOLD, nlp_analysis.time.sleep
+    sleeps = []
+    nlp_analysis._generate = stub
+    nlp_analysis.LOCAL_CONFIDENCE_THRESHOLD = 2
+    nlp_analysis.time.sleep = sleeps.append
+    try:
+        return analyze_transcripts_batch(items, **kwargs), sleeps
+    finally:
+        nlp_analysis._generate, nlp_analysis.LOCAL_CONFIDENCE_THRESHOLD = generate, threshold
+        nlp_analysis.time.sleep = sleep
+
+
+def make_items(count):
+    return [{'id': i, 'transcript': ANSWER.format(i), 'question_type': 'leadership'} for i in range(count)]
+
+
+def test_packing_limits():
+    """Requests hold at most max_items items and max_prompt_chars of payload"""
+    stub = StubGemini()
+    results, _ = run(stub, make_items(10), max_items=3)
+    print(f"\nBatches by count: {stub.batches}")
+    assert [len(batch) for batch in stub.batches] == [3, 3, 3, 1]
+    assert results == {str(i): {'message': f'llm {i}', 'type': 'positive',
+                                'details': {'suggestion': 'Add more specific examples.'}} for i in range(10)}
+
+    stub = StubGemini()
+    run(stub, make_items(10), max_prompt_chars=400)
+    print(f"Batches by size: {stub.batches}")
+    assert len(stub.batches) > 1
+    assert all(chars <= 400 for chars in stub.prompt_chars)
+    assert sorted(int(i) for batch in stub.batches for i in batch) == list(range(10))
+
+
+def test_partial_and_missing_ids():
+    """Items left out of a response, or answered under an unknown id, are retried in the next attempt"""
+    def answer(attempt, ids):
+        if attempt == 1:
+            return [{'id': item_id, 'message': 'first'} for item_id in ids if int(item_id) % 2 == 0] + \
+                   [{'id': 'unknown', 'message': 'stray'}, 'not an object', {'id': '1'}]
+        return [{'id': item_id, 'message': 'second'} for item_id in ids]
+
+    stub = StubGemini(answer)
+    results, sleeps = run(stub, make_items(6), retry_seconds=1)
+    print(f"\nAttempts: {stub.batches}")
+    assert stub.batches == [['0', '1', '2', '3', '4', '5'], ['1', '3', '5']]
+    assert {item_id: feedback['message'] for item_id, feedback in results.items()} == {
+        '0': 'first', '1': 'second', '2': 'first', '3': 'second', '4': 'first', '5': 'second'}
+    assert sleeps == [1]
+
+
+def test_retries_back_off_then_fall_back():
+    """A failing request is retried after a growing backoff, then the items are graded locally"""
+    def answer(attempt, ids):
+        raise RuntimeError('429 quota exceeded')
+
+    stub = StubGemini(answer)
+    results, sleeps = run(stub, make_items(2), max_retries=3, retry_seconds=2)
+    print(f"\nBackoff: {sleeps}")
+    assert len(stub.batches) == 4
+    assert sleeps == [2, 4, 8]
+    # Local analysis reports its confidence
+    assert all('confidence' in feedback['details'] for feedback in results.values())
+
+
+def test_duplicate_ids_and_delivery():
+    """Duplicate ids are rejected, and delivery metrics come back with each item's feedback"""
+    try:
+        run(StubGemini(), [{'id': 1, 'transcript': 'a'}, {'id': '1', 'transcript': 'b'}])
+        assert False, 'expected ValueError'
+    except ValueError as e:
+        print(f"\nRejected: {e}")
+
+    items = make_items(2)
+    items[0]['prosody'] = {'overlap_seconds': 1.5}
+    results, _ = run(StubGemini(), items)
+    assert results['0']['details']['delivery'] == {'overlap_seconds': 1.5}
+    assert 'delivery' not in results['1']['details']
+
+
+if __name__ == "__main__":
+    test_packing_limits()
+    test_partial_and_missing_ids()
+    test_retries_back_off_then_fall_back()
+    test_duplicate_ids_and_delivery()
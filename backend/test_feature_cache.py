@@ -0,0 +1,121 @@
+import numpy as np
+
+from app.feature_cache import HOP_LENGTH, N_FFT, SECONDS_PER_TIMESTAMP, StreamingLogMel, timed_segments
+
+SAMPLE_RATE = 16000
+
+# Tolerance on raw log10 mel power between numpy's and torch's FFTs
+ATOL = 5e-3
+
+
+def noisy_tone(seconds, seed=0):
+    """A tone over noise: no frame is quiet enough for Whisper's dynamic range clamp to change it"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (0.1 * np.sin(2 * np.pi * 440 * t) + rng.normal(0, 0.05, len(t))).astype(np.float32)
+
+
+def whisper_raw_log_mel(audio, n_mels=80, zero_padded=False):
+    """
+    Raw log10 mel frames as whisper.log_mel_spectrogram computes them.
+
+    Its output is (log10 + 4) / 4 once the clamp is inactive, which the
+    assertion below checks. zero_padded appends silence as model.transcribe
+    does, so the last frames see zeros rather than a reflection.
+    """
+    import torch
+    import whisper
+
+    mel = whisper.log_mel_spectrogram(torch.from_numpy(audio), n_mels, padding=N_FFT if zero_padded else 0).numpy()
+    assert mel.min() > mel.max() - 2.0, 'the dynamic range clamp changed some frames'
+    frames = len(audio) // HOP_LENGTH
+    return mel[:, :frames] * 4.0 - 4.0
+
+
+def stream(audio, pieces, **kwargs):
+    """Append audio to a StreamingLogMel in pieces of the given sizes, repeated"""
+    cache = StreamingLogMel(**kwargs)
+    position, index = 0, 0
+    while position < len(audio):
+        size = pieces[index % len(pieces)]
+        cache.append(audio[position:position + size])
+        position += size
+        index += 1
+    return cache
+
+
+def test_matches_whisper():
+    """Cached frames equal whisper.log_mel_spectrogram's for the same samples, at the edges of the stream too"""
+    audio = noisy_tone(12)
+    cache = stream(audio, [1, 199, 4000, 317])
+    expected = whisper_raw_log_mel(audio, zero_padded=True)
+
+    # The first frames see a reflection of the start of the stream, as in Whisper
+    whole = cache.window(0, len(audio))
+    print(f"\nWhole stream: {whole.shape}, max error {np.abs(whole - expected).max():.2e}")
+    assert whole.shape == expected.shape
+    assert np.allclose(whole, expected, atol=ATOL)
+
+    # Interior windows use the real samples around them; the latest frames are zero padded
+    for start, end in ((HOP_LENGTH * 37, HOP_LENGTH * 512), (SAMPLE_RATE * 3 + 5, SAMPLE_RATE * 7 + 3),
+                       (SAMPLE_RATE * 10, len(audio))):
+        window = cache.window(start, end)
+        first = int(round(start / HOP_LENGTH))
+        assert np.allclose(window, expected[:, first:end // HOP_LENGTH], atol=ATOL), (start, end)
+
+    # Without padding, whisper reflects the end of its input; away from the end the frames agree
+    reflected = whisper_raw_log_mel(audio)
+    assert np.allclose(whole[:, :-2], reflected[:, :-2], atol=ATOL)
+
+
+def test_ring_wraparound():
+    """Windows that wrap around the ring buffer still match, and windows that left it are refused"""
+    audio = noisy_tone(7, seed=1)
+    cache = stream(audio, [1601, 7], max_seconds=2)
+    expected = whisper_raw_log_mel(audio, zero_padded=True)
+    assert cache.next_frame > cache.capacity * 3
+
+    end = len(audio)
+    start = end - cache.capacity * HOP_LENGTH + HOP_LENGTH * 3
+    window = cache.window(start, end)
+    print(f"\nFrames {start // HOP_LENGTH}-{end // HOP_LENGTH} of a ring of {cache.capacity}")
+    assert np.allclose(window, expected[:, start // HOP_LENGTH:end // HOP_LENGTH], atol=ATOL)
+    assert cache.window(SAMPLE_RATE, SAMPLE_RATE * 2) is None
+
+    # A cache started mid-channel counts from its first sample
+    offset = SAMPLE_RATE * 2
+    late = stream(audio[offset:], [999], start_sample=offset)
+    assert np.allclose(late.window(offset, len(audio)), whisper_raw_log_mel(audio[offset:], zero_padded=True),
+                       atol=ATOL)
+
+
+def test_timed_segments():
+    """Text between timestamp tokens becomes segments, clipped to the window"""
+    words = {0: "I", 1: "led", 2: "the", 3: "migration.", 4: " "}
+    timestamp = 100
+
+    def ts(seconds):
+        return timestamp + int(round(seconds / SECONDS_PER_TIMESTAMP))
+
+    def decode(tokens):
+        return " ".join(words[token] for token in tokens)
+
+    tokens = [ts(0), 0, 1, ts(1.2), ts(1.2), 2, 3, ts(2.5), ts(3.0), 4, ts(4.0), ts(4.0), 0]
+    segments = timed_segments(tokens, timestamp, decode, duration=5.0)
+    print(f"\nSegments: {segments}")
+    assert segments == [{'start': 0.0, 'end': 1.2, 'text': "I led"},
+                        {'start': 1.2, 'end': 2.5, 'text': "the migration."},
+                        {'start': 4.0, 'end': 5.0, 'text': "I"}]
+
+    # A single timestamp between texts splits them; timestamps past the audio are clipped
+    assert timed_segments([0, ts(1.0), 1, ts(29.0)], timestamp, decode, duration=3.0) == [
+        {'start': 0.0, 'end': 1.0, 'text': "I"}, {'start': 1.0, 'end': 3.0, 'text': "led"}]
+    assert timed_segments([2, 3], timestamp, decode, duration=2.0) == [
+        {'start': 0.0, 'end': 2.0, 'text': "the migration."}]
+    assert timed_segments([], timestamp, decode, duration=2.0) == []
+
+
+if __name__ == "__main__":
+    test_matches_whisper()
+    test_ring_wraparound()
+    test_timed_segments()
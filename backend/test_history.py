@@ -0,0 +1,146 @@
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from app.history import HistoryStore, _SCHEMA
+from app.timeline import ConversationTimeline
+
+
+def interview(i):
+    """Timeline of one short question and answer"""
+    timeline = ConversationTimeline()
+    timeline.add('tab', [(0.0, 2.0, f"Tell me about a time you led a team, number {i}?")])
+    timeline.add('mic', [(2.5, 6.0, f"I led the migration project {i} and cut latency by 40 percent")])
+    timeline.flush()
+    return timeline
+
+
+def record(history, key, i, user_id=None, feedback_type='positive', score=0.8):
+    timeline = interview(i)
+    history.record_session(key, 'upload', timeline.format(),
+                           {'message': 'ok', 'type': feedback_type, 'details': {'score': score}},
+                           interview_type='behavioral', duration=6.0, turns=timeline.turns(), user_id=user_id)
+
+
+def new_history():
+    return HistoryStore(os.path.join(tempfile.mkdtemp(), 'history.db'))
+
+
+def test_cursor_paging():
+    """Cursor pages cover every session once, newest first"""
+    history = new_history()
+    for i in range(45):
+        record(history, f"s{i}", i)
+    history.flush()
+
+    keys = []
+    cursor = None
+    while True:
+        page = history.list_sessions(limit=20, cursor=cursor)
+        keys.extend(session['session_key'] for session in page['sessions'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    print(f"\nPaged through {len(keys)} sessions")
+    assert keys == [f"s{i}" for i in reversed(range(45))]
+    assert history.list_sessions(question_type='leadership', limit=1)['sessions'][0]['question_type'] == 'leadership'
+    history.close()
+
+
+def test_search():
+    """Search finds segments by all their words, is safe from query syntax and filters by user"""
+    history = new_history()
+    for i in range(10):
+        record(history, f"s{i}", i, user_id='alice' if i % 2 else 'bob')
+    history.flush()
+
+    results = history.search('migration project 3')['results']
+    print(f"\nBest match: {results[0]['snippet']}")
+    assert results[0]['session_key'] == 's3'
+    assert results[0]['segment']['speaker'] == 'interviewee'
+    assert history.search('"bad OR (')['results'] == []
+    # The last word matches as a prefix
+    assert history.search('migr', limit=4)['next_offset'] == 4
+
+    alice = history.search('migration', limit=100, user_id='alice')['results']
+    assert sorted(result['session_key'] for result in alice) == ['s1', 's3', 's5', 's7', 's9']
+    assert history.search('project 8', user_id='alice')['results'] == []
+    history.close()
+
+
+def test_replace_session():
+    """Recording a session key again replaces its segments and search entries"""
+    history = new_history()
+    record(history, 's1', 1)
+    history.flush()
+    history.record_session('s1', 'tab', 'just an answer', {'message': 'm', 'type': 'neutral', 'details': {}})
+    history.flush()
+
+    session = history.get_session('s1')
+    assert session['source'] == 'tab'
+    assert session['segments'] == []
+    assert history.search('migration')['results'] == []
+    assert len(history.list_sessions()['sessions']) == 1
+    history.close()
+
+
+def test_rollup_replace():
+    """Replacing a session moves it out of its old rollup instead of counting it twice"""
+    history = new_history()
+    record(history, 'a1', 1, user_id='alice', feedback_type='positive', score=0.9)
+    record(history, 'a2', 2, user_id='alice', feedback_type='constructive', score=0.3)
+    history.flush()
+    totals = history.progress('alice')['totals']['leadership']
+    assert totals['sessions'] == 2
+    assert totals['types'] == {'positive': 1, 'neutral': 0, 'constructive': 1}
+    assert totals['average_score'] == 0.6
+
+    record(history, 'a1', 1, user_id='alice', feedback_type='neutral', score=0.5)
+    history.flush()
+    totals = history.progress('alice')['totals']['leadership']
+    print(f"\nAfter replacing a session: {totals}")
+    assert totals['sessions'] == 2
+    assert totals['types'] == {'positive': 0, 'neutral': 1, 'constructive': 1}
+    assert totals['average_score'] == 0.4
+    assert history.progress('bob')['totals'] == {}
+    history.close()
+
+
+def test_migration():
+    """A version 1 database gains users and rollups, with its sessions backfilled"""
+    path = os.path.join(tempfile.mkdtemp(), 'history.db')
+    connection = sqlite3.connect(path)
+    connection.executescript(_SCHEMA)
+    connection.execute("PRAGMA user_version = 1")
+    connection.execute(
+        "INSERT INTO sessions (session_key, source, question_type, created_at, transcript, feedback_type, score, "
+        "message, feedback) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        ('old', 'upload', 'teamwork', time.time(), 'um we shipped it together', 'positive', 0.7, 'ok',
+         json.dumps({'message': 'ok', 'type': 'positive', 'details': {'score': 0.7}}))
+    )
+    connection.commit()
+    connection.close()
+
+    history = HistoryStore(path)
+    assert sqlite3.connect(path).execute("PRAGMA user_version").fetchone()[0] == 2
+    assert history.list_sessions()['sessions'][0]['user_id'] == 'anonymous'
+    totals = history.progress('anonymous')['totals']
+    print(f"\nBackfilled rollups: {totals}")
+    assert totals['teamwork']['sessions'] == 1
+    assert totals['teamwork']['average_score'] == 0.7
+    assert totals['teamwork']['average_words'] == 5
+
+    # Opening it again leaves the migrated database as it is
+    HistoryStore(path).close()
+    assert HistoryStore(path).progress('anonymous')['totals'] == totals
+    history.close()
+
+
+if __name__ == "__main__":
+    test_cursor_paging()
+    test_search()
+    test_replace_session()
+    test_rollup_replace()
+    test_migration()
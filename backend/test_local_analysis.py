@@ -0,0 +1,38 @@
+from app.local_analysis import local_analysis
+import json
+import time
+
+def test_local_analysis():
+    """Test the local analyzer with a strong and a weak sample response"""
+
+    print("\nTesting local analysis with sample text")
+
+    strong_transcript = """
+    In my previous role at a logistics startup, I was responsible for our billing pipeline, which kept timing out
+    at the end of every month. I had to get invoices out on time without adding servers. I decided to profile the
+    batch job, and I found that we were recomputing customer discounts for every line item. I proposed caching the
+    discount table and I implemented the change with one other engineer over two weeks. As a result, the job went
+    from 6 hours to 40 minutes, and we saved roughly $3,000 a month in compute. I learned to measure before guessing.
+    """
+    weak_transcript = "Um, I think I was like, basically on a team and we maybe did a project."
+
+    start = time.perf_counter()
+    strong = local_analysis(strong_transcript, interview_type='behavioral', question_type='challenge', duration=45)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    weak = local_analysis(weak_transcript, interview_type='behavioral', question_type='challenge')
+
+    print(f"Local analysis took {elapsed_ms:.2f} ms")
+    print("\nStrong response feedback:")
+    print(json.dumps(strong, indent=2))
+    print("\nWeak response feedback:")
+    print(json.dumps(weak, indent=2))
+
+    assert set(strong.keys()) == {'message', 'type', 'details'}
+    assert 'suggestion' in strong['details']
+    assert all(strong['details']['metrics']['star_components'].values())
+    assert strong['details']['metrics']['quantified_results'] > 0
+    assert weak['type'] == 'constructive'
+    assert weak['details']['metrics']['filler_count'] >= 3
+
+if __name__ == "__main__":
+    test_local_analysis()
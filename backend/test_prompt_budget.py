@@ -0,0 +1,87 @@
+import random
+
+from app.prompt_budget import (build_conversation_context, build_timeline_context, count_tokens, fit_to_budget,
+                               format_budgeted_context)
+from app.timeline import ConversationTimeline
+
+WORDS = ("the team project deadline customer latency migration we shipped delivered conflict resolved "
+         "because result measured database outage budget").split()
+
+
+def sentence(rng, question=False):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 25))) + ('?' if question else '.')
+
+
+def interview(rng, exchanges):
+    """Interviewer and interviewee transcripts, and their timeline, of several questions and answers"""
+    questions, answers = [], []
+    timeline = ConversationTimeline()
+    t = 0.0
+    for _ in range(exchanges):
+        question = sentence(rng, question=True)
+        answer = " ".join(sentence(rng) for _ in range(rng.randint(1, 6)))
+        timeline.add('tab', [(t, t + 2, question)])
+        timeline.add('mic', [(t + 2.5, t + 8, answer)])
+        questions.append(question)
+        answers.append(answer)
+        t += 9
+    timeline.flush()
+    return " ".join(questions), " ".join(answers), timeline
+
+
+def test_budget_ceiling():
+    """Every context, including its labels, measures within the budget"""
+    rng = random.Random(0)
+    worst = None
+    for _ in range(300):
+        interviewer, interviewee, timeline = interview(rng, rng.randint(1, 15))
+        max_tokens = rng.choice([0, 5, 12, 20, 33, 50, 80, 150, 400])
+        for context in (build_conversation_context(interviewer, interviewee, max_tokens),
+                        build_timeline_context(timeline.turns(), max_tokens),
+                        fit_to_budget(interviewee, max_tokens)):
+            over = count_tokens(context) - max_tokens
+            worst = over if worst is None else max(worst, over)
+    print(f"\nLargest overshoot: {worst}")
+    assert worst <= 0
+
+
+def test_recent_exchange_verbatim():
+    """The last question and answer are kept word for word while earlier turns are summarized"""
+    rng = random.Random(1)
+    interviewer, interviewee, timeline = interview(rng, 30)
+    last_question = "Tell me about a time you disagreed with your manager?"
+    last_answer = "I showed them the latency numbers and we agreed to ship the cache first."
+    interviewer += " " + last_question
+    interviewee += " " + last_answer
+    timeline.add('tab', [(1000, 1003, last_question)])
+    timeline.add('mic', [(1004, 1010, last_answer)])
+    timeline.flush()
+
+    for context in (build_conversation_context(interviewer, interviewee, 300),
+                    build_timeline_context(timeline.turns(), 300)):
+        print(f"\n{context}")
+        assert count_tokens(context) <= 300
+        assert "Earlier conversation (summarized):" in context
+        assert f"Most recent question:\nInterviewer: {last_question}" in context
+        assert "Most recent answer:\nInterviewee: " in context and context.endswith(last_answer)
+    # With turns, the answer is exactly what followed the question
+    assert context.endswith(f"Most recent answer:\nInterviewee: {last_answer}")
+
+
+def test_small_and_zero_budgets():
+    """A budget of 0 is honoured rather than replaced by the default, and tiny budgets keep the end of the answer"""
+    text = "We measured everything. Then we shipped the fix and latency dropped."
+    assert fit_to_budget(text, 0) == ""
+    assert build_conversation_context("Why?", text, 0) == ""
+    assert build_conversation_context("Why?", text) == f"Interviewer: Why?\n\nInterviewee: {text}"
+
+    context = format_budgeted_context("", "", "What happened next?", text, 30)
+    print(f"\n{context}")
+    assert count_tokens(context) <= 30
+    assert context.endswith("latency dropped.")
+
+
+if __name__ == "__main__":
+    test_budget_ceiling()
+    test_recent_exchange_verbatim()
+    test_small_and_zero_budgets()
@@ -0,0 +1,81 @@
+import json
+
+import numpy as np
+
+from app.prosody import ProsodyTracker, OVERLAP_HISTORY_SECONDS
+
+SAMPLE_RATE = 16000
+
+
+def two_party_recording(seconds=120, seed=0):
+    """Synthetic interview where the interviewer talks over the interviewee every few seconds"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds * SAMPLE_RATE) / SAMPLE_RATE
+    noise = lambda: rng.normal(0, 0.0005, len(t))
+    tone = lambda freq: 0.1 * np.sin(2 * np.pi * freq * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t))
+
+    # Interviewee speaks 6 s of every 8 s; the interviewer starts 3 s before
+    # each answer ends and keeps talking until the next one
+    mic_active = (t % 8) < 6
+    tab_active = ((t - 3) % 8) < 5
+    mic = np.where(mic_active, tone(180), 0) + noise()
+    tab = np.where(tab_active, tone(120), 0) + noise()
+    return mic.astype(np.float32), tab.astype(np.float32)
+
+
+def stream(tracker, mic, tab, chunk_seconds):
+    """Add both channels to a tracker in alternating chunks, as the live session does"""
+    chunk = int(chunk_seconds * SAMPLE_RATE)
+    for start in range(0, len(mic), chunk):
+        tracker.add_audio('mic', mic[start:start + chunk], start / SAMPLE_RATE)
+        tracker.add_audio('tab', tab[start:start + chunk], start / SAMPLE_RATE)
+
+
+def test_recording_matches_stream():
+    """A whole recording gives the same overlap and interruptions as streaming it"""
+    mic, tab = two_party_recording()
+
+    batch = ProsodyTracker()
+    batch.add_recording({'mic': mic, 'tab': tab})
+    streamed = ProsodyTracker()
+    stream(streamed, mic, tab, 0.5)
+
+    batch_summary, streamed_summary = batch.summary(), streamed.summary()
+    print("\nWhole recording:", json.dumps(batch_summary, indent=2))
+    print("Streamed in 0.5 s chunks:", json.dumps(streamed_summary, indent=2))
+
+    assert batch_summary == streamed_summary
+    # Overlap is counted over the whole recording, not only the last history window
+    assert batch_summary['overlap_seconds'] > OVERLAP_HISTORY_SECONDS
+    assert batch_summary['interruptions']['interviewer'] >= 14
+
+
+def test_upload_matches_batch():
+    """An upload transcribed while it arrives reports the same delivery metrics as a whole file"""
+    from benchmarks.fakes import install_fakes
+    install_fakes(realtime_factor=0.0, llm_latency=0.0)
+    from app.audio_processing import StreamingAnalysis, process_decoded_audio
+
+    mic, tab = two_party_recording()
+    audio = (np.stack([mic, tab], axis=1) * 32767).astype(np.int16)
+
+    batch = process_decoded_audio(SAMPLE_RATE, audio)['details']['delivery']
+    analysis = StreamingAnalysis()
+    block = SAMPLE_RATE // 3
+    for start in range(0, len(audio), block):
+        analysis.add(audio[start:start + block], SAMPLE_RATE)
+    streamed = analysis.finish()['details']['delivery']
+
+    print("\nWhole file:", batch['overlap_seconds'], batch['interruptions'])
+    print("While uploading:", streamed['overlap_seconds'], streamed['interruptions'])
+
+    assert streamed['overlap_seconds'] == batch['overlap_seconds']
+    assert streamed['interruptions'] == batch['interruptions']
+    for speaker in ('interviewee', 'interviewer'):
+        assert streamed[speaker]['speaking_seconds'] == batch[speaker]['speaking_seconds']
+        assert streamed[speaker]['pauses'] == batch[speaker]['pauses']
+
+
+if __name__ == "__main__":
+    test_recording_matches_stream()
+    test_upload_matches_batch()
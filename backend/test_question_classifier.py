@@ -0,0 +1,74 @@
+from app import question_classifier
+from app.question_classifier import QuestionClassifier, QuestionTracker
+
+KEYWORDS = {
+    'technical': {'design': 2, 'architect*': 2},
+    'teamwork': {'team': 1, 'collaborat*': 2},
+    'leadership': {'team lead': 3, 'lead': 2}
+}
+
+
+def test_word_boundaries():
+    """Keywords match whole words; only a trailing '*' extends them"""
+    classifier = QuestionClassifier(KEYWORDS)
+    assert classifier.score("How would you design it?") == {'technical': 2.0}
+    assert classifier.score("Who was the designer?") == {}
+    assert classifier.score("Did anything mislead you?") == {}
+    assert classifier.score("How did you collaborate, and who collaborated with you?") == {'teamwork': 4.0}
+    assert classifier.score("Who is the architect, and how is it architected?") == {'technical': 4.0}
+    assert classifier.score("What did the ARCHITECTURE look like?") == {'technical': 2.0}
+    # The wildcard only extends the end of a keyword
+    assert classifier.score("Were you a co-architect or a subarchitect?") == {'technical': 2.0}
+
+
+def test_longest_match_wins():
+    """A multi-word keyword takes precedence over the shorter keyword it starts with"""
+    classifier = QuestionClassifier(KEYWORDS)
+    scores = classifier.score("Tell me about your time as a team lead")
+    print(f"\nScores: {scores}")
+    assert scores == {'leadership': 3.0}
+    assert classifier.classify("Tell me about your time as a team   lead") == 'leadership'
+    assert classifier.score("How did your team lead the change?") == {'leadership': 3.0}
+    assert classifier.score("How did the team work?") == {'teamwork': 1.0}
+    assert classifier.classify("Any questions for me?") == 'general'
+
+
+def test_question_split_across_segments():
+    """A question is classified once its '?' arrives, with the text of earlier segments"""
+    tracker = QuestionTracker(QuestionClassifier(KEYWORDS))
+    assert tracker.feed("So tell me how you would") == []
+    assert tracker.feed("") == []
+    assert tracker.feed("design the storage layer? And") == [("So tell me how you would design the storage layer?",
+                                                             'technical')]
+    # The last completed question gives the type while the next one is unfinished
+    assert tracker.feed("who did you collaborate") == []
+    assert tracker.current_type() == 'technical'
+    assert tracker.feed("with? Does that make sense?") == [("And who did you collaborate with?", 'teamwork'),
+                                                          ("Does that make sense?", 'general')]
+    # Trailing generic questions don't replace the last specific type
+    assert tracker.current_type() == 'teamwork'
+    tracker.reset()
+    assert tracker.current_type() == 'general'
+    # Before any question completes, the unfinished text gives the type
+    tracker.feed("walk me through how you collaborate")
+    assert tracker.current_type() == 'teamwork'
+
+
+def test_pending_cap():
+    """Text without a question mark is capped at its last PENDING_MAX_WORDS words"""
+    tracker = QuestionTracker(QuestionClassifier(KEYWORDS))
+    filler = " ".join(f"word{i}" for i in range(question_classifier.PENDING_MAX_WORDS * 2))
+    tracker.feed(filler)
+    tracker.feed("how would you design it")
+    pending = tracker._pending.split()
+    print(f"\nPending words: {len(pending)}")
+    assert len(pending) == question_classifier.PENDING_MAX_WORDS
+    assert pending[-1] == "it"
+    assert tracker.feed("?")[0][1] == 'technical'
+
+
+if __name__ == "__main__":
+    test_word_boundaries()
+    test_longest_match_wins()
+    test_question_split_across_segments()
+    test_pending_cap()
@@ -0,0 +1,62 @@
+import time
+
+import numpy as np
+
+from app.ring_buffer import AudioRing, RingConsumer
+
+
+def test_wraparound():
+    """Reads and writes that cross the end of the buffer keep the samples in order"""
+    ring = AudioRing(1000)
+    source = np.arange(10000, dtype=np.float32)
+    received = []
+    for start in range(0, len(source), 300):
+        assert ring.write(source[start:start + 300])
+        received.append(ring.read(170))
+        received.append(ring.read())
+    assert ring.available() == 0
+    assert np.array_equal(np.concatenate(received), source)
+
+
+def test_overflow_drops_whole_chunk():
+    """A chunk that doesn't fit is dropped whole and counted, without touching what is queued"""
+    ring = AudioRing(3000)
+    assert ring.write(np.full(2048, 1, dtype=np.float32))
+    assert not ring.write(np.full(2048, 2, dtype=np.float32))
+    print(f"\nOverflows: {ring.overflows}, dropped samples: {ring.dropped_samples}")
+    assert ring.overflows == 1
+    assert ring.dropped_samples == 2048
+
+    samples = ring.read()
+    assert len(samples) == 2048 and (samples == 1).all()
+    # Space freed by the read can be written again
+    assert ring.write(np.full(2048, 3, dtype=np.float32))
+    assert (ring.read() == 3).all()
+
+
+def test_consumer_drains_on_stop():
+    """Stopping the consumer delivers everything already captured to the sink"""
+    ring = AudioRing(50000)
+    blocks = []
+    consumer = RingConsumer(ring, blocks.append, 'mic', block_samples=700, poll_interval=0.001)
+    consumer.start()
+
+    source = np.arange(200000, dtype=np.float32)
+    for start in range(0, len(source), 1024):
+        while not ring.write(source[start:start + 1024]):
+            time.sleep(0.001)
+    # Stop with a backlog still queued in the ring
+    tail = np.arange(len(source), len(source) + 30000, dtype=np.float32)
+    assert ring.write(tail)
+    consumer.stop()
+    source = np.concatenate([source, tail])
+
+    assert all(len(block) <= 700 for block in blocks)
+    assert np.array_equal(np.concatenate(blocks), source)
+    assert ring.available() == 0
+
+
+if __name__ == "__main__":
+    test_wraparound()
+    test_overflow_drops_whole_chunk()
+    test_consumer_drains_on_stop()
@@ -0,0 +1,130 @@
+import math
+import random
+
+from app.metrics import FALLING_BEHIND
+from app.scheduler import BACKOFF_FACTOR, RECOVERY_FACTOR, RTF_SMOOTHING, AdaptiveScheduler, EngineStats
+
+
+def engine(realtime_factor):
+    """Engine stats that have measured realtime_factor"""
+    stats = EngineStats('test')
+    stats.record(10.0, 10.0 * realtime_factor)
+    return stats
+
+
+def intervals(scheduler, backlogs):
+    """The interval after each update with the given backlogs"""
+    result = []
+    for backlog in backlogs:
+        scheduler.update(backlog)
+        result.append(scheduler.interval)
+    return result
+
+
+def expected(start, factor, steps, low=0.5, high=5.0):
+    values = []
+    for _ in range(steps):
+        start = min(high, max(low, start * factor))
+        values.append(start)
+    return values
+
+
+def falling_behind_gauge(channel):
+    return FALLING_BEHIND._values.get((channel,), 0.0)
+
+
+def test_realtime_factor_average():
+    """The real-time factor is an exponentially weighted average; empty windows are ignored"""
+    stats = EngineStats('test')
+    assert stats.realtime_factor is None and stats.utilization() == 0.0
+    stats.record(10, 5)
+    stats.record(0, 3)
+    assert stats.realtime_factor == 0.5
+    stats.record(10, 1)
+    assert math.isclose(stats.realtime_factor, 0.5 + RTF_SMOOTHING * (0.1 - 0.5))
+
+
+def test_backoff_and_recovery():
+    """A busy engine stretches the interval by 1.5x up to the maximum; an idle one shrinks it by 0.8x to the minimum"""
+    busy = AdaptiveScheduler(engine(1.0), 'test-busy', min_interval=0.5, max_interval=5.0)
+    backed_off = intervals(busy, [0.0] * 8)
+    print(f"\nBacking off: {[round(value, 3) for value in backed_off]}")
+    assert backed_off == expected(0.5, BACKOFF_FACTOR, 8)
+    assert backed_off[-1] == 5.0
+
+    busy.engine = engine(0.1)
+    recovered = intervals(busy, [0.0] * 12)
+    print(f"Recovering: {[round(value, 3) for value in recovered]}")
+    assert recovered == expected(5.0, RECOVERY_FACTOR, 12)
+    assert recovered[-1] == 0.5
+
+    # Between half the target utilization and the target, the interval holds
+    busy.interval = 2.0
+    busy.engine = engine(0.5)
+    assert intervals(busy, [0.0] * 3) == [2.0, 2.0, 2.0]
+
+
+def test_backlog_and_shared_engine():
+    """Audio piling up backs off even on an idle engine, and channels sharing an engine add up its load"""
+    scheduler = AdaptiveScheduler(engine(0.05), 'test-backlog', min_interval=0.5, max_interval=5.0)
+    assert intervals(scheduler, [2.0, 2.0, 0.0]) == [0.75, 1.125, 0.9]
+
+    shared = engine(0.4)
+    first = AdaptiveScheduler(shared, 'test-first', min_interval=0.5, max_interval=5.0)
+    second = AdaptiveScheduler(shared, 'test-second', min_interval=0.5, max_interval=5.0)
+    first.start()
+    first.start()
+    assert shared.channels == 1
+    assert intervals(first, [0.0]) == [0.5]
+    second.start()
+    assert math.isclose(shared.utilization(), 0.8)
+    assert intervals(first, [0.0]) == [0.75]
+    second.stop()
+    assert intervals(first, [0.0]) == [0.75]
+    first.stop()
+    assert shared.channels == 0
+
+
+def test_interval_bounds():
+    """Whatever the measured speed and backlog, the interval stays within its bounds"""
+    rng = random.Random(0)
+    stats = EngineStats('test')
+    scheduler = AdaptiveScheduler(stats, 'test-bounds', min_interval=0.25, max_interval=3.0)
+    for _ in range(2000):
+        stats.record(rng.uniform(0.5, 30), rng.uniform(0, 30) * rng.choice([0.01, 0.1, 1.0]))
+        scheduler.update(rng.choice([0.0, rng.uniform(0, 60)]))
+        assert 0.25 <= scheduler.interval <= 3.0
+    # A maximum below the minimum is raised to it
+    assert AdaptiveScheduler(stats, 'test-bounds', min_interval=2.0, max_interval=1.0).max_interval == 2.0
+
+
+def test_falling_behind():
+    """The flag and its gauge follow the backlog past behind_seconds, and clear when the channel stops"""
+    channel = 'test-behind'
+    scheduler = AdaptiveScheduler(engine(0.1), channel, behind_seconds=10.0)
+    scheduler.start()
+    scheduler.update(4.0)
+    assert not scheduler.falling_behind and falling_behind_gauge(channel) == 0
+
+    scheduler.update(12.5)
+    print(f"\nStatus: {scheduler.status()}")
+    assert scheduler.falling_behind and falling_behind_gauge(channel) == 1
+    assert scheduler.status()['falling_behind'] and scheduler.status()['backlog_seconds'] == 12.5
+    # Staying behind doesn't count the channel twice
+    scheduler.update(15.0)
+    assert falling_behind_gauge(channel) == 1
+
+    scheduler.update(10.0)
+    assert not scheduler.falling_behind and falling_behind_gauge(channel) == 0
+
+    scheduler.update(11.0)
+    scheduler.stop()
+    assert not scheduler.falling_behind and falling_behind_gauge(channel) == 0
+
+
+if __name__ == "__main__":
+    test_realtime_factor_average()
+    test_backoff_and_recovery()
+    test_backlog_and_shared_engine()
+    test_interval_bounds()
+    test_falling_behind()
@@ -0,0 +1,218 @@
+import threading
+
+from app import session_registry
+from app.session_registry import SessionLimitError, SessionRegistry
+
+
+class StubTranscriber:
+    """Stands in for the per-session transcriber and records being stopped"""
+
+    def __init__(self, session_id, **kwargs):
+        self.session_id = session_id
+        self.kwargs = kwargs
+        self.stopped = False
+
+    def stop_recording(self):
+        self.stopped = True
+
+
+class FakeClock:
+    """Replaces the registry's time module; the reaper runs one pass per tick()"""
+
+    def __init__(self):
+        self.now = 0.0
+        self._ticks = threading.Semaphore(0)
+        self._waiting = threading.Semaphore(0)
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        # The reaper is between passes; let the test know, then wait for it to advance the clock
+        self._waiting.release()
+        self._ticks.acquire()
+        self.now += seconds
+
+    def wait_for_reaper(self):
+        assert self._waiting.acquire(timeout=5), 'reaper did not reach its sleep'
+
+    def tick(self):
+        """Let one reap_interval pass and wait until the reaper has finished its pass"""
+        self._ticks.release()
+        self.wait_for_reaper()
+
+
+def with_clock(test):
+    """Run test with a FakeClock in place of the registry's time module"""
+    def run():
+        clock = FakeClock()
+        saved = session_registry.time
+        session_registry.time = clock
+        try:
+            test(clock)
+        finally:
+            session_registry.time = saved
+    run.__name__, run.__doc__ = test.__name__, test.__doc__
+    return run
+
+
+@with_clock
+def test_max_sessions(clock):
+    """Creating a session beyond max_sessions raises SessionLimitError until one is removed"""
+    registry = SessionRegistry(StubTranscriber, max_sessions=2)
+    first, transcriber = registry.create(interview_type='technical')
+    assert transcriber.session_id == first and transcriber.kwargs == {'interview_type': 'technical'}
+    registry.create()
+    try:
+        registry.create()
+        assert False, 'expected SessionLimitError'
+    except SessionLimitError as e:
+        print(f"\nRejected: {e}")
+    assert len(registry) == 2
+
+    assert registry.remove(first) is transcriber
+    assert registry.remove(first) is None
+    registry.create()
+    assert len(registry) == 2
+
+
+@with_clock
+def test_failed_factory_frees_slot(clock):
+    """A transcriber that fails to build doesn't keep its reserved slot"""
+    def factory(session_id):
+        raise RuntimeError('no audio device')
+
+    registry = SessionRegistry(factory, max_sessions=1)
+    try:
+        registry.create()
+        assert False, 'expected RuntimeError'
+    except RuntimeError:
+        pass
+    assert len(registry) == 0
+    registry.factory = StubTranscriber
+    registry.create()
+
+
+@with_clock
+def test_reaper_evicts_idle(clock):
+    """The reaper stops and removes sessions idle for longer than idle_timeout, and runs cleanup"""
+    cleanups = []
+    registry = SessionRegistry(StubTranscriber, idle_timeout=100, reap_interval=30, cleanup=cleanups.append)
+    idle_id, idle = registry.create()
+    active_id, active = registry.create()
+    clock.wait_for_reaper()
+
+    for _ in range(3):
+        clock.tick()
+        # Requests keep a session alive
+        assert registry.get(active_id) is active
+    print(f"\nAfter {clock.now:.0f}s: {len(registry)} sessions")
+    assert len(registry) == 2 and not idle.stopped
+
+    clock.tick()
+    print(f"After {clock.now:.0f}s: {len(registry)} sessions")
+    assert idle.stopped and registry.get(idle_id) is None
+    assert not active.stopped and registry.get(active_id) is active
+    assert cleanups == [100] * 4
+
+    # An expired session never blocks a new one, even between reaper passes
+    registry.max_sessions = 1
+    clock.now += 102
+    registry.create()
+    assert active.stopped and len(registry) == 1
+
+
+@with_clock
+def test_concurrent_create_remove(clock):
+    """Threads creating and removing sessions never exceed the cap or lose a session"""
+    max_sessions = 4
+    peak = [0]
+    peak_lock = threading.Lock()
+
+    def factory(session_id):
+        with peak_lock:
+            peak[0] = max(peak[0], len(registry))
+        return StubTranscriber(session_id)
+
+    registry = SessionRegistry(factory, max_sessions=max_sessions)
+    created, rejected = [], []
+    start = threading.Barrier(16)
+
+    def worker():
+        start.wait()
+        for _ in range(200):
+            try:
+                session_id, transcriber = registry.create()
+            except SessionLimitError:
+                rejected.append(1)
+                continue
+            assert registry.get(session_id) is transcriber
+            assert registry.remove(session_id) is transcriber
+            created.append(session_id)
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"\nCreated {len(created)}, rejected {len(rejected)}, peak {peak[0]}")
+    assert len(created) + len(rejected) == 16 * 200
+    assert len(set(created)) == len(created)
+    assert peak[0] <= max_sessions
+    assert len(registry) == 0
+
+
+@with_clock
+def test_resume_through_loader(clock):
+    """Sessions unknown to the process are loaded once, within the cap, and can be removed"""
+    saved = {'saved-1': StubTranscriber('saved-1'), 'saved-2': StubTranscriber('saved-2')}
+    loads = []
+    release = threading.Event()
+
+    def loader(session_id):
+        loads.append(session_id)
+        if session_id == 'slow':
+            release.wait(5)
+            return StubTranscriber(session_id)
+        if session_id == 'broken':
+            raise OSError('corrupt session file')
+        return saved.get(session_id)
+
+    registry = SessionRegistry(StubTranscriber, max_sessions=2, loader=loader)
+    assert registry.get('saved-1') is saved['saved-1']
+    assert registry.get('saved-1') is saved['saved-1']
+    assert registry.get('missing') is None
+    assert registry.get('broken') is None
+    assert loads == ['saved-1', 'missing', 'broken']
+    assert len(registry) == 1
+
+    # A request arriving while the session loads doesn't load it again
+    results = []
+    loading = threading.Thread(target=lambda: results.append(registry.get('slow')))
+    loading.start()
+    while 'slow' not in loads:
+        pass
+    assert registry.get('slow') is None
+    assert len(registry) == 2
+    release.set()
+    loading.join()
+    assert results[0].session_id == 'slow' and loads.count('slow') == 1
+
+    # Resuming respects the cap
+    assert registry.get('saved-2') is None and 'saved-2' not in loads
+    assert registry.remove('slow') is results[0]
+
+    # Stopping a session after a restart loads it first
+    restarted = SessionRegistry(StubTranscriber, loader=loader)
+    assert restarted.remove('saved-2') is saved['saved-2']
+    assert len(restarted) == 0
+    assert restarted.remove('missing') is None
+
+
+if __name__ == "__main__":
+    test_max_sessions()
+    test_failed_factory_frees_slot()
+    test_reaper_evicts_idle()
+    test_concurrent_create_remove()
+    test_resume_through_loader()
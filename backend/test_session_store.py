@@ -0,0 +1,187 @@
+import socket
+import tempfile
+import time
+
+import numpy as np
+
+from app.session_store import (MemorySessionStore, RedisSessionStore, RespClient, RespError, pack_segment,
+                               unpack_segment)
+from app.session_storage import SessionStorage
+from loadtest.resp_standin import serve
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def backends(ttl=3600):
+    """Yield (name, store) for the in-memory store and a Redis store on the stand-in server"""
+    yield 'memory', MemorySessionStore(ttl=ttl)
+    port = free_port()
+    server = serve(port=port)
+    try:
+        yield 'redis', RedisSessionStore(RespClient.from_url(f'redis://127.0.0.1:{port}/0'), ttl=ttl)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_pack_segment():
+    """Segment records survive the binary round trip, including non-ASCII text and extra fields"""
+    record = {
+        'channel': 'tab', 'start': 16000, 'end': 48000, 'text': 'Tell me about a time… ¿sí?',
+        'time': 12.5, 'segments': [(12.5, 14.0, 'Tell me about'), (14.0, 15.0, 'a time… ¿sí?')], 'final': True
+    }
+    data = pack_segment(record)
+    print(f"\nPacked record: {len(data)} bytes")
+    assert unpack_segment(data) == record
+
+
+def test_backends():
+    """Metadata, segments, feedback and owners behave the same on every backend"""
+    for name, store in backends():
+        print(f"\nTesting {name} store")
+        assert not store.exists('s1')
+        store.save_meta('s1', {'interview_type': 'behavioral'})
+        store.claim('s1', 'worker-a')
+        for i in range(3):
+            store.append_segment('s1', {'channel': 'mic', 'start': i * 100, 'end': (i + 1) * 100, 'text': f'w{i}'})
+        assert store.exists('s1')
+        assert store.load_meta('s1') == {'interview_type': 'behavioral'}
+        assert [segment['text'] for segment in store.segments('s1')] == ['w0', 'w1', 'w2']
+        assert store.owner('s1') == 'worker-a'
+        store.claim('s1', 'worker-b')
+        assert store.owner('s1') == 'worker-b'
+
+        store.save_feedback('s1', {'type': 'positive'})
+        store.delete('s1')
+        assert not store.exists('s1')
+        assert store.owner('s1') is None
+        assert list(store.segments('s1')) == []
+        assert store.load_feedback('s1') == {'type': 'positive'}
+
+
+def test_ttl():
+    """A session's state expires ttl seconds after its last write"""
+    for name, store in backends(ttl=1):
+        store.save_meta('s1', {'interview_type': 'behavioral'})
+        store.append_segment('s1', {'channel': 'mic', 'start': 0, 'end': 100, 'text': 'hello'})
+        time.sleep(0.6)
+        # Appending refreshes the expiry of the whole session
+        store.append_segment('s1', {'channel': 'mic', 'start': 100, 'end': 200, 'text': 'again'})
+        time.sleep(0.6)
+        assert store.load_meta('s1') == {'interview_type': 'behavioral'}, name
+        time.sleep(1.2)
+        assert not store.exists('s1'), name
+        assert store.load_meta('s1') == {}, name
+
+
+def test_takeover_offsets():
+    """A new owner continues after the transcribed samples and the old owner's segments are dropped"""
+    for name, store in backends():
+        node_a, node_b = tempfile.mkdtemp(), tempfile.mkdtemp()
+        first = SessionStorage('s1', node_a, store=store)
+        first.append_audio('mic', np.ones(32000, dtype=np.float32))
+        first.append_segment('mic', 0, 32000, 'first')
+
+        second = SessionStorage('s1', node_b, store=store)
+        assert second.audio_start('mic') == 32000
+        assert second.samples_written('mic') == 32000
+        second.append_audio('mic', np.full(16000, 2, dtype=np.float32))
+        audio = second.read_audio('mic', 31990, 32010)
+        assert (audio[:10] == 0).all() and (audio[10:] == 2).all()
+
+        first.append_segment('mic', 32000, 48000, 'stale')
+        second.append_segment('mic', 32000, 48000, 'second')
+        assert [segment['text'] for segment in second.segments()] == ['first', 'second'], name
+
+        first.delete()
+        assert store.exists('s1')
+        second.delete()
+        assert not store.exists('s1')
+
+
+def test_shared_store_same_node():
+    """With a shared store, another worker on the same node takes the session over instead of being locked out"""
+    for name, store in backends():
+        if not store.shared:
+            continue
+        root = tempfile.mkdtemp()
+        first = SessionStorage('s1', root, store=store)
+        first.append_audio('mic', np.ones(16000, dtype=np.float32))
+        first.append_segment('mic', 0, 16000, 'first')
+        second = SessionStorage('s1', root, store=store)
+        assert store.owner('s1') == second.owner
+        assert second.audio_start('mic') == 16000
+        first.delete()
+        second.delete()
+
+
+def test_pipeline_error():
+    """An error reply in a pipeline is raised after every reply is read, leaving the connection usable"""
+    port = free_port()
+    server = serve(port=port)
+    try:
+        client = RespClient('127.0.0.1', port)
+        try:
+            client.pipeline(('SET', 'a', '1'), ('NOSUCHCOMMAND',), ('SET', 'b', '2'))
+            assert False, 'expected RespError'
+        except RespError:
+            pass
+        assert client.pipeline(('GET', 'a'), ('GET', 'b')) == [b'1', b'2']
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_resent_append():
+    """A segment pushed twice because its pipeline was resent after a lost reply is read once"""
+    port = free_port()
+    server = serve(port=port)
+    try:
+        client = RespClient('127.0.0.1', port)
+        store = RedisSessionStore(client)
+        store.append_segment('s1', {'channel': 'mic', 'start': 0, 'end': 100, 'text': 'first'})
+
+        # The connection drops once the pipeline has been sent, before its first reply is read
+        read_reply = client._read_reply
+        dropped = []
+
+        def drop_once():
+            if not dropped:
+                dropped.append(True)
+                raise EOFError('Connection closed by the server')
+            return read_reply()
+
+        client._read_reply = drop_once
+        store.append_segment('s1', {'channel': 'mic', 'start': 100, 'end': 200, 'text': 'second'})
+        client._read_reply = read_reply
+
+        key = store._key('s1', 'segments')
+        deadline = time.monotonic() + 5
+        while len(client.execute('LRANGE', key, 0, -1)) < 3:
+            assert time.monotonic() < deadline, 'the resent push never landed'
+            time.sleep(0.01)
+        print(f"\nRecords stored: {len(client.execute('LRANGE', key, 0, -1))}")
+        assert [segment['text'] for segment in store.segments('s1')] == ['first', 'second']
+
+        # Identical text in different windows is still kept
+        store.append_segment('s1', {'channel': 'mic', 'start': 200, 'end': 300, 'text': 'second'})
+        assert [segment['start'] for segment in store.segments('s1')] == [0, 100, 200]
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    test_pack_segment()
+    test_backends()
+    test_ttl()
+    test_takeover_offsets()
+    test_shared_store_same_node()
+    test_pipeline_error()
+    test_resent_append()
@@ -0,0 +1,84 @@
+import io
+import struct
+
+import numpy as np
+from scipy.io import wavfile
+
+from app.stream_decode import DecodeError, WavStreamParser
+
+
+def wav_bytes(data, sample_rate=8000):
+    buffer = io.BytesIO()
+    wavfile.write(buffer, sample_rate, data)
+    return buffer.getvalue()
+
+
+def parse(raw, piece=None):
+    """Decode raw with a WavStreamParser, fed whole or in pieces of the given size"""
+    blocks = []
+    parser = WavStreamParser(blocks.append)
+    piece = piece or len(raw)
+    for start in range(0, len(raw), piece):
+        parser.feed(raw[start:start + piece])
+    return parser, np.concatenate(blocks)
+
+
+def test_encodings():
+    """Every supported encoding decodes to the samples scipy reads, whatever the piece size"""
+    rng = np.random.default_rng(0)
+    signal = rng.uniform(-1, 1, (1001, 2))
+    encodings = {
+        'int16': (signal * 32767).astype(np.int16),
+        'int32': (signal * 2147483647).astype(np.int32),
+        'float32': signal.astype(np.float32),
+        'uint8': (signal * 100 + 128).astype(np.uint8)
+    }
+    for name, data in encodings.items():
+        raw = wav_bytes(data)
+        # 8-bit comes out as int16 centred on zero
+        expected = (data.astype(np.int16) - 128) << 8 if name == 'uint8' else data
+        for piece in (None, 7, 4096):
+            parser, samples = parse(raw, piece)
+            assert parser.sample_rate == 8000 and parser.channels == 2
+            assert samples.shape == (1001, 2), name
+            assert np.array_equal(samples, expected), (name, piece)
+        print(f"{name}: {samples.dtype} {samples.shape}")
+
+
+def test_24_bit():
+    """24-bit samples are widened to int32 with the sign kept"""
+    pcm = np.array([[1, -1], [8388607, -8388608]], dtype=np.int32)
+    data = b''.join(int(value).to_bytes(3, 'little', signed=True) for value in pcm.reshape(-1))
+    header = (b'RIFF' + struct.pack('<I', 36 + len(data)) + b'WAVE' +
+              b'fmt ' + struct.pack('<IHHIIHH', 16, 1, 2, 8000, 48000, 6, 24) +
+              b'data' + struct.pack('<I', len(data)))
+    _, samples = parse(header + data, 5)
+    assert samples.dtype == np.int32
+    assert np.array_equal(samples >> 8, pcm)
+
+
+def test_unknown_length():
+    """A data chunk written with an unknown size is decoded up to the last whole frame"""
+    data = np.arange(-500, 500, dtype=np.int16).reshape(-1, 2)
+    raw = bytearray(wav_bytes(data))
+    data_at = raw.index(b'data')
+    raw[data_at + 4:data_at + 8] = struct.pack('<I', 0xFFFFFFFF)
+    _, samples = parse(bytes(raw) + b'\x01', 100)
+    assert np.array_equal(samples, data)
+
+
+def test_rejects_other_files():
+    """Streams that aren't WAV, or use an unsupported encoding, raise DecodeError"""
+    for raw in (b'ID3\x04' + bytes(100), wav_bytes(np.zeros(10, dtype=np.int64))):
+        try:
+            parse(raw)
+            assert False, 'expected DecodeError'
+        except DecodeError as e:
+            print(f"Rejected: {e}")
+
+
+if __name__ == "__main__":
+    test_encodings()
+    test_24_bit()
+    test_unknown_length()
+    test_rejects_other_files()
@@ -0,0 +1,127 @@
+import random
+
+from app.timeline import ConversationTimeline
+
+
+def spans(turns):
+    return [(turn.speaker, turn.start, turn.end, turn.text) for turn in turns]
+
+
+def interrupted_interview():
+    """A long question the interviewee talks over, then a follow-up question and its answer"""
+    return {
+        'tab': [(0, 30, "Walk me through the outage."), (32, 34, "Why that fix?")],
+        'mic': [(5, 6, "Right."), (40, 50, "It was the smallest safe change.")]
+    }
+
+
+def test_watermark_merge():
+    """Segments are placed in start order once every channel is transcribed past them"""
+    segments = interrupted_interview()
+    timeline = ConversationTimeline()
+
+    # The microphone runs ahead; nothing can be placed until the tab catches up
+    timeline.add('mic', segments['mic'])
+    assert len(timeline) == 0
+
+    timeline.add('tab', segments['tab'][:1], transcribed_until=31)
+    print(f"\nAt 31s: {spans(timeline.turns())}")
+    assert spans(timeline.turns()) == [('interviewer', 0, 30, "Walk me through the outage."),
+                                       ('interviewee', 5, 6, "Right.")]
+
+    # Silence on the tab still moves its watermark on; empty text is dropped
+    timeline.add('tab', [(31, 32, "  ")], transcribed_until=32)
+    assert len(timeline) == 2
+    timeline.add('tab', segments['tab'][1:], transcribed_until=39)
+    assert len(timeline) == 3
+    timeline.flush()
+    assert spans(timeline.turns()) == [('interviewer', 0, 30, "Walk me through the outage."),
+                                       ('interviewee', 5, 6, "Right."),
+                                       ('interviewer', 32, 34, "Why that fix?"),
+                                       ('interviewee', 40, 50, "It was the smallest safe change.")]
+
+
+def test_arrival_order_does_not_matter():
+    """However the channels' segments arrive, the timeline matches one built from all of them at once"""
+    rng = random.Random(0)
+    for _ in range(200):
+        segments = {}
+        for channel in ('mic', 'tab'):
+            t, segments[channel] = 0.0, []
+            for i in range(rng.randint(0, 12)):
+                t += rng.uniform(0, 5)
+                length = rng.uniform(0.1, 8)
+                segments[channel].append((t, t + length, f"{channel}{i}"))
+                t += length
+
+        expected = ConversationTimeline()
+        for channel, channel_segments in segments.items():
+            expected.add(channel, channel_segments)
+        expected.flush()
+
+        timeline = ConversationTimeline()
+        queues = {channel: list(channel_segments) for channel, channel_segments in segments.items()}
+        while any(queues.values()):
+            channel = rng.choice([channel for channel, queue in queues.items() if queue])
+            count = rng.randint(1, 3)
+            timeline.add(channel, queues[channel][:count])
+            del queues[channel][:count]
+        timeline.flush()
+        assert spans(timeline.turns()) == spans(expected.turns())
+
+
+def test_between():
+    """Range queries find turns that started earlier but still overlap, including talked-over ones"""
+    timeline = ConversationTimeline()
+    for channel, segments in interrupted_interview().items():
+        timeline.add(channel, segments)
+    timeline.flush()
+
+    # The long question overlaps the range though the turn after it has ended
+    assert spans(timeline.between(20, 25)) == [('interviewer', 0, 30, "Walk me through the outage.")]
+    assert [turn.text for turn in timeline.between(5, 6)] == ["Walk me through the outage.", "Right."]
+    # Ranges are half-open
+    assert timeline.between(30, 32) == []
+    assert [turn.text for turn in timeline.between(33, 40)] == ["Why that fix?"]
+    assert len(timeline.between(0, 100)) == 4
+    assert timeline.between(50, 60) == []
+
+    rng = random.Random(1)
+    turns = timeline.turns()
+    for _ in range(500):
+        start = rng.uniform(-5, 55)
+        end = start + rng.uniform(0, 20)
+        brute_force = [turn for turn in turns if turn.start < end and turn.end > start]
+        assert timeline.between(start, end) == brute_force, (start, end)
+
+
+def test_last_exchange():
+    """The last question is the latest interviewer turn, answered by every interviewee turn after it"""
+    timeline = ConversationTimeline()
+    assert timeline.last_exchange() == (None, [])
+
+    timeline.add('mic', [(0, 2, "Hello.")])
+    timeline.flush()
+    question, answers = timeline.last_exchange()
+    assert question is None and [turn.text for turn in answers] == ["Hello."]
+
+    segments = interrupted_interview()
+    timeline = ConversationTimeline()
+    timeline.add('tab', segments['tab'])
+    timeline.add('mic', segments['mic'][:1], transcribed_until=40)
+    question, answers = timeline.last_exchange()
+    print(f"\nBefore the answer: {question.text!r} {spans(answers)}")
+    assert question.text == "Why that fix?" and answers == []
+
+    timeline.add('mic', segments['mic'][1:])
+    timeline.flush()
+    question, answers = timeline.last_exchange()
+    assert question.text == "Why that fix?"
+    assert [turn.text for turn in answers] == ["It was the smallest safe change."]
+
+
+if __name__ == "__main__":
+    test_watermark_merge()
+    test_arrival_order_does_not_matter()
+    test_between()
+    test_last_exchange()
@@ -0,0 +1,185 @@
+import io
+import os
+import tempfile
+import time
+from contextlib import ExitStack
+
+import numpy as np
+from scipy.io import wavfile
+
+# Sessions finalized here are recorded under their upload id
+os.environ.setdefault('HISTORY_DB', os.path.join(tempfile.mkdtemp(), 'history.db'))
+os.environ.setdefault('UPLOAD_DECODE_POLL_SECONDS', '0.1')
+
+from benchmarks.fakes import install_fakes
+
+install_fakes(realtime_factor=0.0, llm_latency=0.0)
+
+from app import audio_processing
+from app.admission import admission
+from app.uploads import UploadError, UploadManager, sha256_hex
+
+SAMPLE_RATE = 16000
+CHUNK = 256 * 1024
+
+
+def recording(seconds=150):
+    """Stereo WAV of an interviewer and an interviewee taking turns every 5 seconds"""
+    t = np.arange(seconds * SAMPLE_RATE) / SAMPLE_RATE
+    turn = np.sin(2 * np.pi * 0.1 * t) > 0
+    mic = 0.3 * np.sin(2 * np.pi * 220 * t) * turn
+    tab = 0.3 * np.sin(2 * np.pi * 330 * t) * ~turn
+    buffer = io.BytesIO()
+    wavfile.write(buffer, SAMPLE_RATE, (np.stack([mic, tab], axis=1) * 32767).astype(np.int16))
+    return buffer.getvalue()
+
+
+RAW = recording()
+
+
+def send(upload, offset, data):
+    return upload.write_chunk(offset, data, sha256_hex(data))
+
+
+def expect_error(status, call, *args):
+    try:
+        call(*args)
+    except UploadError as e:
+        assert e.status == status, (e.status, str(e))
+        return e
+    assert False, f'expected UploadError {status}'
+
+
+class CountingTranscription:
+    """Count the windows the transcription service is asked to transcribe"""
+
+    def __enter__(self):
+        self.windows = 0
+        self._transcribe = audio_processing.transcription_service.transcribe_segments
+
+        def transcribe_segments(audio, *args, **kwargs):
+            self.windows += 1
+            return self._transcribe(audio, *args, **kwargs)
+
+        audio_processing.transcription_service.transcribe_segments = transcribe_segments
+        return self
+
+    def __exit__(self, *exc):
+        audio_processing.transcription_service.transcribe_segments = self._transcribe
+
+
+def upload_all(managers, upload_id, raw=RAW):
+    """Send the chunks of raw round-robin to the managers, as a non-sticky load balancer would"""
+    for i, offset in enumerate(range(0, len(raw), CHUNK)):
+        send(managers[i % len(managers)].get(upload_id), offset, raw[offset:offset + CHUNK])
+
+
+def test_write_chunk():
+    """Chunks are checked, resent chunks are accepted once and the offset survives a restart"""
+    manager = UploadManager(tempfile.mkdtemp())
+    upload = manager.create('rec.wav', size=3000)
+
+    expect_error(400, upload.write_chunk, 0, b'a' * 1000, sha256_hex(b'b' * 1000))
+    assert send(upload, 0, b'a' * 1000) == 1000
+    assert send(upload, 1000, b'b' * 1000) == 2000
+    # A resent chunk whose acknowledgement was lost is accepted without being written twice
+    assert send(upload, 1000, b'b' * 1000) == 2000
+    error = expect_error(409, send, upload, 500, b'c' * 1000)
+    assert error.offset == 2000
+    expect_error(409, send, upload, 1000, b'x' * 1000)
+    expect_error(413, send, upload, 2000, b'c' * 1001)
+    expect_error(409, upload.finalize)
+
+    restarted = UploadManager(manager.root)
+    assert restarted.get(upload.upload_id).status()['offset'] == 2000
+    assert restarted.get('../etc') is None
+    with open(upload.data_path, 'rb') as f:
+        assert f.read() == b'a' * 1000 + b'b' * 1000
+    upload.cancel()
+
+
+def test_one_decoder_per_upload():
+    """Chunks spread over processes are transcribed once, by the process owning the upload"""
+    root = tempfile.mkdtemp()
+    with CountingTranscription() as single:
+        manager = UploadManager(root)
+        upload = manager.create('rec.wav', size=len(RAW))
+        upload_all([manager], upload.upload_id)
+        expected = manager.get(upload.upload_id).finalize(sha256_hex(RAW))
+
+    # Each manager stands in for a worker process; flock excludes them alike
+    with CountingTranscription() as spread:
+        workers = [UploadManager(root) for _ in range(3)]
+        upload = workers[0].create('rec.wav', size=len(RAW))
+        upload_all(workers, upload.upload_id)
+        feedback = workers[2].get(upload.upload_id).finalize(sha256_hex(RAW))
+
+    print(f"\nWindows transcribed: {single.windows} in one process, {spread.windows} spread over three")
+    assert spread.windows == single.windows
+    assert feedback['details']['delivery'] == expected['details']['delivery']
+    assert feedback['message'] == expected['message']
+    assert not os.path.exists(os.path.join(root, upload.upload_id, 'audio.wav'))
+    # Finished uploads aren't kept in memory, once the decoder that stored the result has returned
+    for worker in workers:
+        cached = worker._uploads.get(upload.upload_id)
+        if cached is not None and cached._worker is not None:
+            cached._worker.join()
+    assert upload.upload_id not in workers[0]._uploads and upload.upload_id not in workers[2]._uploads
+    assert workers[1].get(upload.upload_id).finalize() == feedback
+    assert upload.upload_id not in workers[1]._uploads
+
+
+def test_takeover_resumes():
+    """A process taking over after the decoder stopped only transcribes the windows left"""
+    root = tempfile.mkdtemp()
+    first, second = UploadManager(root), UploadManager(root)
+    upload = first.create('rec.wav', size=len(RAW))
+    half = len(RAW) // 2 // CHUNK * CHUNK
+    with CountingTranscription() as counted:
+        upload_all([first], upload.upload_id, RAW[:half])
+        while upload.status()['seconds_transcribed'] < 30:
+            time.sleep(0.05)
+        # The owning process goes away
+        upload.cancel()
+        upload._worker.join()
+        before = counted.windows
+        for offset in range(half, len(RAW), CHUNK):
+            send(second.get(upload.upload_id), offset, RAW[offset:offset + CHUNK])
+        feedback = second.get(upload.upload_id).finalize()
+
+    resumed = second.get(upload.upload_id)
+    print(f"\nTranscribed {before} windows before the takeover, {counted.windows - before} after")
+    assert before > 0
+    with CountingTranscription() as fresh:
+        manager = UploadManager(tempfile.mkdtemp())
+        other = manager.create('rec.wav', size=len(RAW))
+        upload_all([manager], other.upload_id)
+        expected = other.finalize()
+    assert counted.windows == fresh.windows
+    assert feedback['details']['delivery'] == expected['details']['delivery']
+    assert resumed.finished
+
+
+def test_batch_admission():
+    """Windows are only transcribed while the upload holds a batch job slot"""
+    manager = UploadManager(tempfile.mkdtemp())
+    upload = manager.create('rec.wav', size=len(RAW))
+    with CountingTranscription() as counted:
+        with ExitStack() as stack:
+            for _ in range(admission.max_batch_jobs):
+                stack.enter_context(admission.batch_job())
+            upload_all([manager], upload.upload_id)
+            time.sleep(0.5)
+            assert counted.windows == 0
+            assert upload.status()['seconds_transcribed'] == 0
+        feedback = upload.finalize()
+    print(f"\nTranscribed {counted.windows} windows once slots were free")
+    assert counted.windows > 0
+    assert feedback['type'] in ('positive', 'neutral', 'constructive')
+
+
+if __name__ == "__main__":
+    test_write_chunk()
+    test_one_decoder_per_upload()
+    test_takeover_resumes()
+    test_batch_admission()
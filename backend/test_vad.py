@@ -0,0 +1,65 @@
+import numpy as np
+
+from app.vad import FRAME_SAMPLES, frame_energies, speech_regions, streamed_frame_energies
+from benchmarks.fixtures import SAMPLE_RATE, synthetic_speech
+
+# Allowed error of a region boundary: one frame either side of the padded edge
+TOLERANCE = FRAME_SAMPLES / SAMPLE_RATE
+
+
+def room_noise(seconds, seed=0):
+    """Background noise at the level the synthetic speech fixture mixes in"""
+    return np.random.default_rng(seed).normal(0, 0.002, int(seconds * SAMPLE_RATE)).astype(np.float32)
+
+
+def recording(seconds, bursts):
+    """Room noise with a burst of synthetic speech at each (start, length) in seconds"""
+    audio = room_noise(seconds)
+    for seed, (start, length) in enumerate(bursts):
+        # A burst of synthetic speech lasts at least 0.8 s, so a shorter clip has no pause in it
+        speech = synthetic_speech(length, seed=seed)
+        offset = int(start * SAMPLE_RATE)
+        audio[offset:offset + len(speech)] += speech
+    return audio
+
+
+def seconds(regions):
+    return [(start / SAMPLE_RATE, end / SAMPLE_RATE) for start, end in regions]
+
+
+def assert_regions(found, expected):
+    print(f"\nFound {[(round(start, 2), round(end, 2)) for start, end in found]}, expected {expected}")
+    assert len(found) == len(expected)
+    for (start, end), (expected_start, expected_end) in zip(found, expected):
+        assert abs(start - expected_start) <= TOLERANCE and abs(end - expected_end) <= TOLERANCE
+
+
+def test_region_boundaries():
+    """Regions cover each burst plus padding; short pauses merge and clicks are dropped"""
+    audio = recording(8, [(1.0, 0.8), (1.9, 0.8), (4.0, 0.8), (6.5, 0.1)])
+    found = seconds(speech_regions(frame_energies(audio)))
+    # The 0.2 s pause between the first two bursts doesn't split them; the 0.1 s click is dropped
+    assert_regions(found, [(0.8, 2.9), (3.8, 5.0)])
+
+
+def test_edges_and_streaming():
+    """Regions at the ends of the audio are clipped to it, and block-wise levels match whole-audio levels"""
+    audio = recording(5, [(0.0, 0.8), (4.2, 0.8)])
+    levels = frame_energies(audio)
+    assert_regions(seconds(speech_regions(levels)), [(0.0, 1.0), (4.0, 5.0)])
+
+    streamed = streamed_frame_energies(lambda start, end: audio[start:end], len(audio), block_frames=7)
+    assert np.allclose(streamed, levels)
+
+
+def test_silence():
+    """Noise alone, digital silence and empty audio have no speech regions"""
+    assert speech_regions(frame_energies(room_noise(10))) == []
+    assert speech_regions(frame_energies(np.zeros(10 * SAMPLE_RATE, dtype=np.float32))) == []
+    assert speech_regions(frame_energies(np.zeros(FRAME_SAMPLES - 1, dtype=np.float32))) == []
+
+
+if __name__ == "__main__":
+    test_region_boundaries()
+    test_edges_and_streaming()
+    test_silence()
@@ -0,0 +1,24 @@
+"""
+Production entry point.
+
+Run behind gunicorn with the settings in gunicorn.conf.py:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is created in the master process with the Whisper models loaded,
+and the background transcription threads are started in each worker after
+fork (see post_fork in gunicorn.conf.py). Each worker then warms up its
+models in the background; point load balancer checks at /ready, which fails
+until the worker is warm, and liveness checks at /health.
+"""
+import os
+from app.transcription_service import preload_models, LIVE_MODEL, FINAL_MODEL
+
+# Load models before the app so audio_processing reuses them at import; by
+# default the live model and, in two-tier mode, the final-pass model
+default_models = ','.join(name for name in (LIVE_MODEL, FINAL_MODEL) if name)
+preload_models([name.strip() for name in os.getenv('PRELOAD_MODELS', default_models).split(',') if name.strip()])
+
+from app import create_app
+
+app = create_app(start_services=False)